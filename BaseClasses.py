@@ -5,6 +5,7 @@ import functools
 import logging
 import random
 import secrets
+import threading
 from argparse import Namespace
 from collections import Counter, deque
 from collections.abc import Collection, MutableSequence
@@ -67,6 +68,20 @@ class PlandoItemBlock:
     count: dict[str, int] = dataclasses.field(default_factory=dict)
 
 
+class SphereCache(NamedTuple):
+    """One logical sweep over every filled location, shared by the accessibility check and the playthrough."""
+    placements: Dict[Location, Tuple[Item, ItemClassification]]
+    """what the sweep was done with, if this no longer matches the multiworld the cache is outdated"""
+    spheres: List[Set[Location]]
+    """reachable spheres, in order"""
+    sphere_of: Dict[Location, int]
+    """index into spheres for every reachable location"""
+    state: CollectionState
+    """has every reachable sphere collected"""
+    unreachable: Set[Location]
+    """filled locations that could not be reached"""
+
+
 class MultiWorld():
     debug_types = False
     player_name: Dict[int, str]
@@ -173,6 +188,8 @@ class MultiWorld():
         self.indirect_connections = {}
         self.start_inventory_from_pool: Dict[int, Options.StartInventoryPool] = {}
         self.plando_item_blocks = {}
+        self._sphere_cache = None
+        self._sphere_cache_lock = threading.Lock()
 
         for player in range(1, players + 1):
             def set_player_attr(attr: str, val) -> None:
@@ -491,10 +508,12 @@ class MultiWorld():
     def push_precollected(self, item: Item):
         self.precollected_items[item.player].append(item)
         self.state.collect(item, True)
+        self._sphere_cache = None
 
     def push_item(self, location: Location, item: Item, collect: bool = True):
         location.item = item
         item.location = location
+        self._sphere_cache = None
         if collect:
             self.state.collect(item, location.advancement, location)
 
@@ -596,6 +615,34 @@ class MultiWorld():
 
         return False
 
+    def get_sphere_cache(self) -> SphereCache:
+        """
+        Returns the logical spheres of the current placements, sweeping only if they changed since the last call.
+        Safe to call from multiple output threads at once.
+        """
+        placements = {location: (location.item, location.item.classification)
+                      for location in self.get_filled_locations()}
+        with self._sphere_cache_lock:
+            sphere_cache = self._sphere_cache
+            if sphere_cache and sphere_cache.placements == placements:
+                return sphere_cache
+
+            state = CollectionState(self)
+            spheres: List[Set[Location]] = []
+            locations = set(placements)
+            while locations:
+                sphere = {location for location in locations if location.can_reach(state)}
+                if not sphere:
+                    break
+                for location in sphere:
+                    state.collect(location.item, True, location)
+                locations -= sphere
+                spheres.append(sphere)
+
+            sphere_of = {location: index for index, sphere in enumerate(spheres) for location in sphere}
+            self._sphere_cache = sphere_cache = SphereCache(placements, spheres, sphere_of, state, locations)
+            return sphere_cache
+
     def get_spheres(self) -> Iterator[Set[Location]]:
         """
         yields a set of locations for each logical sphere
@@ -668,8 +715,6 @@ class MultiWorld():
 
     def fulfills_accessibility(self, state: Optional[CollectionState] = None):
         """Check if accessibility rules are fulfilled with current or supplied state."""
-        if not state:
-            state = CollectionState(self)
         players: Dict[str, Set[int]] = {
             "minimal": set(),
             "items": set(),
@@ -699,6 +744,21 @@ class MultiWorld():
 
         locations = [location for location in self.get_locations() if location_relevant(location)]
 
+        if not state:
+            if not locations:
+                return False
+            sphere_cache = self.get_sphere_cache()
+            state = sphere_cache.state.copy()
+            # the sweep was over all filled locations, so only empty ones still need a look
+            locations = [location for location in locations if location not in sphere_cache.sphere_of
+                         and (location.item or not location.can_reach(state))]
+            if self.has_beaten_game(state) and not any(location_condition(location) for location in locations):
+                return True
+            if locations:
+                logging.warning(f"Could not access required locations for accessibility check."
+                                f" Missing: {locations}")
+            return False
+
         while locations:
             sphere: List[Location] = []
             for n in range(len(locations) - 1, -1, -1):
@@ -727,6 +787,176 @@ class MultiWorld():
 PathValue = Tuple[str, Optional["PathValue"]]
 
 
+class _ItemLookupRecorder:
+    """
+    Stands in for a player's prog_items Counter in CollectionState.prog_items while a blocked Entrance is tested in
+    incremental reachability mode. Records every item name looked up, so the Entrance only gets tested again once one
+    of those counts changes. Anything else, like iterating or calling other Counter methods, is passed on to the
+    Counter and records ANY_ITEM instead.
+    """
+    __slots__ = ("counter", "lookups")
+
+    ANY_ITEM: ClassVar[object] = object()
+
+    counter: Counter[str]
+    lookups: Set[Any]
+
+    def __init__(self, counter: Counter[str], lookups: Set[Any]) -> None:
+        self.counter = counter
+        self.lookups = lookups
+
+    def __getitem__(self, item: str) -> int:
+        self.lookups.add(item)
+        return self.counter[item]
+
+    def __setitem__(self, item: str, count: int) -> None:
+        self.lookups.add(item)
+        self.counter[item] = count
+
+    def __delitem__(self, item: str) -> None:
+        self.lookups.add(item)
+        del self.counter[item]
+
+    def __contains__(self, item: object) -> bool:
+        self.lookups.add(item)
+        return item in self.counter
+
+    def get(self, item: str, default: Any = None) -> Any:
+        self.lookups.add(item)
+        return self.counter.get(item, default)
+
+    def __iter__(self) -> Iterator[str]:
+        self.lookups.add(_ItemLookupRecorder.ANY_ITEM)
+        return iter(self.counter)
+
+    def __len__(self) -> int:
+        self.lookups.add(_ItemLookupRecorder.ANY_ITEM)
+        return len(self.counter)
+
+    def __getattr__(self, name: str) -> Any:
+        self.lookups.add(_ItemLookupRecorder.ANY_ITEM)
+        return getattr(self.counter, name)
+
+
+class EntranceDependencies:
+    """
+    Per player index of which blocked Entrances have to be tested again after which item counts changed, used by
+    CollectionState when the world opted into World.incremental_reachability.
+    """
+    __slots__ = ("by_item", "by_entrance", "items_seen")
+
+    by_item: Dict[str, Set[Entrance]]
+    """item name -> blocked entrances whose access rule looked up that item name"""
+    by_entrance: Dict[Entrance, Set[str]]
+    """blocked entrance -> item names its access rule looked up when it was last tested"""
+    items_seen: Counter[str]
+    """item counts at the end of the last reachability update"""
+
+    def __init__(self) -> None:
+        self.by_item = {}
+        self.by_entrance = {}
+        self.items_seen = Counter()
+
+    def copy(self) -> EntranceDependencies:
+        ret = EntranceDependencies()
+        ret.by_item = {item: entrances.copy() for item, entrances in self.by_item.items()}
+        ret.by_entrance = self.by_entrance.copy()  # the lookup sets are replaced, never changed
+        ret.items_seen = self.items_seen  # replaced at the end of each update, never changed
+        return ret
+
+    def record(self, entrance: Entrance, lookups: Set[Any]) -> None:
+        self.forget(entrance)
+        if _ItemLookupRecorder.ANY_ITEM in lookups:
+            # can't tell what the rule depends on, so it gets tested on every update
+            return
+        self.by_entrance[entrance] = lookups
+        for item in lookups:
+            self.by_item.setdefault(item, set()).add(entrance)
+
+    def forget(self, entrance: Entrance) -> None:
+        lookups = self.by_entrance.pop(entrance, None)
+        if lookups:
+            for item in lookups:
+                self.by_item[item].discard(entrance)
+
+    def get_retest_queue(self, blocked_connections: Set[Entrance], items: Counter[str]) -> deque:
+        """Returns the blocked entrances that may have become passable since the last update."""
+        items_seen = self.items_seen
+        queue = deque(blocked_connections.difference(self.by_entrance))
+        for item in items.keys() | items_seen.keys():
+            if items[item] != items_seen[item]:
+                dependents = self.by_item.get(item)
+                if dependents:
+                    queue.extend(dependents)
+        return queue
+
+
+class CompiledItemNames(frozenset):
+    """
+    Set of item names that CollectionState.has_all, has_any, has_from_list_unique and count_from_list_unique test with
+    a single bitmask operation, instead of one prog_items lookup per name. Build it once, e.g. when setting rules, and
+    pass it wherever those methods take item names.
+    """
+    __slots__ = ("masks",)
+
+    bits: ClassVar[Dict[str, Dict[str, int]]] = {}
+    """game -> item name -> interned bit of that item name"""
+    masks: Dict[str, int]
+    """game -> bitmask of these item names, built on first use"""
+
+    def __new__(cls, items: Iterable[str]) -> CompiledItemNames:
+        self = super().__new__(cls, items)
+        self.masks = {}
+        return self
+
+    @classmethod
+    def get_bit(cls, game: str, item: str) -> int:
+        game_bits = cls.bits.setdefault(game, {})
+        bit = game_bits.get(item)
+        if bit is None:
+            bit = game_bits[item] = 1 << len(game_bits)
+        return bit
+
+    def get_mask(self, game: str) -> int:
+        mask = self.masks.get(game)
+        if mask is None:
+            mask = 0
+            for item in self:
+                mask |= self.get_bit(game, item)
+            self.masks[game] = mask
+        return mask
+
+
+class CompiledItemCounts(Mapping[str, int]):
+    """
+    Immutable mapping of item names to counts that CollectionState.has_all_counts and has_any_count first test as a
+    bitmask of the item names, only looking up counts above one individually.
+    """
+    __slots__ = ("_counts", "names", "multiple", "trivial")
+
+    names: CompiledItemNames
+    """names with a count of at least one"""
+    multiple: Dict[str, int]
+    """names with a count above one, with their count"""
+    trivial: bool
+    """True if any count is zero or less, which is met without having the item"""
+
+    def __init__(self, item_counts: Mapping[str, int]) -> None:
+        self._counts = dict(item_counts)
+        self.names = CompiledItemNames(item for item, count in self._counts.items() if count > 0)
+        self.multiple = {item: count for item, count in self._counts.items() if count > 1}
+        self.trivial = any(count <= 0 for count in self._counts.values())
+
+    def __getitem__(self, item: str) -> int:
+        return self._counts[item]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._counts)
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+
 class CollectionState():
     prog_items: Dict[int, Counter[str]]
     multiworld: MultiWorld
@@ -737,6 +967,8 @@ class CollectionState():
     locations_checked: Set[Location]
     stale: Dict[int, bool]
     allow_partial_entrances: bool
+    entrance_dependencies: Dict[int, EntranceDependencies]
+    item_masks: Dict[int, int]
     additional_init_functions: List[Callable[[CollectionState, MultiWorld], None]] = []
     additional_copy_functions: List[Callable[[CollectionState, CollectionState], CollectionState]] = []
 
@@ -751,6 +983,8 @@ class CollectionState():
         self.locations_checked = set()
         self.stale = {player: True for player in parent.get_all_ids()}
         self.allow_partial_entrances = allow_partial_entrances
+        self.entrance_dependencies = {}
+        self.item_masks = {}
         for function in self.additional_init_functions:
             function(self, parent)
         for items in parent.precollected_items.values():
@@ -761,8 +995,15 @@ class CollectionState():
         self.stale[player] = False
         world: AutoWorld.World = self.multiworld.worlds[player]
         reachable_regions = self.reachable_regions[player]
-        queue = deque(self.blocked_connections[player])
         start: Region = world.get_region(world.origin_region_name)
+        incremental = world.incremental_reachability and world.explicit_indirect_conditions
+        if incremental and start in reachable_regions and player in self.entrance_dependencies:
+            queue = self.entrance_dependencies[player].get_retest_queue(self.blocked_connections[player],
+                                                                        self.prog_items[player])
+        else:
+            queue = deque(self.blocked_connections[player])
+            if incremental:
+                self.entrance_dependencies[player] = EntranceDependencies()
 
         # init on first call - this can't be done on construction since the regions don't exist yet
         if start not in reachable_regions:
@@ -770,7 +1011,9 @@ class CollectionState():
             self.blocked_connections[player].update(start.exits)
             queue.extend(start.exits)
 
-        if world.explicit_indirect_conditions:
+        if incremental:
+            self._update_reachable_regions_incremental(player, queue)
+        elif world.explicit_indirect_conditions:
             self._update_reachable_regions_explicit_indirect_conditions(player, queue)
         else:
             self._update_reachable_regions_auto_indirect_conditions(player, queue)
@@ -799,6 +1042,47 @@ class CollectionState():
                     if new_entrance in blocked_connections and new_entrance not in queue:
                         queue.append(new_entrance)
 
+    def _update_reachable_regions_incremental(self, player: int, queue: deque):
+        reachable_regions = self.reachable_regions[player]
+        blocked_connections = self.blocked_connections[player]
+        dependencies = self.entrance_dependencies[player]
+        player_prog_items = self.prog_items[player]
+        # run BFS on the connections that may have changed, recording which items the blocked ones looked up
+        while queue:
+            connection = queue.popleft()
+            if connection not in blocked_connections:
+                continue  # queued more than once
+            new_region = connection.connected_region
+            if new_region in reachable_regions:
+                blocked_connections.remove(connection)
+                dependencies.forget(connection)
+                continue
+            lookups: Set[Any] = set()
+            # only this state's mapping is changed, the Counter itself is left as it is
+            self.prog_items[player] = _ItemLookupRecorder(player_prog_items, lookups)  # type: ignore[assignment]
+            try:
+                reached = connection.can_reach(self)
+            finally:
+                self.prog_items[player] = player_prog_items
+            if not reached:
+                dependencies.record(connection, lookups)
+            elif self.allow_partial_entrances and not new_region:
+                dependencies.record(connection, {_ItemLookupRecorder.ANY_ITEM})
+            else:
+                assert new_region, f"tried to search through an Entrance \"{connection}\" with no connected Region"
+                reachable_regions.add(new_region)
+                blocked_connections.remove(connection)
+                dependencies.forget(connection)
+                blocked_connections.update(new_region.exits)
+                queue.extend(new_region.exits)
+                self.path[new_region] = (new_region.name, self.path.get(connection, None))
+
+                # Retry connections if the new region can unblock them
+                for new_entrance in self.multiworld.indirect_connections.get(new_region, set()):
+                    if new_entrance in blocked_connections and new_entrance not in queue:
+                        queue.append(new_entrance)
+        dependencies.items_seen = player_prog_items.copy()
+
     def _update_reachable_regions_auto_indirect_conditions(self, player: int, queue: deque):
         reachable_regions = self.reachable_regions[player]
         blocked_connections = self.blocked_connections[player]
@@ -831,10 +1115,13 @@ class CollectionState():
                                  self.reachable_regions.items()}
         ret.blocked_connections = {player: entrance_set.copy() for player, entrance_set in
                                    self.blocked_connections.items()}
+        ret.item_masks = self.item_masks.copy()
         ret.advancements = self.advancements.copy()
         ret.path = self.path.copy()
         ret.locations_checked = self.locations_checked.copy()
         ret.allow_partial_entrances = self.allow_partial_entrances
+        ret.entrance_dependencies = {player: dependencies.copy() for player, dependencies
+                                     in self.entrance_dependencies.items()}
         for function in self.additional_copy_functions:
             ret = function(self, ret)
         return ret
@@ -888,11 +1175,34 @@ class CollectionState():
     def has(self, item: str, player: int, count: int = 1) -> bool:
         return self.prog_items[player][item] >= count
 
+    def get_item_mask(self, player: int) -> Optional[int]:
+        """
+        Returns the bitmask of CompiledItemNames bits of all items the player has at least once, or None while the
+        player's item lookups are being recorded for incremental reachability.
+        """
+        owned = self.item_masks.get(player)
+        if owned is None:
+            player_prog_items = self.prog_items[player]
+            if type(player_prog_items) is _ItemLookupRecorder:
+                return None
+            owned = 0
+            game = self.multiworld.game[player]
+            for item, count in player_prog_items.items():
+                if count > 0:
+                    owned |= CompiledItemNames.get_bit(game, item)
+            self.item_masks[player] = owned
+        return owned
+
     # for loops are specifically used in all/any/count methods, instead of all()/any()/sum(), to avoid the overhead of
     # creating and iterating generator instances. In `return all(player_prog_items[item] for item in items)`, the
     # argument to all() would be a new generator instance, for example.
     def has_all(self, items: Iterable[str], player: int) -> bool:
         """Returns True if each item name of items is in state at least once."""
+        if type(items) is CompiledItemNames:
+            owned = self.get_item_mask(player)
+            if owned is not None:
+                mask = items.get_mask(self.multiworld.game[player])
+                return owned & mask == mask
         player_prog_items = self.prog_items[player]
         for item in items:
             if not player_prog_items[item]:
@@ -901,6 +1211,10 @@ class CollectionState():
 
     def has_any(self, items: Iterable[str], player: int) -> bool:
         """Returns True if at least one item name of items is in state at least once."""
+        if type(items) is CompiledItemNames:
+            owned = self.get_item_mask(player)
+            if owned is not None:
+                return owned & items.get_mask(self.multiworld.game[player]) != 0
         player_prog_items = self.prog_items[player]
         for item in items:
             if player_prog_items[item]:
@@ -909,6 +1223,13 @@ class CollectionState():
 
     def has_all_counts(self, item_counts: Mapping[str, int], player: int) -> bool:
         """Returns True if each item name is in the state at least as many times as specified."""
+        if type(item_counts) is CompiledItemCounts:
+            owned = self.get_item_mask(player)
+            if owned is not None:
+                mask = item_counts.names.get_mask(self.multiworld.game[player])
+                if owned & mask != mask:
+                    return False
+                item_counts = item_counts.multiple
         player_prog_items = self.prog_items[player]
         for item, count in item_counts.items():
             if player_prog_items[item] < count:
@@ -917,6 +1238,10 @@ class CollectionState():
 
     def has_any_count(self, item_counts: Mapping[str, int], player: int) -> bool:
         """Returns True if at least one item name is in the state at least as many times as specified."""
+        if type(item_counts) is CompiledItemCounts and not item_counts.trivial:
+            owned = self.get_item_mask(player)
+            if owned is not None and not owned & item_counts.names.get_mask(self.multiworld.game[player]):
+                return False
         player_prog_items = self.prog_items[player]
         for item, count in item_counts.items():
             if player_prog_items[item] >= count:
@@ -939,6 +1264,10 @@ class CollectionState():
     def has_from_list_unique(self, items: Iterable[str], player: int, count: int) -> bool:
         """Returns True if the state contains at least `count` items matching any of the item names from a list.
         Ignores duplicates of the same item."""
+        if type(items) is CompiledItemNames:
+            owned = self.get_item_mask(player)
+            if owned is not None:
+                return (owned & items.get_mask(self.multiworld.game[player])).bit_count() >= count
         found: int = 0
         player_prog_items = self.prog_items[player]
         for item_name in items:
@@ -957,6 +1286,10 @@ class CollectionState():
 
     def count_from_list_unique(self, items: Iterable[str], player: int) -> int:
         """Returns the cumulative count of items from a list present in state. Ignores duplicates of the same item."""
+        if type(items) is CompiledItemNames:
+            owned = self.get_item_mask(player)
+            if owned is not None:
+                return (owned & items.get_mask(self.multiworld.game[player])).bit_count()
         player_prog_items = self.prog_items[player]
         total = 0
         for item_name in items:
@@ -1012,6 +1345,7 @@ class CollectionState():
         changed = self.multiworld.worlds[item.player].collect(self, item)
 
         self.stale[item.player] = True
+        self.item_masks.pop(item.player, None)
 
         if changed and not prevent_sweep:
             self.sweep_for_advancements()
@@ -1028,13 +1362,16 @@ class CollectionState():
         """
         assert count > 0
         self.prog_items[player][item] += count
+        self.item_masks.pop(player, None)
 
     def remove(self, item: Item):
         changed = self.multiworld.worlds[item.player].remove(self, item)
+        self.item_masks.pop(item.player, None)
         if changed:
             # invalidate caches, nothing can be trusted anymore now
             self.reachable_regions[item.player] = set()
             self.blocked_connections[item.player] = set()
+            self.entrance_dependencies.pop(item.player, None)
             self.stale[item.player] = True
 
     def remove_item(self, item: str, player: int, count: int = 1) -> None:
@@ -1049,6 +1386,7 @@ class CollectionState():
         self.prog_items[player][item] -= count
         if self.prog_items[player][item] < 1:
             del (self.prog_items[player][item])
+        self.item_masks.pop(player, None)
 
     def set_item(self, item: str, player: int, count: int) -> None:
         """
@@ -1063,6 +1401,7 @@ class CollectionState():
             del (self.prog_items[player][item])
         else:
             self.prog_items[player][item] = count
+        self.item_masks.pop(player, None)
 
 
 class EntranceType(IntEnum):
@@ -1574,15 +1913,18 @@ class Spoiler:
         prog_locations = {location for location in multiworld.get_filled_locations() if location.item.advancement}
         state_cache: List[Optional[CollectionState]] = [None]
         collection_spheres: List[Set[Location]] = []
+        sphere_cache = multiworld.get_sphere_cache()
         state = CollectionState(multiworld)
         sphere_candidates = set(prog_locations)
         logging.debug('Building up collection spheres.')
-        while sphere_candidates:
+        for logical_sphere in sphere_cache.spheres:
+            if not sphere_candidates:
+                break
 
             # build up spheres of collection radius.
             # Everything in each sphere is independent from each other in dependencies and only depends on lower spheres
-
-            sphere = {location for location in sphere_candidates if state.can_reach(location)}
+            # Non-progress items don't change state, so these are the progress locations of the logical spheres.
+            sphere = logical_sphere & sphere_candidates
 
             for location in sphere:
                 state.collect(location.item, True, location)
@@ -1594,16 +1936,21 @@ class Spoiler:
             logging.debug('Calculated sphere %i, containing %i of %i progress items.', len(collection_spheres),
                           len(sphere),
                           len(prog_locations))
-            if not sphere:
-                logging.debug('The following items could not be reached: %s', ['%s (Player %d) at %s (Player %d)' % (
-                    location.item.name, location.item.player, location.name, location.player) for location in
-                                                                               sphere_candidates])
-                if any([multiworld.worlds[location.item.player].options.accessibility != 'minimal' for location in sphere_candidates]):
-                    raise RuntimeError(f'Not all progression items reachable ({sphere_candidates}). '
-                                       f'Something went terribly wrong here.')
-                else:
-                    self.unreachables = sphere_candidates
-                    break
+
+        if sphere_candidates:
+            collection_spheres.append(set())
+            state_cache.append(state.copy())
+            logging.debug('The following items could not be reached: %s', ['%s (Player %d) at %s (Player %d)' % (
+                location.item.name, location.item.player, location.name, location.player) for location in
+                                                                           sphere_candidates])
+            if any([multiworld.worlds[location.item.player].options.accessibility != 'minimal'
+                    for location in sphere_candidates]):
+                raise RuntimeError(f'Not all progression items reachable ({sphere_candidates}). '
+                                   f'Something went terribly wrong here.')
+            else:
+                self.unreachables = sphere_candidates
+        # nothing reads the sweep after the playthrough, don't hold on to its state for the rest of generation
+        multiworld._sphere_cache = None
 
         # in the second phase, we cull each sphere such that the game is still beatable,
         # reducing each range of influence to the bare minimum required inside it
@@ -20,8 +20,10 @@ class FillError(RuntimeError):
         super().__init__(*args)
 
 
-def _log_fill_progress(name: str, placed: int, total_items: int) -> None:
-    logging.info(f"Current fill step ({name}) at {placed}/{total_items} items placed.")
+def _log_fill_progress(name: str, placed: int, total_items: int, swaps_attempted: int = 0,
+                       sweeps_avoided: int = 0) -> None:
+    swap_info = f" {swaps_attempted} swaps attempted, {sweeps_avoided} sweeps avoided." if swaps_attempted else ""
+    logging.info(f"Current fill step ({name}) at {placed}/{total_items} items placed.{swap_info}")
 
 
 def sweep_from_pool(base_state: CollectionState, itempool: typing.Sequence[Item] = tuple(),
@@ -33,6 +35,55 @@ def sweep_from_pool(base_state: CollectionState, itempool: typing.Sequence[Item]
     return new_state
 
 
+class _SwapStates:
+    """
+    States that fill_restrictive tests swap candidates with. They only depend on the item pool and the current
+    placements, so they're kept until clear() is called after either changed.
+    """
+
+    def __init__(self, multiworld: MultiWorld, base_state: CollectionState, single_player_placement: bool) -> None:
+        self.multiworld = multiworld
+        self.base_state = base_state
+        self.single_player_placement = single_player_placement
+        self.states: typing.Dict[typing.Tuple[Location, bool], CollectionState] = {}
+        # the state with every placement kept, to derive each swap candidate's state from
+        self.baseline: typing.Optional[CollectionState] = None
+        self.sweeps_avoided = 0
+
+    def clear(self) -> None:
+        self.states.clear()
+        self.baseline = None
+
+    def take_out(self, location: Location, unsafe: bool, item_pool: typing.List[Item],
+                 player: int) -> CollectionState:
+        """
+        Takes the item out of location and returns the state to test placing another item there with.
+        If unsafe, the state assumes the item that was taken out gets collected as well.
+        """
+        placed_item = location.item
+        assert placed_item, f"{location} has no item to take out"
+        swap_state = self.states.get((location, unsafe))
+        if swap_state:
+            location.item = None
+            placed_item.location = None
+            self.sweeps_avoided += 1
+            return swap_state
+        sweep_locations = self.multiworld.get_filled_locations(player) if self.single_player_placement else None
+        if not self.baseline:
+            self.baseline = sweep_from_pool(self.base_state, item_pool, sweep_locations)
+        location.item = None
+        placed_item.location = None
+        if location not in self.baseline.advancements:
+            # placed_item was never collected in the baseline, so taking it out changes nothing
+            self.sweeps_avoided += 1
+            swap_state = sweep_from_pool(self.baseline, [placed_item], sweep_locations) if unsafe else self.baseline
+        else:
+            swap_state = sweep_from_pool(self.base_state, [placed_item, *item_pool] if unsafe else item_pool,
+                                         sweep_locations)
+        self.states[location, unsafe] = swap_state
+        return swap_state
+
+
 def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locations: typing.List[Location],
                      item_pool: typing.List[Item], single_player_placement: bool = False, lock: bool = False,
                      swap: bool = True, on_place: typing.Optional[typing.Callable[[Location], None]] = None,
@@ -55,6 +106,8 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
     placements: typing.List[Location] = []
     cleanup_required = False
     swapped_items: typing.Counter[typing.Tuple[int, str, bool]] = Counter()
+    swap_states = _SwapStates(multiworld, base_state, single_player_placement)
+    swaps_attempted = 0
     reachable_items: typing.Dict[int, typing.Deque[Item]] = {}
     for item in item_pool:
         reachable_items.setdefault(item.player, deque()).append(item)
@@ -85,6 +138,7 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
         maximum_exploration_state = sweep_from_pool(
             base_state, item_pool + unplaced_items, multiworld.get_filled_locations(item.player)
             if single_player_placement else None)
+        swap_states.clear()
 
         has_beaten_game = multiworld.has_beaten_game(maximum_exploration_state)
 
@@ -128,11 +182,8 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
                         if swap_count > 1:
                             continue
 
-                        location.item = None
-                        placed_item.location = None
-                        swap_state = sweep_from_pool(base_state, [placed_item, *item_pool] if unsafe else item_pool,
-                                                     multiworld.get_filled_locations(item.player)
-                                                     if single_player_placement else None)
+                        swaps_attempted += 1
+                        swap_state = swap_states.take_out(location, unsafe, item_pool, item.player)
                         # unsafe means swap_state assumes we can somehow collect placed_item before item_to_place
                         # by continuing to swap, which is not guaranteed. This is unsafe because there is no mechanic
                         # to clean that up later, so there is a chance generation fails.
@@ -168,14 +219,15 @@ def fill_restrictive(multiworld: MultiWorld, base_state: CollectionState, locati
             multiworld.push_item(spot_to_fill, item_to_place, False)
             spot_to_fill.locked = lock
             placements.append(spot_to_fill)
+            swap_states.clear()
             placed += 1
             if not placed % 1000:
-                _log_fill_progress(name, placed, total)
+                _log_fill_progress(name, placed, total, swaps_attempted, swap_states.sweeps_avoided)
             if on_place:
                 on_place(spot_to_fill)
 
     if total > 1000:
-        _log_fill_progress(name, placed, total)
+        _log_fill_progress(name, placed, total, swaps_attempted, swap_states.sweeps_avoided)
 
     if cleanup_required:
         # validate all placements and remove invalid ones
@@ -14,14 +14,68 @@ from Fill import FillError, balance_multiworld_progression, distribute_items_res
     parse_planned_blocks, distribute_planned_blocks, resolve_early_locations_for_planned
 from Options import StartInventoryPool
 from Utils import __version__, output_path, version_tuple
-from settings import get_settings
+from settings import GeneratorOptions, get_settings
 from worlds import AutoWorld
 from worlds.generic.Rules import exclusion_rules, locality_rules
 
 __all__ = ["main"]
 
+# magic numbers of zip (including AP containers), gzip, bzip2, xz and png files
+compressed_file_signatures = (b"PK\x03\x04", b"\x1f\x8b", b"BZh", b"\xfd7zXZ", b"\x89PNG")
+
+
+class _OutputArchive:
+    """
+    Zips output directories on a thread of its own as soon as they're done, storing already compressed files.
+    Written next to path and only moved there once everything was added successfully.
+    """
+
+    def __init__(self, path: str, compresslevel: int) -> None:
+        self.path = path
+        self.zip_file = zipfile.ZipFile(path + ".part", mode="w", compression=zipfile.ZIP_DEFLATED,
+                                        compresslevel=compresslevel)
+        self.pool = concurrent.futures.ThreadPoolExecutor(1, thread_name_prefix="OutputArchive")
+        self.futures: list[concurrent.futures.Future[None]] = []
+        self.arcnames: set[str] = set()
+
+    def __enter__(self) -> "_OutputArchive":
+        return self
+
+    def __exit__(self, exc_type: type[BaseException] | None, *exc_info: object) -> None:
+        self.pool.shutdown(cancel_futures=exc_type is not None)
+        self.zip_file.close()
+        try:
+            if exc_type is None:
+                for future in self.futures:
+                    future.result()
+                os.replace(self.zip_file.filename, self.path)
+        finally:
+            if os.path.exists(self.zip_file.filename):
+                os.remove(self.zip_file.filename)
+
+    def add_directory(self, directory: str) -> None:
+        self.futures.append(self.pool.submit(self._write_directory, directory))
+
+    def _write_directory(self, directory: str) -> None:
+        for file in os.scandir(directory):
+            # every output directory is flattened into the archive root, so names have to be unique across all of them
+            if file.name in self.arcnames:
+                raise FileExistsError(f"{file.name} was output more than once")
+            self.arcnames.add(file.name)
+            compress_type = None
+            if file.is_file():
+                with open(file.path, "rb") as f:
+                    head = f.read(5)
+                # multidata before version 4 is a zlib'd pickle, version 4 keeps its location columns uncompressed
+                if head.startswith(compressed_file_signatures) or \
+                        file.name.endswith(".archipelago") and head[:1] != bytes([4]):
+                    compress_type = zipfile.ZIP_STORED
+            self.zip_file.write(file.path, arcname=file.name, compress_type=compress_type)
+
 
 def main(args, seed=None, baked_server_options: dict[str, object] | None = None):
+    # fail before generating, instead of after everything but the multidata was written
+    multidata_format = GeneratorOptions.MultidataFormat(get_settings().generator.multidata_format)
     if not baked_server_options:
         baked_server_options = get_settings().server_options.as_dict()
     assert isinstance(baked_server_options, dict)
@@ -218,18 +272,30 @@ def main(args, seed=None, baked_server_options: dict[str, object] | None = None)
         logger.info('Done. Skipped multidata modification. Total time: %s', time.perf_counter() - start)
         return multiworld
 
+    zipfilename = output_path(f"AP_{multiworld.seed_name}.zip")
+    logger.info(f"Creating final archive at {zipfilename}")
     output = tempfile.TemporaryDirectory()
-    with output as temp_dir:
+    with output as temp_dir, _OutputArchive(zipfilename, get_settings().generator.zip_compression_level) as archive:
+        def output_directory(name: str) -> str:
+            # every output task gets its own directory, so it can be zipped as soon as the task is done
+            directory = os.path.join(temp_dir, name)
+            os.mkdir(directory)
+            return directory
+
         output_players = [player for player in multiworld.player_ids if AutoWorld.World.generate_output.__code__
                           is not multiworld.worlds[player].generate_output.__code__]
+        player_directories = {player: output_directory(f"P{player}") for player in output_players}
         with concurrent.futures.ThreadPoolExecutor(len(output_players) + 2) as pool:
             check_accessibility_task = pool.submit(multiworld.fulfills_accessibility)
 
-            output_file_futures = [pool.submit(AutoWorld.call_stage, multiworld, "generate_output", temp_dir)]
+            stage_directory = output_directory("stage")
+            output_directories = {pool.submit(AutoWorld.call_stage, multiworld, "generate_output", stage_directory):
+                                  stage_directory}
             for player in output_players:
                 # skip starting a thread for methods that say "pass".
-                output_file_futures.append(
-                    pool.submit(AutoWorld.call_single, multiworld, "generate_output", player, temp_dir))
+                output_file_future = pool.submit(AutoWorld.call_single, multiworld, "generate_output", player,
+                                                 player_directories[player])
+                output_directories[output_file_future] = player_directories[player]
 
             # collect ER hint info
             er_hint_data: dict[int, dict[int, str]] = {}
@@ -334,13 +400,15 @@ def main(args, seed=None, baked_server_options: dict[str, object] | None = None)
                 }
                 AutoWorld.call_all(multiworld, "modify_multidata", multidata)
 
-                multidata = zlib.compress(pickle.dumps(multidata), 9)
-
-                with open(os.path.join(temp_dir, f'{outfilebase}.archipelago'), 'wb') as f:
-                    f.write(bytes([3]))  # version of format
-                    f.write(multidata)
+                with open(os.path.join(multidata_directory, f'{outfilebase}.archipelago'), 'wb') as f:
+                    if multidata_format == GeneratorOptions.MultidataFormat.SECTIONED:
+                        f.write(NetUtils.encode_multidata(multidata))
+                    else:
+                        f.write(bytes([3]))  # version of format
+                        f.write(zlib.compress(pickle.dumps(multidata), 9))
 
-            output_file_futures.append(pool.submit(write_multidata))
+            multidata_directory = output_directory("multidata")
+            output_directories[pool.submit(write_multidata)] = multidata_directory
             if not check_accessibility_task.result():
                 if not multiworld.can_beat_game():
                     raise FillError("Game appears as unbeatable. Aborting.", multiworld=multiworld)
@@ -348,24 +416,20 @@ def main(args, seed=None, baked_server_options: dict[str, object] | None = None)
                     logger.warning("Location Accessibility requirements not fulfilled.")
 
             # retrieve exceptions via .result() if they occurred.
-            for i, future in enumerate(concurrent.futures.as_completed(output_file_futures), start=1):
-                if i % 10 == 0 or i == len(output_file_futures):
-                    logger.info(f'Generating output files ({i}/{len(output_file_futures)}).')
+            for i, future in enumerate(concurrent.futures.as_completed(output_directories), start=1):
+                if i % 10 == 0 or i == len(output_directories):
+                    logger.info(f'Generating output files ({i}/{len(output_directories)}).')
                 future.result()
+                archive.add_directory(output_directories[future])
 
         if args.spoiler > 1:
             logger.info('Calculating playthrough.')
             multiworld.spoiler.create_playthrough(create_paths=args.spoiler > 2)
 
         if args.spoiler:
-            multiworld.spoiler.to_file(os.path.join(temp_dir, '%s_Spoiler.txt' % outfilebase))
-
-        zipfilename = output_path(f"AP_{multiworld.seed_name}.zip")
-        logger.info(f"Creating final archive at {zipfilename}")
-        with zipfile.ZipFile(zipfilename, mode="w", compression=zipfile.ZIP_DEFLATED,
-                             compresslevel=9) as zf:
-            for file in os.scandir(temp_dir):
-                zf.write(file.path, arcname=file.name)
+            spoiler_directory = output_directory("spoiler")
+            multiworld.spoiler.to_file(os.path.join(spoiler_directory, '%s_Spoiler.txt' % outfilebase))
+            archive.add_directory(spoiler_directory)
 
     logger.info('Done. Enjoy. Total Time: %s', time.perf_counter() - start)
     return multiworld
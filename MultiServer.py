@@ -2,6 +2,7 @@ from __future__ import annotations
 
 import argparse
 import asyncio
+import bisect
 import collections
 import contextlib
 import copy
@@ -12,6 +13,7 @@ import inspect
 import itertools
 import logging
 import math
+import mmap
 import operator
 import pickle
 import random
@@ -28,6 +30,7 @@ ModuleUpdate.update()
 
 if typing.TYPE_CHECKING:
     import ssl
+    from http.server import ThreadingHTTPServer
     from NetUtils import ServerConnection
 
 import colorama
@@ -43,7 +46,7 @@ import NetUtils
 import Utils
 from Utils import version_tuple, restricted_loads, Version, async_start, get_intended_text
 from NetUtils import Endpoint, ClientStatus, NetworkItem, decode, encode, NetworkPlayer, Permission, NetworkSlot, \
-    SlotType, LocationStore, Hint, HintStatus
+    SlotType, LocationStore, Hint, HintStatus, MultiData, PackedLocations, compact_encoding_tag, encode_compact
 from BaseClasses import ItemClassification
 
 
@@ -124,6 +127,345 @@ def get_saving_second(seed_name: str, interval: int = 60) -> int:
     return int(hashlib.sha256(seed_name.encode()).hexdigest(), 16) % interval
 
 
+class Histogram:
+    def __init__(self, buckets: typing.Sequence[float]) -> None:
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = "") -> typing.List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip([*self.buckets, "+Inf"], self.bucket_counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {cumulative}')
+        suffix = f"{{{labels}}}" if labels else ""
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+
+class ServerMetrics:
+    """
+    Process wide server metrics in the Prometheus text format, so all rooms of a MultiHoster are aggregated.
+    Nothing is recorded unless enabled.
+    """
+    latency_buckets = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+    fan_out_buckets = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+    # anything else a client sends is counted as "unknown", so clients can't create arbitrary label values
+    commands = frozenset({"Connect", "ConnectUpdate", "Sync", "LocationChecks", "LocationScouts", "CreateHints",
+                          "UpdateHint", "StatusUpdate", "Say", "GetDataPackage", "Bounce", "Get", "Set", "SetNotify"})
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.contexts: weakref.WeakSet[Context] = weakref.WeakSet()
+        self.command_seconds: typing.Dict[str, Histogram] = {}
+        self.received_bytes = 0
+        self.sent_bytes = 0
+        self.broadcast_recipients = Histogram(self.fan_out_buckets)
+        self.save_seconds = Histogram(self.latency_buckets)
+
+    def observe_command(self, cmd: typing.Any, seconds: float) -> None:
+        if not isinstance(cmd, str) or cmd not in self.commands:
+            cmd = "unknown"
+        with self.lock:
+            histogram = self.command_seconds.get(cmd)
+            if not histogram:
+                histogram = self.command_seconds[cmd] = Histogram(self.latency_buckets)
+            histogram.observe(seconds)
+
+    def observe_received(self, data: typing.Union[str, bytes]) -> None:
+        with self.lock:
+            self.received_bytes += len(data if isinstance(data, bytes) else data.encode())
+
+    def observe_sent(self, data: typing.Union[str, bytes], recipients: int = 1) -> None:
+        with self.lock:
+            self.sent_bytes += len(data if isinstance(data, bytes) else data.encode()) * recipients
+
+    def observe_broadcast(self, data: typing.Union[str, bytes], recipients: int) -> None:
+        self.observe_sent(data, recipients)
+        with self.lock:
+            self.broadcast_recipients.observe(recipients)
+
+    def observe_save(self, seconds: float) -> None:
+        with self.lock:
+            self.save_seconds.observe(seconds)
+
+    def render(self) -> str:
+        contexts = list(self.contexts)
+        with self.lock:
+            lines = ["# TYPE archipelago_command_seconds histogram"]
+            for cmd, histogram in sorted(self.command_seconds.items()):
+                lines += histogram.render("archipelago_command_seconds", f'cmd="{cmd}"')
+            lines += [
+                "# TYPE archipelago_received_bytes_total counter",
+                f"archipelago_received_bytes_total {self.received_bytes}",
+                "# TYPE archipelago_sent_bytes_total counter",
+                f"archipelago_sent_bytes_total {self.sent_bytes}",
+                "# TYPE archipelago_broadcast_recipients histogram",
+                *self.broadcast_recipients.render("archipelago_broadcast_recipients"),
+                "# TYPE archipelago_save_seconds histogram",
+                *self.save_seconds.render("archipelago_save_seconds"),
+            ]
+        lines += [
+            "# TYPE archipelago_rooms gauge",
+            f"archipelago_rooms {len(contexts)}",
+            "# TYPE archipelago_endpoints gauge",
+            f"archipelago_endpoints {sum(len(ctx.endpoints) for ctx in contexts)}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> "ThreadingHTTPServer":
+        """Enables metrics and serves them over http in a daemon thread."""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        metrics = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args: typing.Any) -> None:
+                pass  # scrapes would flood the server log
+
+        self.enabled = True
+        http_server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=http_server.serve_forever, name="MetricsServer", daemon=True).start()
+        logging.info(f"Serving metrics at http://{host}:{http_server.server_port}/metrics")
+        return http_server
+
+
+metrics = ServerMetrics()
+
+
+# checksum -> json encoded game data package, shared by all Contexts of the process, like the static server data
+encoded_game_packages: typing.OrderedDict[str, str] = collections.OrderedDict()
+encoded_game_packages_limit = 1024
+
+
+def encode_game_package(game_package: typing.Dict[str, typing.Any]) -> str:
+    """Returns the encoded game data package, reusing the encoding of earlier calls with the same checksum."""
+    checksum = game_package.get("checksum")
+    if not checksum:  # data packages embedded by old generators may not have one
+        return encode(game_package)
+    try:
+        encoded_game_packages.move_to_end(checksum)
+        return encoded_game_packages[checksum]
+    except KeyError:
+        encoded = encoded_game_packages[checksum] = encode(game_package)
+        if len(encoded_game_packages) > encoded_game_packages_limit:
+            encoded_game_packages.popitem(last=False)
+        return encoded
+
+
+# savegame fields that are small enough to be journaled as a whole whenever they change
+journal_replaced_fields = ("hints_used", "name_aliases", "client_game_state", "client_activity_timers",
+                           "client_connection_timers", "random_state", "group_collected", "game_options")
+
+
+def apply_save_journal(savedata: dict, entry: dict) -> None:
+    """Merges a savegame journal entry into savedata. Entries only contain new values, so replaying is idempotent."""
+    for key in journal_replaced_fields:
+        if key in entry:
+            savedata[key] = entry[key]
+    for key, (start, items) in entry.get("received_items", {}).items():
+        savedata["received_items"][key] = savedata["received_items"].get(key, [])[:start] + items
+    savedata["location_checks"].update(entry.get("location_checks", {}))
+    savedata["hints"].update(entry.get("hints", {}))
+    savedata.setdefault("stored_data", {}).update(entry.get("stored_data", {}))
+
+
+def read_save_journal(data: bytes) -> typing.Tuple[typing.List[typing.Dict[str, typing.Any]], int]:
+    """
+    Reads the entries of a savegame journal, ignoring a record that was cut off while it was written.
+    Returns the entries and the length of data up to the end of the last complete record.
+    """
+    entries: typing.List[typing.Dict[str, typing.Any]] = []
+    position = 0
+    while position + 4 <= len(data):
+        size = int.from_bytes(data[position:position + 4], "little")
+        if position + 4 + size > len(data):
+            break
+        entries.append(restricted_loads(zlib.decompress(data[position + 4:position + 4 + size])))
+        position += 4 + size
+    return entries, position
+
+
+def write_journal_record(f: typing.BinaryIO, entry: dict) -> int:
+    """Appends entry in the format read by read_save_journal, returning the number of bytes written."""
+    record = zlib.compress(pickle.dumps(entry))
+    f.write(len(record).to_bytes(4, "little"))
+    f.write(record)
+    return 4 + len(record)
+
+
+class DataStorage:
+    """
+    Values clients share through Get, Set and SetNotify. A SetNotify key ending in * subscribes to every key that
+    starts with the rest of it. Notifications of rapid changes to one key can be coalesced into one SetReply per
+    coalesce_window seconds. Once persist_to is called, the storage keeps its own append-only file and is left out
+    of the savegame. The file starts with the storage_id kept in the savegame, so a file left behind by another
+    savegame is not loaded.
+    """
+    wildcard = "*"
+    # the file is rewritten from scratch once it grows this far beyond the size it had when last rewritten
+    compact_growth = 1024 * 1024
+
+    def __init__(self,
+                 broadcast: typing.Callable[[typing.Iterable[Client], typing.List[typing.Dict[str, typing.Any]]], None],
+                 coalesce_window: float = 0) -> None:
+        self.broadcast = broadcast
+        self.coalesce_window = coalesce_window
+        self.data: typing.Dict[str, typing.Any] = {}
+        self.subscribers: typing.Dict[str, weakref.WeakSet[Client]] = collections.defaultdict(weakref.WeakSet)
+        self.prefix_subscribers: typing.Dict[str, weakref.WeakSet[Client]] = collections.defaultdict(weakref.WeakSet)
+        # key -> SetReply for its subscribers, waiting for the end of its coalesce window
+        self.pending: typing.Dict[str, typing.Dict[str, typing.Any]] = {}
+        # key -> pickled size of its value, dropped on write and measured again when asked for
+        self.sizes: typing.Dict[str, int] = {}
+        self.dirty: typing.Set[str] = set()
+        self.filename: typing.Optional[str] = None
+        self.storage_id: typing.Optional[int] = None
+        self.file_bytes = 0
+        self.compacted_bytes = 0
+        self.lock = threading.Lock()
+
+    def replace(self, data: typing.Dict[str, typing.Any]) -> None:
+        self.data = data
+        self.sizes.clear()
+        self.dirty.update(data)
+
+    def set(self, key: str, default: typing.Any,
+            operations: typing.List[typing.Dict[str, typing.Any]]) -> typing.Tuple[typing.Any, typing.Any]:
+        """Applies operations to the value of key, returning the original and the new value."""
+        value = self.data.get(key, default)
+        original_value = copy.copy(value)
+        for operation in operations:
+            func = modify_functions[operation["operation"]]
+            value = func(value, operation["value"])
+        self.data[key] = value
+        self.sizes.pop(key, None)
+        self.dirty.add(key)
+        return original_value, value
+
+    def subscribe(self, client: Client, keys: typing.Iterable[str]) -> None:
+        for key in keys:
+            if key.endswith(self.wildcard):
+                self.prefix_subscribers[key[:-len(self.wildcard)]].add(client)
+            else:
+                self.subscribers[key].add(client)
+
+    def get_subscribers(self, key: str) -> typing.Set[Client]:
+        targets: typing.Set[Client] = set(self.subscribers.get(key, ()))
+        if self.prefix_subscribers:
+            for end in range(len(key) + 1):
+                clients = self.prefix_subscribers.get(key[:end])
+                if clients:
+                    targets.update(clients)
+        return targets
+
+    def notify(self, reply: typing.Dict[str, typing.Any], requester: typing.Optional[Client] = None) -> None:
+        """Sends the SetReply to the subscribers of its key, and to requester if it asked for a reply."""
+        key = reply["key"]
+        if not self.coalesce_window:
+            targets = self.get_subscribers(key)
+            if requester:
+                targets.add(requester)
+            if targets:
+                self.broadcast(targets, [reply])
+            return
+        if requester:
+            self.broadcast([requester], [reply])
+        pending = self.pending.get(key)
+        if pending:
+            # subscribers see the change from before the first coalesced Set to the latest value
+            self.pending[key] = {**reply, "original_value": pending["original_value"]}
+        elif self.get_subscribers(key):
+            self.pending[key] = reply
+            asyncio.get_running_loop().call_later(self.coalesce_window, self._send_pending, key)
+
+    def _send_pending(self, key: str) -> None:
+        reply = self.pending.pop(key, None)
+        targets = self.get_subscribers(key)
+        if reply and targets:
+            self.broadcast(targets, [reply])
+
+    def get_size(self, key: str) -> int:
+        try:
+            return self.sizes[key]
+        except KeyError:
+            size = self.sizes[key] = len(pickle.dumps(self.data[key]))
+            return size
+
+    def get_total_size(self) -> int:
+        return sum(self.get_size(key) for key in self.data)
+
+    def persist_to(self, filename: str, storage_id: typing.Optional[int] = None) -> None:
+        """
+        Loads the storage file, if there is one that belongs to storage_id, and keeps the storage in it from here on.
+        Without a storage_id, a new one is made up and any existing file is replaced on the next flush.
+        """
+        try:
+            with open(filename, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b""
+        entries, end = read_save_journal(data)
+        if data and (storage_id is None or not entries or entries[0] != {"storage_id": storage_id}):
+            if storage_id is not None:
+                logging.warning("Ignoring data storage file that does not belong to the save file.")
+            entries, end = [], 0
+        elif end < len(data):
+            # appended records would otherwise end up behind the cut off one, where they can't be read back
+            logging.warning("Dropping data storage record that was cut off while it was written.")
+            with open(filename, "r+b") as f:
+                f.truncate(end)
+        for entry in entries[1:]:
+            self.data.update(entry)
+        self.sizes.clear()
+        self.file_bytes = self.compacted_bytes = end
+        self.storage_id = random.getrandbits(62) if storage_id is None else storage_id
+        self.filename = filename
+
+    def take_changes(self) -> typing.Dict[str, typing.Any]:
+        """Returns the values of keys changed since the last call, for savegames that carry the storage themselves."""
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+        return {key: self.data[key] for key in dirty}
+
+    def flush(self) -> None:
+        """Appends the values of keys changed since the last flush to the storage file."""
+        if not self.filename:
+            return
+        import os
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+            if not dirty:
+                return
+            if self.file_bytes > self.compacted_bytes + self.compact_growth or not self.file_bytes:
+                temp_filename = self.filename + ".tmp"
+                with open(temp_filename, "wb") as f:
+                    self.file_bytes = self.compacted_bytes = \
+                        write_journal_record(f, {"storage_id": self.storage_id}) + \
+                        write_journal_record(f, dict(self.data))
+                os.replace(temp_filename, self.filename)
+            else:
+                with open(self.filename, "ab") as f:
+                    self.file_bytes += write_journal_record(f, {key: self.data[key] for key in dirty})
+
+
 class Client(Endpoint):
     version = Version(0, 0, 0)
     tags: typing.List[str]
@@ -132,12 +474,13 @@ class Client(Endpoint):
     no_items: bool
     no_locations: bool
     no_text: bool
+    compact_encoding: bool = False
 
     def __init__(self, socket: "ServerConnection", ctx: Context) -> None:
         super().__init__(socket)
         self.auth = False
-        self.team = None
-        self.slot = None
+        self.team: typing.Optional[int] = None
+        self.slot: typing.Optional[int] = None
         self.send_index = 0
         self.tags = []
         self.messageprocessor = client_message_processor(ctx, self)
@@ -189,9 +532,8 @@ class Context:
     hints_used: typing.Dict[typing.Tuple[int, int], int]
     groups: typing.Dict[int, typing.Set[int]]
     save_version = 2
-    stored_data: typing.Dict[str, object]
+    data_storage: DataStorage
     read_data: typing.Dict[str, object]
-    stored_data_notification_clients: typing.Dict[str, typing.Set[Client]]
     slot_info: typing.Dict[int, NetworkSlot]
     generator_version = Version(0, 0, 0)
     checksums: typing.Dict[str, str]
@@ -202,8 +544,8 @@ class Context:
     all_item_and_group_names: typing.Dict[str, typing.Set[str]]
     all_location_and_group_names: typing.Dict[str, typing.Set[str]]
     non_hintable_names: typing.Dict[str, typing.AbstractSet[str]]
-    spheres: typing.List[typing.Dict[int, typing.Set[int]]]
-    """ each sphere is { player: { location_id, ... } } """
+    location_spheres: typing.Dict[int, typing.Dict[int, int]]
+    """ player -> location_id -> number of the sphere the location is in """
     logger: logging.Logger
 
     def __init__(self, host: str, port: int, server_password: str, password: str, location_check_points: int,
@@ -212,13 +554,22 @@ class Context:
                  log_network: bool = False, logger: logging.Logger = logging.getLogger()):
         self.logger = logger
         super(Context, self).__init__()
+        metrics.contexts.add(self)
         self.slot_info = {}
         self.log_network = log_network
         self.endpoints = []
         self.clients = {}
+        # team -> game or tag -> clients, for routing Bounce; ctx.clients already indexes them by slot
+        self.clients_by_game: typing.Dict[int, typing.Dict[str, typing.Set[Client]]] = \
+            collections.defaultdict(lambda: collections.defaultdict(set))
+        self.clients_by_tag: typing.Dict[int, typing.Dict[str, typing.Set[Client]]] = \
+            collections.defaultdict(lambda: collections.defaultdict(set))
         self.compatibility: int = compatibility
         self.shutdown_task = None
         self.data_filename = None
+        # memory map of a loaded version 4 multidata file and the mapping reading it, closed by close_multidata
+        self.multidata_map: typing.Optional[mmap.mmap] = None
+        self.mapped_multidata: typing.Optional[MultiData] = None
         self.save_filename = None
         self.saving = False
         self.player_names: typing.Dict[team_slot, str] = {}
@@ -231,14 +582,21 @@ class Context:
         self.password = password
         self.server = None
         self.countdown_timer = 0
-        self.received_items = {}
+        self.received_items: typing.Dict[typing.Tuple[int, int, bool], typing.List[NetworkItem]] = {}
         self.start_inventory = {}
         self.name_aliases: typing.Dict[team_slot, str] = {}
         self.location_checks = collections.defaultdict(set)
+        # (team, slot) that received items since send_new_items last ran
+        self.new_items_slots: typing.Set[team_slot] = set()
+        # (team, slot) -> connected clients of that slot that handle items, kept in sync by update_item_receiver
+        self.item_receivers: typing.Dict[team_slot, typing.Set[Client]] = {}
         self.hint_cost = hint_cost
         self.location_check_points = location_check_points
         self.hints_used = collections.defaultdict(int)
         self.hints: typing.Dict[team_slot, typing.Set[Hint]] = collections.defaultdict(set)
+        # (team, finding_player, location) -> hints for that location, kept in sync with hints
+        self.hints_by_location: typing.Dict[typing.Tuple[int, int, int], typing.Set[Hint]] = \
+            collections.defaultdict(set)
         self.release_mode: str = release_mode
         self.remaining_mode: str = remaining_mode
         self.collect_mode: str = collect_mode
@@ -257,6 +615,15 @@ class Context:
         self.auto_save_interval = 60  # in seconds
         self.auto_saver_thread: typing.Optional[threading.Thread] = None
         self.save_dirty = False
+        # journal size in bytes after which the full savegame is rewritten, 0 to always write the full savegame
+        self.save_journal_size = 0
+        self.journal_generation: typing.Optional[int] = None
+        self.journal_bytes = 0
+        self.journal_baseline: typing.Dict[str, typing.Any] = {}
+        # keys of hints and names of journal_replaced_fields changed since the last journal entry
+        self.journal_changed: typing.Dict[str, typing.Set[typing.Any]] = {"hints": set(), "fields": set()}
+        # keep data storage in its own file next to the savegame instead of inside it
+        self.data_storage_file = False
         self.tags = ['AP']
         self.games: typing.Dict[int, str] = {}
         self.minimum_client_versions: typing.Dict[int, Version] = {}
@@ -264,10 +631,9 @@ class Context:
         self.groups = {}
         self.group_collected: typing.Dict[int, typing.Set[int]] = {}
         self.random = random.Random()
-        self.stored_data = {}
-        self.stored_data_notification_clients = collections.defaultdict(weakref.WeakSet)
+        self.data_storage = DataStorage(self.broadcast)
         self.read_data = {}
-        self.spheres = []
+        self.location_spheres = {}
 
         # init empty to satisfy linter, I suppose
         self.gamespackage = {}
@@ -297,9 +663,9 @@ class Context:
             self.non_hintable_names[world_name] = world.hint_blacklist
 
         for game_package in self.gamespackage.values():
-            # remove groups from data sent to clients
-            del game_package["item_name_groups"]
-            del game_package["location_name_groups"]
+            # remove groups from data sent to clients, the package is shared by every Context in this process
+            game_package.pop("item_name_groups", None)
+            game_package.pop("location_name_groups", None)
 
     def _init_game_data(self):
         for game_name, game_package in self.gamespackage.items():
@@ -331,7 +697,10 @@ class Context:
     async def send_msgs(self, endpoint: Endpoint, msgs: typing.Iterable[dict]) -> bool:
         if not endpoint.socket or not endpoint.socket.open:
             return False
-        msg = self.dumper(msgs)
+        # broadcasts stay json, so they can be encoded once for everyone
+        msg = encode_compact(msgs) if getattr(endpoint, "compact_encoding", False) else self.dumper(msgs)
+        if metrics.enabled:
+            metrics.observe_sent(msg)
         try:
             await endpoint.socket.send(msg)
         except websockets.ConnectionClosed:
@@ -346,6 +715,8 @@ class Context:
     async def send_encoded_msgs(self, endpoint: Endpoint, msg: str) -> bool:
         if not endpoint.socket or not endpoint.socket.open:
             return False
+        if metrics.enabled:
+            metrics.observe_sent(msg)
         try:
             await endpoint.socket.send(msg)
         except websockets.ConnectionClosed:
@@ -362,6 +733,8 @@ class Context:
         for endpoint in endpoints:
             if endpoint.socket and endpoint.socket.open:
                 sockets.append(endpoint.socket)
+        if metrics.enabled:
+            metrics.observe_broadcast(msg, len(sockets))
         try:
             websockets.broadcast(sockets, msg)
         except RuntimeError:
@@ -400,11 +773,59 @@ class Context:
         msgs = self.dumper(msgs)
         async_start(self.broadcast_send_encoded_msgs(endpoints, msgs))
 
+    def add_bounce_routes(self, client: Client) -> None:
+        self.clients_by_game[client.team][self.games[client.slot]].add(client)
+        for tag in client.tags:
+            self.clients_by_tag[client.team][tag].add(client)
+
+    def remove_bounce_routes(self, client: Client) -> None:
+        by_game = self.clients_by_game[client.team]
+        game = self.games[client.slot]
+        by_game[game].discard(client)
+        if not by_game[game]:
+            del by_game[game]
+        by_tag = self.clients_by_tag[client.team]
+        for tag in client.tags:
+            if tag in by_tag:
+                by_tag[tag].discard(client)
+                if not by_tag[tag]:
+                    del by_tag[tag]
+
+    def update_item_receiver(self, client: Client) -> None:
+        """Adds client to or removes it from item_receivers, after it connected or changed its items_handling."""
+        if client.no_items:
+            self.remove_item_receiver(client)
+        else:
+            self.item_receivers.setdefault((client.team, client.slot), set()).add(client)
+
+    def remove_item_receiver(self, client: Client) -> None:
+        receivers = self.item_receivers.get((client.team, client.slot))
+        if receivers:
+            receivers.discard(client)
+            if not receivers:
+                del self.item_receivers[client.team, client.slot]
+
+    def get_bounce_targets(self, team: int, games: typing.Iterable[str], tags: typing.Iterable[str],
+                           slots: typing.Iterable[int]) -> typing.Set[Client]:
+        targets: typing.Set[Client] = set()
+        by_game = self.clients_by_game[team]
+        for game in games:
+            targets |= by_game.get(game, set())
+        by_tag = self.clients_by_tag[team]
+        for tag in tags:
+            targets |= by_tag.get(tag, set())
+        team_clients = self.clients[team]
+        for slot in slots:
+            targets.update(team_clients.get(slot, ()))
+        return targets
+
     async def disconnect(self, endpoint: Client):
         if endpoint in self.endpoints:
             self.endpoints.remove(endpoint)
         if endpoint.slot and endpoint in self.clients[endpoint.team][endpoint.slot]:
             self.clients[endpoint.team][endpoint.slot].remove(endpoint)
+            self.remove_bounce_routes(endpoint)
+            self.remove_item_receiver(endpoint)
         await on_client_disconnected(self, endpoint)
 
     def notify_client(self, client: Client, text: str, additional_arguments: dict = {}):
@@ -422,6 +843,7 @@ class Context:
 
     # loading
     def load(self, multidatapath: str, use_embedded_server_options: bool = False):
+        self.close_multidata()
         if multidatapath.lower().endswith(".zip"):
             import zipfile
             with zipfile.ZipFile(multidatapath) as zf:
@@ -433,16 +855,36 @@ class Context:
                     raise Exception("No .archipelago found in archive.")
         else:
             with open(multidatapath, 'rb') as f:
-                data = f.read()
-
-        self._load(self.decompress(data), {}, use_embedded_server_options)
+                if f.read(1) == bytes([4]):
+                    # sectioned multidata is read lazily from a memory map instead of loading the whole file
+                    data = self.multidata_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                else:
+                    f.seek(0)
+                    data = f.read()
+
+        decoded_obj = self.decompress(data)
+        if self.multidata_map:
+            assert isinstance(decoded_obj, MultiData)
+            self.mapped_multidata = decoded_obj
+        self._load(decoded_obj, {}, use_embedded_server_options)
         self.data_filename = multidatapath
 
+    def close_multidata(self) -> None:
+        """Closes the memory map of a loaded version 4 multidata file, which keeps the file locked on Windows."""
+        if self.multidata_map:
+            if self.mapped_multidata:
+                self.mapped_multidata.release()
+                self.mapped_multidata = None
+            self.multidata_map.close()
+            self.multidata_map = None
+
     @staticmethod
-    def decompress(data: bytes) -> dict:
+    def decompress(data: bytes) -> typing.MutableMapping[str, typing.Any]:
         format_version = data[0]
-        if format_version > 3:
+        if format_version > 4:
             raise Utils.VersionException("Incompatible multidata.")
+        if format_version == 4:
+            return MultiData(data)
         return restricted_loads(zlib.decompress(data[1:]))
 
     def _load(self, decoded_obj: dict, game_data_packages: typing.Dict[str, typing.Any],
@@ -487,7 +929,12 @@ class Context:
         self.seed_name = decoded_obj["seed_name"]
         self.random.seed(self.seed_name)
         self.connect_names = decoded_obj['connect_names']
-        self.locations = LocationStore(decoded_obj.pop("locations"))  # pre-emptively free memory
+        locations = decoded_obj.pop("locations")  # pre-emptively free memory
+        if isinstance(locations, PackedLocations):
+            # straight from the columns, without unpacking every slot into dicts first
+            self.locations = LocationStore.from_columns(*locations.columns)
+        else:
+            self.locations = LocationStore(locations)
         self.slot_data = decoded_obj['slot_data']
         for slot, data in self.slot_data.items():
             self.read_data[f"slot_data_{slot}"] = lambda data=data: data
@@ -500,12 +947,14 @@ class Context:
 
         for slot, hints in decoded_obj["precollected_hints"].items():
             self.hints[0, slot].update(hints)
+        self.rebuild_hint_index()
 
         # declare slots that aren't players as done
         for slot, slot_info in self.slot_info.items():
             if slot_info.type.always_goal:
                 for team in self.clients:
                     self.client_game_state[team, slot] = ClientStatus.CLIENT_GOAL
+                    self.journal_changed["fields"].add("client_game_state")
 
         if use_embedded_server_options:
             server_options = decoded_obj.get("server_options", {})
@@ -528,8 +977,11 @@ class Context:
         for game_name, data in self.location_name_groups.items():
             self.read_data[f"location_name_groups_{game_name}"] = lambda lgame=game_name: self.location_name_groups[lgame]
 
-        # sorted access spheres
-        self.spheres = decoded_obj.get("spheres", [])
+        # player -> location -> sorted access sphere, flattened from the per sphere sets of the multidata
+        self.location_spheres = {}
+        for sphere_number, sphere in enumerate(decoded_obj.get("spheres", [])):
+            for player, locations in sphere.items():
+                self.location_spheres.setdefault(player, {}).update(dict.fromkeys(locations, sphere_number))
 
     # saving
 
@@ -537,24 +989,123 @@ class Context:
         if self.saving:
             if now:
                 self.save_dirty = False
-                return self._save()
+                return self._timed_save()
 
             self.save_dirty = True
             return True
 
         return False
 
+    def _timed_save(self) -> bool:
+        if not metrics.enabled:
+            return self._save()
+        start = time.perf_counter()
+        try:
+            return self._save()
+        finally:
+            metrics.observe_save(time.perf_counter() - start)
+
     def _save(self, exit_save: bool = False) -> bool:
         try:
-            encoded_save = pickle.dumps(self.get_save())
-            with open(self.save_filename, "wb") as f:
-                f.write(zlib.compress(encoded_save))
+            self.data_storage.flush()
+            if self.save_journal_size and self.journal_generation is not None \
+                    and self.journal_bytes < self.save_journal_size:
+                self._append_journal()
+            else:
+                self._write_full_save()
         except Exception as e:
             self.logger.exception(e)
             return False
         else:
             return True
 
+    @property
+    def journal_filename(self) -> str:
+        return self.save_filename + ".journal"
+
+    @property
+    def storage_filename(self) -> str:
+        return self.save_filename + ".storage"
+
+    @property
+    def stored_data(self) -> typing.Dict[str, typing.Any]:
+        return self.data_storage.data
+
+    def _write_full_save(self) -> None:
+        self.journal_changed = {field: set() for field in self.journal_changed}
+        if not self.data_storage.filename:
+            self.data_storage.take_changes()  # all of it is in the full save
+        save = self.get_save()
+        if self.save_journal_size:
+            # a journal left over from an older generation is ignored on load, so a crash between writing the
+            # savegame and truncating the journal can't replay outdated changes
+            self.journal_generation = (self.journal_generation or 0) + 1
+            save["journal_generation"] = self.journal_generation
+        encoded_save = pickle.dumps(save)
+        with open(self.save_filename, "wb") as f:
+            f.write(zlib.compress(encoded_save))
+        if self.save_journal_size:
+            self.journal_bytes = 0
+            with open(self.journal_filename, "wb") as f:
+                self._write_journal_entry(f, {"journal_generation": self.journal_generation})
+            self._set_journal_baseline()
+
+    def _set_journal_baseline(self) -> None:
+        self.journal_baseline = {
+            "received_items": {key: len(items) for key, items in self.received_items.items()},
+            "location_checks": {key: len(checks) for key, checks in self.location_checks.items()},
+        }
+
+    def _write_journal_entry(self, f: typing.BinaryIO, entry: dict) -> None:
+        self.journal_bytes += write_journal_record(f, entry)
+
+    def _append_journal(self) -> None:
+        changed, self.journal_changed = self.journal_changed, {field: set() for field in self.journal_changed}
+        baseline = self.journal_baseline
+        entry = self.get_save_fields(changed["fields"])
+        received_items = {}
+        for key, items in list(self.received_items.items()):
+            start = baseline["received_items"].get(key, 0)
+            if len(items) > start:
+                received_items[key] = start, items[start:]
+                baseline["received_items"][key] = len(items)
+        location_checks = {}
+        for key, checks in list(self.location_checks.items()):
+            if len(checks) > baseline["location_checks"].get(key, 0):
+                location_checks[key] = set(checks)
+                baseline["location_checks"][key] = len(checks)
+        stored_data = {} if self.data_storage.filename else self.data_storage.take_changes()
+        for field, values in (("received_items", received_items), ("location_checks", location_checks),
+                              ("hints", {key: set(self.hints[key]) for key in changed["hints"]}),
+                              ("stored_data", stored_data)):
+            if values:
+                entry[field] = values
+        if entry:
+            with open(self.journal_filename, "ab") as f:
+                self._write_journal_entry(f, entry)
+
+    def _load_journal(self, save_data: dict) -> None:
+        """Replays the journal belonging to save_data into it."""
+        import os
+        if not os.path.exists(self.journal_filename):
+            return
+        with open(self.journal_filename, "rb") as f:
+            data = f.read()
+        entries, end = read_save_journal(data)
+        if not entries or entries[0].get("journal_generation") != save_data.get("journal_generation"):
+            self.logger.warning("Ignoring save journal that does not belong to the save file.")
+            return
+        if end < len(data):
+            # appended records would otherwise end up behind the cut off one, where they can't be read back
+            self.logger.warning("Dropping save journal record that was cut off while it was written.")
+            with open(self.journal_filename, "r+b") as f:
+                f.truncate(end)
+        for entry in entries[1:]:
+            apply_save_journal(save_data, entry)
+        self.journal_generation = save_data["journal_generation"]
+        self.journal_bytes = end
+        self.logger.info(f"Replayed {len(entries) - 1} save journal entries.")
+
     def init_save(self, enabled: bool = True):
         self.saving = enabled
         if self.saving:
@@ -563,14 +1114,25 @@ class Context:
                 name, ext = os.path.splitext(self.data_filename)
                 self.save_filename = name + '.apsave' if ext.lower() in ('.archipelago', '.zip') \
                     else self.data_filename + '_' + 'apsave'
+            storage_id: typing.Optional[int] = None
             try:
                 with open(self.save_filename, 'rb') as f:
                     save_data = restricted_loads(zlib.decompress(f.read()))
-                    self.set_save(save_data)
+                self._load_journal(save_data)
+                self.set_save(save_data)
+                storage_id = save_data.get("storage_id")
+                if self.journal_generation is not None:
+                    self._set_journal_baseline()
             except FileNotFoundError:
                 self.logger.error('No save data found, starting a new game')
             except Exception as e:
                 self.logger.exception(e)
+            # a savegame that already has its data storage in a file keeps it there
+            if self.data_storage_file or storage_id is not None:
+                try:
+                    self.data_storage.persist_to(self.storage_filename, storage_id)
+                except Exception as e:
+                    self.logger.exception(e)
             self._start_async_saving()
 
     def _start_async_saving(self, atexit_save: bool = True):
@@ -588,7 +1150,9 @@ class Context:
                         time.sleep(max(1.0, next_wakeup))
                         if self.save_dirty:
                             self.logger.debug("Saving via thread.")
-                            self._save()
+                            self._timed_save()
+                        else:
+                            self.data_storage.flush()
                     except OperationalError as e:
                         self.logger.exception(e)
                         self.logger.info(f"Saving failed. Retry in {self.auto_save_interval} seconds.")
@@ -604,31 +1168,40 @@ class Context:
                 import atexit
                 atexit.register(self._save, True)  # make sure we save on exit too
 
-    def get_save(self) -> dict:
-        self.recheck_hints()
+    def get_save_fields(self, fields: typing.Iterable[str]) -> typing.Dict[str, typing.Any]:
+        """Returns the savegame values of the given journal_replaced_fields."""
+        getters: typing.Dict[str, typing.Callable[[], typing.Any]] = {
+            "hints_used": lambda: dict(self.hints_used),
+            "name_aliases": lambda: self.name_aliases,
+            "client_game_state": lambda: dict(self.client_game_state),
+            "client_activity_timers": lambda: tuple(
+                (key, value.timestamp()) for key, value in self.client_activity_timers.items()),
+            "client_connection_timers": lambda: tuple(
+                (key, value.timestamp()) for key, value in self.client_connection_timers.items()),
+            "random_state": self.random.getstate,
+            "group_collected": lambda: dict(self.group_collected),
+            "game_options": lambda: {"hint_cost": self.hint_cost,
+                                     "location_check_points": self.location_check_points,
+                                     "server_password": self.server_password, "password": self.password,
+                                     "release_mode": self.release_mode,
+                                     "remaining_mode": self.remaining_mode, "collect_mode": self.collect_mode,
+                                     "item_cheat": self.item_cheat, "compatibility": self.compatibility},
+        }
+        return {field: getters[field]() for field in fields}
+
+    def get_save(self) -> typing.Dict[str, typing.Any]:
         d = {
             "version": self.save_version,
             "connect_names": self.connect_names,
             "received_items": self.received_items,
-            "hints_used": dict(self.hints_used),
             "hints": dict(self.hints),
             "location_checks": dict(self.location_checks),
-            "name_aliases": self.name_aliases,
-            "client_game_state": dict(self.client_game_state),
-            "client_activity_timers": tuple(
-                (key, value.timestamp()) for key, value in self.client_activity_timers.items()),
-            "client_connection_timers": tuple(
-                (key, value.timestamp()) for key, value in self.client_connection_timers.items()),
-            "random_state": self.random.getstate(),
-            "group_collected": dict(self.group_collected),
-            "stored_data": self.stored_data,
-            "game_options": {"hint_cost": self.hint_cost, "location_check_points": self.location_check_points,
-                             "server_password": self.server_password, "password": self.password,
-                             "release_mode": self.release_mode,
-                             "remaining_mode": self.remaining_mode, "collect_mode": self.collect_mode,
-                             "item_cheat": self.item_cheat, "compatibility": self.compatibility}
-
+            **self.get_save_fields(journal_replaced_fields)
         }
+        if self.data_storage.filename:
+            d["storage_id"] = self.data_storage.storage_id
+        else:
+            d["stored_data"] = self.stored_data
 
         return d
 
@@ -651,6 +1224,9 @@ class Context:
              in savedata["client_activity_timers"]})
         self.location_checks.update(savedata["location_checks"])
         self.random.setstate(savedata["random_state"])
+        # from here on, checks resolve their hints as they come in
+        self.rebuild_hint_index()
+        self.recheck_hints()
 
         if "game_options" in savedata:
             self.hint_cost = savedata["game_options"]["hint_cost"]
@@ -667,7 +1243,8 @@ class Context:
             self.group_collected = savedata["group_collected"]
 
         if "stored_data" in savedata:
-            self.stored_data = savedata["stored_data"]
+            # unless data storage is kept in its own file, the savegame carries it
+            self.data_storage.replace(savedata["stored_data"])
         # count items and slots from lists for items_handling = remote
         self.logger.info(
             f'Loaded save file with {sum([len(v) for k, v in self.received_items.items() if k[2]])} received items '
@@ -680,11 +1257,18 @@ class Context:
             return max(1, int(self.hint_cost * 0.01 * len(self.locations[slot])))
         return 0
 
+    def rebuild_hint_index(self) -> None:
+        self.hints_by_location.clear()
+        for (team, _), hints in self.hints.items():
+            for hint in hints:
+                self.hints_by_location[team, hint.finding_player, hint.location].add(hint)
+
     def recheck_hints(self, team: typing.Optional[int] = None, slot: typing.Optional[int] = None,
                       changed: typing.Optional[typing.Set[team_slot]] = None) -> None:
         """Refreshes the hints for the specified team/slot. Providing 'None' for either team or slot
         will refresh all teams or all slots respectively. If a set is passed for 'changed', each (team,slot)
         pair that has at least one hint modified will be added to the set.
+        New checks already update their hints through resolve_hints, so this is only needed after loading.
         """
         for hint_team, hint_slot in self.hints:
             if team != hint_team and team is not None:
@@ -697,6 +1281,9 @@ class Context:
                 new_hints.add(new_hint)
                 if hint == new_hint:
                     continue
+                location_hints = self.hints_by_location[hint_team, hint.finding_player, hint.location]
+                location_hints.discard(hint)
+                location_hints.add(new_hint)
                 for player in self.slot_set(hint.receiving_player) | {hint.finding_player}:
                     if changed is not None:
                         changed.add((hint_team,player))
@@ -704,18 +1291,35 @@ class Context:
                         self.replace_hint(hint_team, player, hint, new_hint)
             self.hints[hint_team, hint_slot] = new_hints
 
+    def resolve_hints(self, team: int, slot: int, locations: typing.Iterable[int],
+                      changed: typing.Optional[typing.Set[team_slot]] = None) -> None:
+        """Marks the hints for newly checked locations of team/slot as found, only touching those hints.
+        If a set is passed for 'changed', each (team,slot) pair that has at least one hint modified will be added."""
+        for location in locations:
+            hints = self.hints_by_location.get((team, slot, location))
+            if not hints:
+                continue
+            for hint in list(hints):
+                new_hint = hint.re_check(self, team)
+                if hint == new_hint:
+                    continue
+                for player in self.slot_set(hint.receiving_player) | {hint.finding_player}:
+                    if changed is not None:
+                        changed.add((team, player))
+                    self.replace_hint(team, player, hint, new_hint)
+
     def get_rechecked_hints(self, team: int, slot: int):
         self.recheck_hints(team, slot)
         return self.hints[team, slot]
 
     def get_sphere(self, player: int, location_id: int) -> int:
         """Get sphere of a location, -1 if spheres are not available."""
-        if self.spheres:
-            for i, sphere in enumerate(self.spheres):
-                if location_id in sphere.get(player, set()):
-                    return i
-            raise KeyError(f"No Sphere found for location ID {location_id} belonging to player {player}. "
-                           f"Location or player may not exist.")
+        if self.location_spheres:
+            try:
+                return self.location_spheres[player][location_id]
+            except KeyError:
+                raise KeyError(f"No Sphere found for location ID {location_id} belonging to player {player}. "
+                               f"Location or player may not exist.") from None
         return -1
 
     def get_players_package(self):
@@ -742,6 +1346,7 @@ class Context:
                 setattr(self, key, value)
             elif key == "disable_item_cheat":
                 self.item_cheat = not bool(value)
+                self.journal_changed["fields"].add("game_options")
             else:
                 self.logger.debug(f"Unrecognized server option {key}")
 
@@ -773,6 +1378,7 @@ class Context:
                 # we can check once if hint already exists
                 if hint not in self.hints[team, hint.finding_player]:
                     self.hints[team, hint.finding_player].add(hint)
+                    self.hints_by_location[team, hint.finding_player, hint.location].add(hint)
                     new_hint_events.add(hint.finding_player)
                     for player in self.slot_set(hint.receiving_player):
                         self.hints[team, player].add(hint)
@@ -791,8 +1397,8 @@ class Context:
                     async_start(self.send_msgs(client, client_hints))
 
     def get_hint(self, team: int, finding_player: int, seeked_location: int) -> typing.Optional[Hint]:
-        for hint in self.hints[team, finding_player]:
-            if hint.location == seeked_location and hint.finding_player == finding_player:
+        for hint in self.hints_by_location.get((team, finding_player, seeked_location), ()):
+            if hint in self.hints[team, finding_player]:
                 return hint
         return None
     
@@ -800,6 +1406,9 @@ class Context:
         if old_hint in self.hints[team, slot]:
             self.hints[team, slot].remove(old_hint)
             self.hints[team, slot].add(new_hint)
+            location_hints = self.hints_by_location[team, old_hint.finding_player, old_hint.location]
+            location_hints.discard(old_hint)
+            location_hints.add(new_hint)
     
     # "events"
 
@@ -821,14 +1430,15 @@ class Context:
         }])
 
     def on_changed_hints(self, team: int, slot: int):
+        self.journal_changed["hints"].add((team, slot))
         key: str = f"_read_hints_{team}_{slot}"
-        targets: typing.Set[Client] = set(self.stored_data_notification_clients[key])
+        targets: typing.Set[Client] = self.data_storage.get_subscribers(key)
         if targets:
             self.broadcast(targets, [{"cmd": "SetReply", "key": key, "value": self.hints[team, slot]}])
 
     def on_client_status_change(self, team: int, slot: int):
         key: str = f"_read_client_status_{team}_{slot}"
-        targets: typing.Set[Client] = set(self.stored_data_notification_clients[key])
+        targets: typing.Set[Client] = self.data_storage.get_subscribers(key)
         if targets:
             self.broadcast(targets, [{"cmd": "SetReply", "key": key, "value": self.client_game_state[team, slot]}])
 
@@ -855,8 +1465,16 @@ async def server(websocket: "ServerConnection", path: str = "/", ctx: Context =
         async for data in websocket:
             if ctx.log_network:
                 ctx.logger.info(f"Incoming message: {data}")
-            for msg in decode(data):
-                await process_client_cmd(ctx, client, msg)
+            if metrics.enabled:
+                metrics.observe_received(data)
+                for msg in decode(data):
+                    start = time.perf_counter()
+                    await process_client_cmd(ctx, client, msg)
+                    metrics.observe_command(msg.get("cmd", None) if isinstance(msg, dict) else None,
+                                            time.perf_counter() - start)
+            else:
+                for msg in decode(data):
+                    await process_client_cmd(ctx, client, msg)
     except Exception as e:
         if not isinstance(e, websockets.WebSocketException):
             ctx.logger.exception(e)
@@ -938,12 +1556,14 @@ async def on_client_joined(ctx: Context, client: Client):
                                   "It may stop working in the future. If you are a player, please report this to the "
                                   "client's developer.")
     ctx.client_connection_timers[client.team, client.slot] = datetime.datetime.now(datetime.timezone.utc)
+    ctx.journal_changed["fields"].add("client_connection_timers")
 
 
 async def on_client_left(ctx: Context, client: Client):
     if len(ctx.clients[client.team][client.slot]) < 1:
         update_client_status(ctx, client, ClientStatus.CLIENT_UNKNOWN)
         ctx.client_connection_timers[client.team, client.slot] = datetime.datetime.now(datetime.timezone.utc)
+        ctx.journal_changed["fields"].add("client_connection_timers")
 
     version_str = '.'.join(str(x) for x in client.version)
 
@@ -1022,20 +1642,22 @@ def get_start_inventory(ctx: Context, player: int, remote_start_inventory: bool)
 
 
 def send_new_items(ctx: Context):
-    for team, clients in ctx.clients.items():
-        for slot, clients in clients.items():
-            for client in clients:
-                if client.no_items:
-                    continue
-                start_inventory = get_start_inventory(ctx, slot, client.remote_start_inventory)
-                items = get_received_items(ctx, team, slot, client.remote_items)
-                if len(start_inventory) + len(items) > client.send_index:
-                    first_new_item = max(0, client.send_index - len(start_inventory))
-                    async_start(ctx.send_msgs(client, [{
-                        "cmd": "ReceivedItems",
-                        "index": client.send_index,
-                        "items": start_inventory[client.send_index:] + items[first_new_item:]}]))
-                    client.send_index = len(start_inventory) + len(items)
+    """Sends the items added through send_items_to to the clients of the receiving slots."""
+    new_items_slots, ctx.new_items_slots = ctx.new_items_slots, set()
+    for team, slot in new_items_slots:
+        for client in ctx.item_receivers.get((team, slot), ()):
+            start_inventory = get_start_inventory(ctx, slot, client.remote_start_inventory)
+            items = get_received_items(ctx, team, slot, client.remote_items)
+            if len(start_inventory) + len(items) > client.send_index:
+                if client.send_index >= len(start_inventory):
+                    new_items = items[client.send_index - len(start_inventory):]
+                else:
+                    new_items = start_inventory[client.send_index:] + items
+                async_start(ctx.send_msgs(client, [{
+                    "cmd": "ReceivedItems",
+                    "index": client.send_index,
+                    "items": new_items}]))
+                client.send_index = len(start_inventory) + len(items)
 
 
 def update_checked_locations(ctx: Context, team: int, slot: int):
@@ -1069,6 +1691,7 @@ def collect_player(ctx: Context, team: int, slot: int, is_group: bool = False):
             if slot in group_players:
                 group_collected_players = ctx.group_collected.setdefault(group, set())
                 group_collected_players.add(slot)
+                ctx.journal_changed["fields"].add("group_collected")
                 if set(group_players) == group_collected_players:
                     collect_player(ctx, team, group, True)
 
@@ -1079,6 +1702,7 @@ def get_remaining(ctx: Context, team: int, slot: int) -> typing.List[typing.Tupl
 
 def send_items_to(ctx: Context, team: int, target_slot: int, *items: NetworkItem):
     for target in ctx.slot_set(target_slot):
+        ctx.new_items_slots.add((team, target))
         for item in items:
             if item.player != target_slot:
                 get_received_items(ctx, team, target, False).append(item)
@@ -1093,6 +1717,7 @@ def register_location_checks(ctx: Context, team: int, slot: int, locations: typi
     if new_locations:
         if count_activity:
             ctx.client_activity_timers[team, slot] = datetime.datetime.now(datetime.timezone.utc)
+            ctx.journal_changed["fields"].add("client_activity_timers")
 
         sortable: list[tuple[int, int, int, int]] = []
         for location in new_locations:
@@ -1127,7 +1752,7 @@ def register_location_checks(ctx: Context, team: int, slot: int, locations: typi
             "checked_locations": new_locations,  # send back new checks only
         }])
         updated_slots: typing.Set[tuple[int, int]] = set()
-        ctx.recheck_hints(team, slot, updated_slots)
+        ctx.resolve_hints(team, slot, new_locations, updated_slots)
         for hint_team, hint_slot in updated_slots:
             ctx.on_changed_hints(hint_team, hint_slot)
         ctx.save()
@@ -1567,12 +2192,14 @@ class ClientMessageProcessor(CommonCommandProcessor):
         if alias_name:
             alias_name = alias_name[:16].strip()
             self.ctx.name_aliases[self.client.team, self.client.slot] = alias_name
+            self.ctx.journal_changed["fields"].add("name_aliases")
             self.output(f"Hello, {alias_name}")
             update_aliases(self.ctx, self.client.team)
             self.ctx.save()
             return True
         elif (self.client.team, self.client.slot) in self.ctx.name_aliases:
             del (self.ctx.name_aliases[self.client.team, self.client.slot])
+            self.ctx.journal_changed["fields"].add("name_aliases")
             self.output("Removed Alias")
             update_aliases(self.ctx, self.client.team)
             self.ctx.save()
@@ -1592,6 +2219,7 @@ class ClientMessageProcessor(CommonCommandProcessor):
                 new_item = NetworkItem(names[item_name], -1, self.client.slot)
                 get_received_items(self.ctx, self.client.team, self.client.slot, False).append(new_item)
                 get_received_items(self.ctx, self.client.team, self.client.slot, True).append(new_item)
+                self.ctx.new_items_slots.add((self.client.team, self.client.slot))
                 self.ctx.broadcast_text_all(
                     'Cheat console: sending "' + item_name + '" to ' + self.ctx.get_aliased_name(self.client.team,
                                                                                                  self.client.slot),
@@ -1610,9 +2238,7 @@ class ClientMessageProcessor(CommonCommandProcessor):
         cost = self.ctx.get_hint_cost(self.client.slot)
         auto_status = HintStatus.HINT_UNSPECIFIED if for_location else HintStatus.HINT_PRIORITY
         if not input_text:
-            hints = {hint.re_check(self.ctx, self.client.team) for hint in
-                     self.ctx.hints[self.client.team, self.client.slot]}
-            self.ctx.hints[self.client.team, self.client.slot] = hints
+            hints = self.ctx.hints[self.client.team, self.client.slot]
             self.ctx.notify_hints(self.client.team, list(hints), recipients=(self.client.slot,))
             self.output(f"A hint costs {self.ctx.get_hint_cost(self.client.slot)} points. "
                         f"You have {points_available} points.")
@@ -1688,6 +2314,7 @@ class ClientMessageProcessor(CommonCommandProcessor):
                     can_pay = 1000
 
                 self.ctx.random.shuffle(not_found_hints)
+                self.ctx.journal_changed["fields"].add("random_state")
                 # By popular vote, make hints prefer non-local placements
                 not_found_hints.sort(key=lambda hint: int(hint.receiving_player != hint.finding_player))
                 # By another popular vote, prefer early sphere
@@ -1702,6 +2329,7 @@ class ClientMessageProcessor(CommonCommandProcessor):
                     hints.append(hint)
                     can_pay -= 1
                     self.ctx.hints_used[self.client.team, self.client.slot] += 1
+                    self.ctx.journal_changed["fields"].add("hints_used")
 
                 self.ctx.notify_hints(self.client.team, hints)
                 if not_found_hints:
@@ -1768,7 +2396,7 @@ def get_slot_points(ctx: Context, team: int, slot: int) -> int:
             ctx.get_hint_cost(slot) * ctx.hints_used[team, slot])
 
 
-async def process_client_cmd(ctx: Context, client: Client, args: dict):
+async def process_client_cmd(ctx: Context, client: Client, args: typing.Dict[str, typing.Any]):
     try:
         cmd: str = args["cmd"]
     except:
@@ -1816,11 +2444,15 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             errors.add('IncompatibleVersion')
         if errors:
             ctx.logger.info(f"A client connection was refused due to: {errors}, the sent connect information was {args}.")
+            if client.auth:  # stays connected to its slot, but items_handling may have changed above
+                ctx.update_item_receiver(client)
             await ctx.send_msgs(client, [{"cmd": "ConnectionRefused", "errors": list(errors)}])
         else:
             team, slot = ctx.connect_names[args['name']]
             if client.auth and client.team is not None and client.slot in ctx.clients[client.team]:
                 ctx.clients[team][slot].remove(client)  # re-auth, remove old entry
+                ctx.remove_bounce_routes(client)
+                ctx.remove_item_receiver(client)
                 if client.team != team or client.slot != slot:
                     client.auth = False  # swapping Team/Slot
             client.team = team
@@ -1833,6 +2465,9 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             client.no_locations = bool(client.tags & _non_game_messages.keys())
             # set NoText for old PopTracker clients that predate the tag to save traffic
             client.no_text = "NoText" in client.tags or ("PopTracker" in client.tags and client.version < (0, 5, 1))
+            client.compact_encoding = compact_encoding_tag in client.tags
+            ctx.add_bounce_routes(client)
+            ctx.update_item_receiver(client)
             connected_packet = {
                 "cmd": "Connected",
                 "team": client.team, "slot": client.slot,
@@ -1858,23 +2493,17 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
     elif cmd == "GetDataPackage":
         exclusions = args.get("exclusions", [])
         if "games" in args:
-            games = {name: game_data for name, game_data in ctx.gamespackage.items()
-                     if name in set(args.get("games", []))}
-            await ctx.send_msgs(client, [{"cmd": "DataPackage",
-                                          "data": {"games": games}}])
+            requested = set(args.get("games", []))
+            games = [name for name in ctx.gamespackage if name in requested]
         # TODO: remove exclusions behaviour around 0.5.0
         elif exclusions:
             exclusions = set(exclusions)
-            games = {name: game_data for name, game_data in ctx.gamespackage.items()
-                     if name not in exclusions}
-
-            package = {"games": games}
-            await ctx.send_msgs(client, [{"cmd": "DataPackage",
-                                          "data": package}])
-
+            games = [name for name in ctx.gamespackage if name not in exclusions]
         else:
-            await ctx.send_msgs(client, [{"cmd": "DataPackage",
-                                          "data": {"games": ctx.gamespackage}}])
+            games = list(ctx.gamespackage)
+        # assembled from cached per-game encodings instead of encoding the full name tables for every request
+        await ctx.send_encoded_msgs(client, '[{"cmd":"DataPackage","data":{"games":{' + ",".join(
+            f"{encode(name)}:{encode_game_package(ctx.gamespackage[name])}" for name in games) + "}}}]")
 
     elif client.auth:
         if cmd == "ConnectUpdate":
@@ -1886,6 +2515,7 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             if args.get('items_handling', None) is not None and client.items_handling != args['items_handling']:
                 try:
                     client.items_handling = args['items_handling']
+                    ctx.update_item_receiver(client)
                     start_inventory = get_start_inventory(ctx, client.slot, client.remote_start_inventory)
                     items = get_received_items(ctx, client.team, client.slot, client.remote_items)
                     if (items or start_inventory) and not client.no_items:
@@ -1902,12 +2532,15 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
 
             if "tags" in args:
                 old_tags = client.tags
+                ctx.remove_bounce_routes(client)
                 client.tags = args["tags"]
+                ctx.add_bounce_routes(client)
                 if set(old_tags) != set(client.tags):
                     client.no_locations = bool(client.tags & _non_game_messages.keys())
                     client.no_text = "NoText" in client.tags or (
                         "PopTracker" in client.tags and client.version < (0, 5, 1)
                     )
+                    client.compact_encoding = compact_encoding_tag in client.tags
                     ctx.broadcast_text_all(
                         f"{ctx.get_aliased_name(client.team, client.slot)} (Team #{client.team + 1}) has changed tags "
                         f"from {old_tags} to {client.tags}.",
@@ -2012,17 +2645,10 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
             client.messageprocessor(args["text"])
 
         elif cmd == "Bounce":
-            games = set(args.get("games", []))
-            tags = set(args.get("tags", []))
-            slots = set(args.get("slots", []))
+            targets = ctx.get_bounce_targets(client.team, set(args.get("games", [])), set(args.get("tags", [])),
+                                             set(args.get("slots", [])))
             args["cmd"] = "Bounced"
-            msg = ctx.dumper([args])
-
-            for bounceclient in ctx.endpoints:
-                if client.team == bounceclient.team and (ctx.games[bounceclient.slot] in games or
-                                                         set(bounceclient.tags) & tags or
-                                                         bounceclient.slot in slots):
-                    await ctx.send_encoded_msgs(bounceclient, msg)
+            await ctx.broadcast_send_encoded_msgs(targets, ctx.dumper([args]))
 
         elif cmd == "Get":
             if "keys" not in args or type(args["keys"]) != list:
@@ -2045,27 +2671,19 @@ async def process_client_cmd(ctx: Context, client: Client, args: dict):
                                               "text": 'Set', "original_cmd": cmd}])
                 return
             args["cmd"] = "SetReply"
-            value = ctx.stored_data.get(args["key"], args.get("default", 0))
-            args["original_value"] = copy.copy(value)
+            args["original_value"], args["value"] = ctx.data_storage.set(args["key"], args.get("default", 0),
+                                                                         args["operations"])
             args["slot"] = client.slot
-            for operation in args["operations"]:
-                func = modify_functions[operation["operation"]]
-                value = func(value, operation["value"])
-            ctx.stored_data[args["key"]] = args["value"] = value
-            targets = set(ctx.stored_data_notification_clients[args["key"]])
-            if args.get("want_reply", False):
-                targets.add(client)
-            if targets:
-                ctx.broadcast(targets, [args])
-            ctx.save()
+            ctx.data_storage.notify(args, client if args.get("want_reply", False) else None)
+            if not ctx.data_storage.filename:  # otherwise the storage file is appended to on the next save
+                ctx.save()
 
         elif cmd == "SetNotify":
             if "keys" not in args or type(args["keys"]) != list:
                 await ctx.send_msgs(client, [{'cmd': 'InvalidPacket', "type": "arguments",
                                               "text": 'SetNotify', "original_cmd": cmd}])
                 return
-            for key in args["keys"]:
-                ctx.stored_data_notification_clients[key].add(client)
+            ctx.data_storage.subscribe(client, args["keys"])
 
 
 def update_client_status(ctx: Context, client: Client, new_status: ClientStatus):
@@ -2080,6 +2698,7 @@ def update_client_status(ctx: Context, client: Client, new_status: ClientStatus)
                 ctx.broadcast_text_all(f"Team #{client.team + 1} has completed all of their games! Congratulations!")
 
         ctx.client_game_state[client.team, client.slot] = new_status
+        ctx.journal_changed["fields"].add("client_game_state")
         ctx.on_client_status_change(client.team, client.slot)
         ctx.save()
 
@@ -2139,12 +2758,14 @@ class ServerCommandProcessor(CommonCommandProcessor):
                     if alias_name:
                         alias_name = alias_name.strip()[:15]
                         self.ctx.name_aliases[team, slot] = alias_name
+                        self.ctx.journal_changed["fields"].add("name_aliases")
                         self.output(f"Named {player_name} as {alias_name}")
                         update_aliases(self.ctx, team)
                         self.ctx.save()
                         return True
                     else:
                         del (self.ctx.name_aliases[team, slot])
+                        self.ctx.journal_changed["fields"].add("name_aliases")
                         self.output(f"Removed Alias for {player_name}")
                         update_aliases(self.ctx, team)
                         self.ctx.save()
@@ -2387,6 +3008,7 @@ class ServerCommandProcessor(CommonCommandProcessor):
                 return False
 
         setattr(self.ctx, option_name, value_type(option_value))
+        self.ctx.journal_changed["fields"].add("game_options")
         self.output(f"Set option {option_name} to {getattr(self.ctx, option_name)}")
         if option_name in {"release_mode", "remaining_mode", "collect_mode"}:
             self.ctx.broadcast_all([{"cmd": "RoomUpdate", 'permissions': get_permissions(self.ctx)}])
@@ -2398,8 +3020,8 @@ class ServerCommandProcessor(CommonCommandProcessor):
         """Debug Tool: list writable datastorage keys and approximate the size of their values with pickle."""
         total: int = 0
         texts = []
-        for key, value in self.ctx.stored_data.items():
-            size = len(pickle.dumps(value))
+        for key in self.ctx.stored_data:
+            size = self.ctx.data_storage.get_size(key)
             total += size
             texts.append(f"Key: {key} | Size: {size}B")
         texts.insert(0, f"Found {len(self.ctx.stored_data)} keys, "
@@ -2439,6 +3061,16 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument('--password', default=defaults["password"])
     parser.add_argument('--savefile', default=defaults["savefile"])
     parser.add_argument('--disable_save', default=defaults["disable_save"], action='store_true')
+    parser.add_argument('--metrics_port', default=defaults["metrics_port"], type=int,
+                        help="Serve Prometheus metrics on this port of localhost. 0 to disable.")
+    parser.add_argument('--save_journal_size', default=defaults["save_journal_size"], type=int,
+                        help="Append changes to a journal next to the save file, rewriting the whole save file only "
+                             "once the journal grows beyond this many bytes. 0 always rewrites the save file.")
+    parser.add_argument('--data_storage_file', default=defaults["data_storage_file"], action='store_true',
+                        help="Keep data storage in its own file next to the save file instead of inside it.")
+    parser.add_argument('--data_storage_coalesce', default=defaults["data_storage_coalesce"], type=int,
+                        help="Milliseconds during which rapid changes to a data storage key are sent to its "
+                             "subscribers as one SetReply. 0 sends every change right away.")
     parser.add_argument('--cert', help="Path to a SSL Certificate for encryption.")
     parser.add_argument('--cert_key', help="Path to SSL Certificate Key file")
     parser.add_argument('--loglevel', default=defaults["loglevel"],
@@ -2562,6 +3194,11 @@ async def main(args: argparse.Namespace):
         logging.exception(f"Failed to read multiworld data ({e})")
         raise
 
+    ctx.save_journal_size = args.save_journal_size
+    ctx.data_storage_file = args.data_storage_file
+    ctx.data_storage.coalesce_window = args.data_storage_coalesce / 1000
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
     ctx.init_save(not args.disable_save)
 
     ssl_context = load_server_cert(args.cert, args.cert_key) if args.cert else None
@@ -2579,6 +3216,7 @@ async def main(args: argparse.Namespace):
     console_task.cancel()
     if ctx.shutdown_task:
         await ctx.shutdown_task
+    ctx.close_multidata()
 
 
 client_message_processor = ClientMessageProcessor
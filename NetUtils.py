@@ -1,14 +1,21 @@
 from __future__ import annotations
 
-import typing
+import array
 import enum
+import json
+import pickle
+import sys
+import typing
 import warnings
+import zlib
 from json import JSONEncoder, JSONDecoder
 
+import orjson
+
 if typing.TYPE_CHECKING:
     from websockets import WebSocketServerProtocol as ServerConnection
 
-from Utils import ByValue, Version
+from Utils import ByValue, Version, restricted_loads
 
 
 class HintStatus(ByValue, enum.IntEnum):
@@ -150,6 +157,45 @@ def _object_hook(o: typing.Any) -> typing.Any:
 
 decode = JSONDecoder(object_hook=_object_hook).decode
 
+compact_encoding_tag = "CompactEncoding"
+
+
+def _scan_for_compact(obj: typing.Any) -> typing.Any:
+    if isinstance(obj, tuple) and hasattr(obj, "_fields"):
+        data = obj._asdict()
+        data["class"] = obj.__class__.__name__
+        return data
+    if isinstance(obj, (tuple, list, set, frozenset)):
+        if obj and all(type(o) is NetworkItem for o in obj):
+            items, locations, players, flags = zip(*obj)
+            return {"class": "NetworkItems", "item": items, "location": locations, "player": players, "flags": flags}
+        return [_scan_for_compact(o) for o in obj]
+    if isinstance(obj, dict):
+        return {key: _scan_for_compact(value) for key, value in obj.items()}
+    return obj
+
+
+def encode_compact(obj: typing.Any) -> bytes:
+    """
+    Encoding for clients with the CompactEncoding tag, sent as binary frames.
+    Same json as encode, except that lists of NetworkItems are sent as one column per NetworkItem field.
+    """
+    return orjson.dumps(_scan_for_compact(obj), option=orjson.OPT_NON_STR_KEYS)
+
+
+def _unpack_compact(obj: typing.Any) -> typing.Any:
+    if isinstance(obj, list):
+        return [_unpack_compact(o) for o in obj]
+    if isinstance(obj, dict):
+        if obj.get("class", None) == "NetworkItems":
+            return [NetworkItem(*fields) for fields in zip(obj["item"], obj["location"], obj["player"], obj["flags"])]
+        return _object_hook({key: _unpack_compact(value) for key, value in obj.items()})
+    return obj
+
+
+def decode_compact(data: bytes) -> typing.Any:
+    return _unpack_compact(orjson.loads(data))
+
 
 class Endpoint:
     socket: "ServerConnection"
@@ -403,6 +449,19 @@ class _LocationStore(dict, typing.MutableMapping[int, typing.Dict[int, typing.Tu
         if len(self.get(0, {})):
             raise ValueError("Invalid player id 0 for location")
 
+    @classmethod
+    def from_columns(cls, slots: typing.Sequence[int], counts: typing.Sequence[int], locations: typing.Sequence[int],
+                     items: typing.Sequence[int], players: typing.Sequence[int], flags: typing.Sequence[int]
+                     ) -> "_LocationStore":
+        """Builds the store from the location columns of a version 4 multidata, see PackedLocations.columns."""
+        values: typing.Dict[int, typing.Dict[int, typing.Tuple[int, int, int]]] = {}
+        start = 0
+        for slot, count in zip(slots, counts):
+            end = start + count
+            values[slot] = dict(zip(locations[start:end], zip(items[start:end], players[start:end], flags[start:end])))
+            start = end
+        return cls(values)
+
     def find_item(self, slots: typing.Set[int], seeked_item_id: int
                   ) -> typing.Generator[typing.Tuple[int, int, int, int, int], None, None]:
         for finding_player, check_data in self.items():
@@ -472,3 +531,172 @@ else:
             warnings.warn("_speedups not available. Falling back to pure python LocationStore. "
                           "Install a matching C++ compiler for your platform to compile _speedups.")
             LocationStore = _LocationStore
+
+
+multidata_section_alignment = 8
+# column name, array typecode; rows are sorted by sending slot, then location id
+_location_columns: typing.Tuple[typing.Tuple[str, str], ...] = (
+    ("locations.location", "q"),
+    ("locations.item", "q"),
+    ("locations.player", "i"),
+    ("locations.flags", "i"),
+)
+
+
+def encode_multidata(multidata: typing.Mapping[str, typing.Any]) -> bytes:
+    """
+    Encodes multidata as format version 4.
+    After the version byte follow a little endian uint32 header size and a json header mapping section names to
+    [offset, size, encoding]. The locations are stored as raw little endian columns, so they can be read from a
+    memory map without unpacking, every other key is its own zlib compressed pickle that is only loaded on access.
+    """
+    sections: typing.List[typing.Tuple[str, str, bytes]] = []
+    for key, value in multidata.items():
+        if key == "locations":
+            slots = sorted(value)
+            columns = {name: array.array(typecode) for name, typecode in _location_columns}
+            counts = array.array("i")
+            for slot in slots:
+                slot_locations = value[slot]
+                counts.append(len(slot_locations))
+                for location_id in sorted(slot_locations):
+                    item_id, item_player, item_flags = slot_locations[location_id]
+                    columns["locations.location"].append(location_id)
+                    columns["locations.item"].append(item_id)
+                    columns["locations.player"].append(item_player)
+                    columns["locations.flags"].append(item_flags)
+            columns["locations.slots"] = array.array("i", slots)
+            columns["locations.counts"] = counts
+            for name, column in columns.items():
+                if sys.byteorder != "little":
+                    column.byteswap()
+                sections.append((name, column.typecode, column.tobytes()))
+        else:
+            sections.append((key, "pickle", zlib.compress(pickle.dumps(value), 9)))
+
+    def align(offset: int) -> int:
+        return -(-offset // multidata_section_alignment) * multidata_section_alignment
+
+    # section offsets depend on the header size, so grow the header until the offsets fit into it
+    header_size = 0
+    while True:
+        offset = align(5 + header_size)
+        table: typing.Dict[str, typing.List[typing.Union[int, str]]] = {}
+        for name, encoding, data in sections:
+            table[name] = [offset, len(data), encoding]
+            offset = align(offset + len(data))
+        header = json.dumps({"sections": table}, separators=(",", ":")).encode()
+        if len(header) <= header_size:
+            break
+        header_size = len(header)
+    header = header.ljust(header_size)
+
+    out = bytearray([4])
+    out += header_size.to_bytes(4, "little")
+    out += header
+    for name, encoding, data in sections:
+        out += bytes(table[name][0] - len(out))
+        out += data
+    return bytes(out)
+
+
+class PackedLocations(typing.Mapping[int, typing.Dict[int, typing.Tuple[int, int, int]]]):
+    """Read-only view of the location columns of a version 4 multidata, unpacking slots as they are accessed."""
+
+    def __init__(self, columns: typing.Dict[str, typing.Sequence[int]]) -> None:
+        self._columns = columns
+        self._ranges: typing.Dict[int, typing.Tuple[int, int]] = {}
+        start = 0
+        for slot, count in zip(columns["locations.slots"], columns["locations.counts"]):
+            self._ranges[slot] = start, start + count
+            start += count
+        self._unpacked: typing.Dict[int, typing.Dict[int, typing.Tuple[int, int, int]]] = {}
+
+    def __getitem__(self, slot: int) -> typing.Dict[int, typing.Tuple[int, int, int]]:
+        try:
+            return self._unpacked[slot]
+        except KeyError:
+            start, end = self._ranges[slot]
+            locations, items, players, flags = (self._columns[name][start:end] for name, _ in _location_columns)
+            slot_locations = dict(zip(locations, zip(items, players, flags)))
+            self._unpacked[slot] = slot_locations
+            return slot_locations
+
+    def __iter__(self) -> typing.Iterator[int]:
+        return iter(self._ranges)
+
+    def __len__(self) -> int:
+        return len(self._ranges)
+
+    @property
+    def columns(self) -> typing.Tuple[typing.Sequence[int], ...]:
+        """The slots, their location counts, then location, item, player and flags columns for LocationStore."""
+        return (self._columns["locations.slots"], self._columns["locations.counts"],
+                *(self._columns[name] for name, _ in _location_columns))
+
+
+class MultiData(typing.MutableMapping[str, typing.Any]):
+    """
+    Lazy mapping over a version 4 multidata. Data can be bytes or a memory map and needs to stay valid while this is
+    in use. Keys are decoded on first access and cached, so changes to mutable values persist like they would in a
+    dict.
+    """
+
+    def __init__(self, data: typing.Union[bytes, bytearray, memoryview, typing.Any]) -> None:
+        self._data = memoryview(data)
+        header_size = int.from_bytes(self._data[1:5], "little")
+        self._sections: typing.Dict[str, typing.List[typing.Any]] = \
+            json.loads(bytes(self._data[5:5 + header_size]))["sections"]
+        self._keys = [name for name in self._sections if not name.startswith("locations.")]
+        if "locations.slots" in self._sections:
+            self._keys.append("locations")
+        self._decoded: typing.Dict[str, typing.Any] = {}
+
+    def _section(self, name: str) -> memoryview:
+        offset, size, _ = self._sections[name]
+        return self._data[offset:offset + size]
+
+    def _column(self, name: str) -> typing.Sequence[int]:
+        section = self._section(name)
+        typecode = self._sections[name][2]
+        if sys.byteorder == "little":
+            return section.cast(typecode)
+        column = array.array(typecode, section)
+        column.byteswap()
+        return column
+
+    def __getitem__(self, key: str) -> typing.Any:
+        try:
+            return self._decoded[key]
+        except KeyError:
+            if key not in self._keys:
+                raise
+        if key == "locations":
+            value = PackedLocations({name: self._column(name) for name in self._sections
+                                     if name.startswith("locations.")})
+        else:
+            value = restricted_loads(zlib.decompress(self._section(key)))
+        self._decoded[key] = value
+        return value
+
+    def __setitem__(self, key: str, value: typing.Any) -> None:
+        if key not in self._keys:
+            self._keys.append(key)
+        self._decoded[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        self._keys.remove(key)
+        self._decoded.pop(key, None)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._keys
+
+    def __iter__(self) -> typing.Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def release(self) -> None:
+        """Releases the data, so a memory map can be closed. Keys that were not decoded yet can't be read afterwards."""
+        self._data.release()
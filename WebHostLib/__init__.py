@@ -24,8 +24,14 @@ app.jinja_env.filters['get_file_safe_name'] = get_file_safe_name
 
 app.config["SELFHOST"] = True  # application process is in charge of running the websites
 app.config["GENERATORS"] = 8  # maximum concurrent world gens
+# estimated seconds at which a generation counts as long, long ones are kept off a quarter of the generators
+app.config["LONG_GENERATION_TIME"] = 120
 app.config["HOSTERS"] = 8  # maximum concurrent room hosters
+# if set, room hoster number n serves Prometheus metrics of all its rooms on localhost port HOSTER_METRICS_PORT + n
+app.config["HOSTER_METRICS_PORT"] = 0
 app.config["SELFLAUNCH"] = True  # application process is in charge of launching Rooms.
+# seconds between scans for room activity; visits to a room page wake it right away if the autohost runs in-process
+app.config["AUTOHOST_SCAN_INTERVAL"] = 1
 app.config["SELFLAUNCHCERT"] = None  # can point to a SSL Certificate to encrypt Room websocket connections
 app.config["SELFLAUNCHKEY"] = None  # can point to a SSL Certificate Key to encrypt Room websocket connections
 app.config["SELFGEN"] = True  # application process is in charge of scheduling Generations.
@@ -41,6 +47,8 @@ app.config["JOB_THRESHOLD"] = 1
 app.config["JOB_TIME"] = 600
 # memory limit for generator processes in bytes
 app.config["GENERATOR_MEMORY_LIMIT"] = 4294967296
+# fork generator processes from a template process that imported all worlds once, instead of importing them in each
+app.config["GENERATOR_PRELOAD"] = True
 app.config['SESSION_PERMANENT'] = True
 
 # waitress uses one thread for I/O, these are for processing of views that then get sent
@@ -53,6 +61,8 @@ app.config["PONY"] = {
     'create_db': True
 }
 app.config["MAX_ROLL"] = 20
+# approximate bytes of memory each process may use to keep parsed multidata and data packages around for trackers
+app.config["TRACKER_SEED_CACHE_SIZE"] = 256 * 1024 * 1024
 app.config["CACHE_TYPE"] = "SimpleCache"
 app.config["HOST_ADDRESS"] = ""
 app.config["ASSET_RIGHTS"] = False
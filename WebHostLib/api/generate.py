@@ -8,7 +8,7 @@ from pony.orm import commit
 
 from WebHostLib import app
 from WebHostLib.check import get_yaml_data, roll_options
-from WebHostLib.generate import get_meta
+from WebHostLib.generate import get_generation_estimate, get_meta, get_wait_text
 from WebHostLib.models import Generation, STATE_QUEUED, Seed, STATE_ERROR
 from . import api_endpoints
 
@@ -82,4 +82,4 @@ def wait_seed_api(seed: UUID):
         return {"text": "Generation not found"}, 404
     elif generation.state == STATE_ERROR:
         return {"text": "Generation failed"}, 500
-    return {"text": "Generation running"}, 202
+    return {"text": get_wait_text(generation), "estimate": get_generation_estimate(generation)}, 202
@@ -1,8 +1,12 @@
 from __future__ import annotations
 
+import collections
+import heapq
 import json
 import logging
 import multiprocessing
+import queue
+import time
 import typing
 from datetime import timedelta, datetime
 from threading import Event, Thread
@@ -16,6 +20,10 @@ from .locker import Locker, AlreadyRunningException
 
 _stop_event = Event()
 
+GENERATION_BASE_COST = 2.0  # seconds a generation takes regardless of its games
+GENERATION_PLAYER_COST = 5.0  # seconds per player assumed before there are any statistics
+GENERATION_STATISTIC_SAMPLES = 50  # generations a game's average is made of at most
+
 
 def stop():
     """Stops previously launched threads"""
@@ -40,27 +48,90 @@ def _mp_gen_game(gen_options: dict, meta: dict[str, Any] | None = None, owner=No
     from setproctitle import setproctitle
 
     setproctitle(f"Generator ({sid})")
+    start = time.perf_counter()
     res = gen_game(gen_options, meta=meta, owner=owner, sid=sid)
+    if res:
+        record_generation_time([options["game"] for options in gen_options.values()], time.perf_counter() - start)
     setproctitle(f"Generator (idle)")
     return res
 
 
-def launch_generator(pool: multiprocessing.pool.Pool, generation: Generation):
+def launch_generator(pool: multiprocessing.pool.Pool, generation: Generation,
+                     cost: float) -> multiprocessing.pool.AsyncResult | None:
     try:
         meta = json.loads(generation.meta)
         options = restricted_loads(generation.options)
         logging.info(f"Generating {generation.id} for {len(options)} players")
-        pool.apply_async(_mp_gen_game, (options,),
-                         {"meta": meta,
-                          "sid": generation.id,
-                          "owner": generation.owner},
-                         handle_generation_success, handle_generation_failure)
+        # lets the wait page tell when the generation should be done
+        generation.meta = json.dumps({**meta, "queue": {"start": time.time(), "cost": cost}})
+        generation.state = STATE_STARTED
+        commit()  # before the generator can report back on the generation
+        return pool.apply_async(_mp_gen_game, (options,),
+                                {"meta": meta,
+                                 "sid": generation.id,
+                                 "owner": generation.owner},
+                                handle_generation_success, handle_generation_failure)
     except Exception as e:
         generation.state = STATE_ERROR
         commit()
         logging.exception(e)
-    else:
-        generation.state = STATE_STARTED
+        return None
+
+
+def _player_cost(game: str, seconds_per_player: dict[str, float]) -> float:
+    if game in seconds_per_player:
+        return seconds_per_player[game]
+    if seconds_per_player:
+        return sum(seconds_per_player.values()) / len(seconds_per_player)
+    return GENERATION_PLAYER_COST
+
+
+def estimate_generation_cost(games: typing.Iterable[str], seconds_per_player: dict[str, float]) -> float:
+    """Estimated seconds to generate a multiworld of these games. Games without statistics count as an average game."""
+    return GENERATION_BASE_COST + sum(_player_cost(game, seconds_per_player) for game in games)
+
+
+def record_generation_time(games: typing.List[str], seconds: float) -> None:
+    """
+    Adds a finished generation to the per-game statistics. The time beyond the base cost is split between the games
+    by their share of the estimate, so each game's average converges on its part of mixed multiworlds as well.
+    """
+    try:
+        _record_generation_time(games, seconds)
+    except Exception as e:
+        # statistics only improve estimates, the generation itself succeeded
+        logging.exception(e)
+
+
+@db_session(retry=3)
+def _record_generation_time(games: typing.List[str], seconds: float) -> None:
+    players = collections.Counter(games)
+    statistics = {game: GenerationStatistic.get(game=game) for game in players}
+    seconds_per_player = {game: statistic.seconds_per_player for game, statistic in statistics.items() if statistic}
+    estimate = sum(_player_cost(game, seconds_per_player) * count for game, count in players.items())
+    work = max(seconds - GENERATION_BASE_COST, 0.0)
+    for game, statistic in statistics.items():
+        # kept above 0, so the game keeps a share of the next generation it is part of
+        observed = max(work * _player_cost(game, seconds_per_player) / estimate, 0.01)
+        if statistic:
+            statistic.samples = min(statistic.samples + 1, GENERATION_STATISTIC_SAMPLES)
+            statistic.seconds_per_player += (observed - statistic.seconds_per_player) / statistic.samples
+        else:
+            GenerationStatistic(game=game, samples=1, seconds_per_player=observed)
+
+
+def get_generator_context(config: dict[str, Any]) -> multiprocessing.context.BaseContext:
+    """
+    Where supported, generators are forked from a template process that has already imported all worlds, so starting
+    or recycling one takes milliseconds instead of importing them again. Memory limits are set by init_generator after
+    the fork, so they don't apply to the template.
+    """
+    if config["GENERATOR_PRELOAD"] and "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # modules that fail to import here are skipped, generators then import them on their own
+        context.set_forkserver_preload(["worlds", "WebHostLib.generate"])
+        return context
+    return multiprocessing.get_context()
 
 
 def init_generator(config: dict[str, Any]) -> None:
@@ -99,8 +170,215 @@ def cleanup():
         logging.info(f"{rooms} Rooms, {seeds} Seeds and {slots} Slots have been deleted.")
 
 
+class RoomScheduler:
+    """
+    Decides which rooms should be hosted. Rooms that should run are kept in a heap ordered by the time their activity
+    runs out, so a room is only looked at again when that time comes, when it shut down or when it is woken by the
+    request that marked it active. Activity from other processes is picked up by a periodic scan of rooms whose
+    activity changed since the last scan.
+    """
+    tick = 0.1
+    # activity is timestamped before its transaction commits, so scans overlap by this much
+    scan_overlap = timedelta(minutes=1)
+
+    def __init__(self, hosters: typing.List[MultiworldInstance], scan_interval: float) -> None:
+        self.hosters = hosters
+        self.scan_interval = scan_interval
+        self.deadlines: typing.List[typing.Tuple[datetime, UUID]] = []
+        self.scheduled: typing.Dict[UUID, datetime] = {}
+        self.woken: queue.SimpleQueue[UUID] = queue.SimpleQueue()
+        self.last_scan: typing.Optional[datetime] = None
+        self.next_scan = 0.0
+
+    def wake(self, room_id: UUID) -> None:
+        self.woken.put(room_id)
+
+    def schedule(self, room: Room, now: datetime) -> None:
+        deadline = room.last_activity + timedelta(seconds=room.timeout + 5)
+        if deadline < now:
+            self.scheduled.pop(room.id, None)
+            return
+        self.hosters[room.id.int % len(self.hosters)].start_room(room.id)
+        if self.scheduled.get(room.id) != deadline:
+            # an outdated entry left in the heap is skipped once it comes up
+            self.scheduled[room.id] = deadline
+            heapq.heappush(self.deadlines, (deadline, room.id))
+
+    def step(self) -> None:
+        now = datetime.utcnow()
+        due: typing.Set[UUID] = set()
+        while not self.woken.empty():
+            due.add(self.woken.get())
+        for hoster in self.hosters:
+            # a room may have been marked active again while it was shutting down
+            due.update(room_id for room_id in hoster.collect_shutdowns() if room_id in self.scheduled)
+        while self.deadlines and self.deadlines[0][0] < now:
+            deadline, room_id = heapq.heappop(self.deadlines)
+            if self.scheduled.get(room_id) == deadline:
+                due.add(room_id)
+        scan = time.monotonic() >= self.next_scan
+        if not due and not scan:
+            return
+        with db_session:
+            for room_id in due:
+                room = Room.get(id=room_id)
+                if room:
+                    self.schedule(room, now)
+                else:
+                    self.scheduled.pop(room_id, None)
+            if scan:
+                since = self.last_scan - self.scan_overlap if self.last_scan else now - timedelta(days=3)
+                # we have to filter twice, as the per-room timeout can't currently be PonyORM transpiled.
+                for room in select(room for room in Room if room.last_activity >= since):
+                    self.schedule(room, now)
+                self.last_scan = now
+                self.next_scan = time.monotonic() + self.scan_interval
+
+
+_room_scheduler: typing.Optional[RoomScheduler] = None
+
+
+class QueuedGeneration(typing.NamedTuple):
+    id: UUID
+    owner: UUID
+    cost: float  # estimated seconds
+    queued: float  # time the scheduler first saw the generation
+
+
+class GenerationScheduler:
+    """
+    Decides which queued generations to start. A generation's cost is estimated from its games and how long those
+    took to generate before. Each free generator goes to the owner with the least estimated work generating, and
+    within an owner to the oldest generation. Long generations may not take every generator, so short ones don't wait
+    behind them. These rules are also played forward to write an expected start into each queued generation's meta.
+    """
+    tick = 0.1
+    estimate_interval = 5.0
+    statistics_interval = 60.0
+    # seconds beyond the job time after which a generation counts as lost with its generator
+    lost_margin = 60.0
+
+    def __init__(self, pool: multiprocessing.pool.Pool, slots: int, long_time: float,
+                 job_time: float | None = None) -> None:
+        self.pool = pool
+        self.slots = slots
+        self.job_time = job_time
+        # a quarter of the generators, at least one, is kept free of long generations if there is more than one
+        self.long_slots = max(1, slots - max(1, slots // 4))
+        self.long_time = long_time
+        self.queued: typing.Dict[UUID, QueuedGeneration] = {}
+        self.running: typing.Dict[UUID, typing.Tuple[QueuedGeneration, float, multiprocessing.pool.AsyncResult]] = {}
+        self.seconds_per_player: typing.Dict[str, float] = {}
+        self.next_statistics = 0.0
+        self.next_estimate = 0.0
+
+    def pick(self, running: typing.Iterable[QueuedGeneration],
+             queued: typing.Iterable[QueuedGeneration]) -> typing.List[QueuedGeneration]:
+        """Returns the queued generations to start next, given the ones that are running."""
+        running = list(running)
+        candidates = list(queued)
+        free = self.slots - len(running)
+        long_running = sum(generation.cost >= self.long_time for generation in running)
+        owner_load: typing.Counter[UUID] = collections.Counter()
+        for generation in running:
+            owner_load[generation.owner] += generation.cost
+        picked: typing.List[QueuedGeneration] = []
+        while free > 0:
+            eligible = [generation for generation in candidates
+                        if generation.cost < self.long_time or long_running < self.long_slots]
+            if not eligible:
+                break
+            generation = min(eligible, key=lambda generation: (owner_load[generation.owner], generation.queued))
+            candidates.remove(generation)
+            picked.append(generation)
+            owner_load[generation.owner] += generation.cost
+            long_running += generation.cost >= self.long_time
+            free -= 1
+        return picked
+
+    def estimate_starts(self, now: float) -> typing.Dict[UUID, float]:
+        """Expected start of each queued generation, if every generation takes as long as estimated."""
+        running = {generation.id: (generation, max(start + generation.cost, now))
+                   for generation, start, _ in self.running.values()}
+        queued = dict(self.queued)
+        starts: typing.Dict[UUID, float] = {}
+        while queued:
+            for generation in self.pick((generation for generation, _ in running.values()), queued.values()):
+                starts[generation.id] = now
+                running[generation.id] = (generation, now + generation.cost)
+                del queued[generation.id]
+            if not running:
+                break
+            now = running.pop(min(running, key=lambda generation_id: running[generation_id][1]))[1]
+        return starts
+
+    def add(self, generation: Generation, now: float) -> None:
+        try:
+            games = [options["game"] for options in restricted_loads(generation.options).values()]
+        except Exception as e:
+            generation.state = STATE_ERROR
+            logging.exception(e)
+        else:
+            cost = estimate_generation_cost(games, self.seconds_per_player)
+            self.queued[generation.id] = QueuedGeneration(generation.id, generation.owner, cost, now)
+
+    def step(self) -> None:
+        now = time.time()
+        lost: typing.List[UUID] = []
+        for generation_id, (_, start, result) in list(self.running.items()):
+            if result.ready():
+                del self.running[generation_id]
+            elif self.job_time is not None and now > start + self.job_time + self.lost_margin:
+                # the pool never resolves the result of a generator killed by the OS, which would hold its slot
+                del self.running[generation_id]
+                lost.append(generation_id)
+        with db_session:
+            for generation_id in lost:
+                generation = Generation.get(id=generation_id)
+                if generation and generation.state == STATE_STARTED:
+                    logging.error(f"Generation {generation_id} was lost, its generator likely stopped.")
+                    generation.state = STATE_ERROR
+                    meta = json.loads(generation.meta)
+                    meta["error"] = "Generation did not finish, its generator likely ran out of memory or crashed."
+                    generation.meta = json.dumps(meta)
+            if now >= self.next_statistics:
+                self.seconds_per_player = {statistic.game: statistic.seconds_per_player
+                                           for statistic in GenerationStatistic.select()}
+                self.next_statistics = now + self.statistics_interval
+            # for update locks the database row(s) during transaction, preventing writes from elsewhere
+            generations = {generation.id: generation for generation in select(
+                generation for generation in Generation if generation.state == STATE_QUEUED).for_update()}
+            for generation_id in self.queued.keys() - generations.keys():
+                del self.queued[generation_id]  # deleted from elsewhere
+            for generation_id, generation in generations.items():
+                if generation_id not in self.queued:
+                    self.add(generation, now)
+            for queued in self.pick((generation for generation, _, _ in self.running.values()),
+                                    self.queued.values()):
+                del self.queued[queued.id]
+                result = launch_generator(self.pool, generations[queued.id], queued.cost)
+                if result:
+                    self.running[queued.id] = (queued, now, result)
+            if self.queued and now >= self.next_estimate:
+                for generation_id, start in self.estimate_starts(now).items():
+                    generation = generations[generation_id]
+                    meta = json.loads(generation.meta)
+                    written = meta.get("queue", {}).get("start")
+                    if written is None or abs(written - start) >= self.estimate_interval:
+                        meta["queue"] = {"start": start, "cost": self.queued[generation_id].cost}
+                        generation.meta = json.dumps(meta)
+                self.next_estimate = now + self.estimate_interval
+
+
+def wake_room(room_id: UUID) -> None:
+    """Lets the autohost of this process, if there is one, pick up new activity of the room right away."""
+    if _room_scheduler:
+        _room_scheduler.wake(room_id)
+
+
 def autohost(config: dict):
     def keep_running():
+        global _room_scheduler
         stop_event = _stop_event
         try:
             with Locker("autohost"):
@@ -111,15 +389,9 @@ def autohost(config: dict):
                     hosters.append(hoster)
                     hoster.start()
 
-                while not stop_event.wait(0.1):
-                    with db_session:
-                        rooms = select(
-                            room for room in Room if
-                            room.last_activity >= datetime.utcnow() - timedelta(days=3))
-                        for room in rooms:
-                            # we have to filter twice, as the per-room timeout can't currently be PonyORM transpiled.
-                            if room.last_activity >= datetime.utcnow() - timedelta(seconds=room.timeout + 5):
-                                hosters[room.id.int % len(hosters)].start_room(room.id)
+                scheduler = _room_scheduler = RoomScheduler(hosters, config["AUTOHOST_SCAN_INTERVAL"])
+                while not stop_event.wait(scheduler.tick):
+                    scheduler.step()
 
         except AlreadyRunningException:
             logging.info("Autohost reports as already running, not starting another.")
@@ -133,8 +405,8 @@ def autogen(config: dict):
         try:
             with Locker("autogen"):
 
-                with multiprocessing.Pool(config["GENERATORS"], initializer=init_generator,
-                                          initargs=(config,), maxtasksperchild=10) as generator_pool:
+                with get_generator_context(config).Pool(config["GENERATORS"], initializer=init_generator,
+                                                        initargs=(config,), maxtasksperchild=10) as generator_pool:
                     with db_session:
                         to_start = select(generation for generation in Generation if generation.state == STATE_STARTED)
 
@@ -145,19 +417,15 @@ def autogen(config: dict):
                                 if sid:
                                     generation.delete()
                                 else:
-                                    launch_generator(generator_pool, generation)
+                                    generation.state = STATE_QUEUED  # queued again for the scheduler to start
 
                             commit()
                         select(generation for generation in Generation if generation.state == STATE_ERROR).delete()
 
-                    while not stop_event.wait(0.1):
-                        with db_session:
-                            # for update locks the database row(s) during transaction, preventing writes from elsewhere
-                            to_start = select(
-                                generation for generation in Generation
-                                if generation.state == STATE_QUEUED).for_update()
-                            for generation in to_start:
-                                launch_generator(generator_pool, generation)
+                    scheduler = GenerationScheduler(generator_pool, config["GENERATORS"],
+                                                    config["LONG_GENERATION_TIME"], config["JOB_TIME"])
+                    while not stop_event.wait(scheduler.tick):
+                        scheduler.step()
         except AlreadyRunningException:
             logging.info("Autogen reports as already running, not starting another.")
 
@@ -175,6 +443,7 @@ class MultiworldInstance():
         self.cert = config["SELFLAUNCHCERT"]
         self.key = config["SELFLAUNCHKEY"]
         self.host = config["HOST_ADDRESS"]
+        self.metrics_port = config["HOSTER_METRICS_PORT"] + id if config["HOSTER_METRICS_PORT"] else 0
         self.rooms_to_start = multiprocessing.Queue()
         self.rooms_shutting_down = multiprocessing.Queue()
         self.name = f"MultiHoster{id}"
@@ -186,14 +455,21 @@ class MultiworldInstance():
         process = multiprocessing.Process(group=None, target=run_server_process,
                                           args=(self.name, self.ponyconfig, get_static_server_data(),
                                                 self.cert, self.key, self.host,
-                                                self.rooms_to_start, self.rooms_shutting_down),
+                                                self.rooms_to_start, self.rooms_shutting_down, self.metrics_port),
                                           name=self.name)
         process.start()
         self.process = process
 
-    def start_room(self, room_id):
+    def collect_shutdowns(self) -> typing.List[UUID]:
+        """Forgets rooms that finished shutting down, returning their ids."""
+        room_ids = []
         while not self.rooms_shutting_down.empty():
-            self.room_ids.remove(self.rooms_shutting_down.get(block=True, timeout=None))
+            room_id = self.rooms_shutting_down.get(block=True, timeout=None)
+            self.room_ids.remove(room_id)
+            room_ids.append(room_id)
+        return room_ids
+
+    def start_room(self, room_id):
         if room_id in self.room_ids:
             pass  # should already be hosted currently.
         else:
@@ -213,6 +489,6 @@ class MultiworldInstance():
         self.process = None
 
 
-from .models import Room, Generation, STATE_QUEUED, STATE_STARTED, STATE_ERROR, db, Seed, Slot
+from .models import Room, Generation, GenerationStatistic, STATE_QUEUED, STATE_STARTED, STATE_ERROR, db, Seed, Slot
 from .customserver import run_server_process, get_static_server_data
 from .generate import gen_game
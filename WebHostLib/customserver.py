@@ -19,7 +19,8 @@ from pony.orm import commit, db_session, select
 
 import Utils
 
-from MultiServer import Context, server, auto_shutdown, ServerCommandProcessor, ClientMessageProcessor, load_server_cert
+from MultiServer import Context, server, auto_shutdown, ServerCommandProcessor, ClientMessageProcessor, load_server_cert, \
+    metrics
 from Utils import restricted_loads, cache_argsless
 from .locker import Locker
 from .models import Command, GameDataPackage, Room, db
@@ -86,19 +87,6 @@ class WebHostContext(Context):
             setattr(self, key, value)
         self.non_hintable_names = collections.defaultdict(frozenset, self.non_hintable_names)
 
-    def listen_to_db_commands(self):
-        cmdprocessor = DBCommandProcessor(self)
-
-        while not self.exit_event.is_set():
-            with db_session:
-                commands = select(command for command in Command if command.room.id == self.room_id)
-                if commands:
-                    for command in commands:
-                        self.main_loop.call_soon_threadsafe(cmdprocessor, command.commandtext)
-                        command.delete()
-                    commit()
-            time.sleep(5)
-
     @db_session
     def load(self, room_id: int):
         self.room_id = room_id
@@ -154,7 +142,6 @@ class WebHostContext(Context):
             if savegame_data:
                 self.set_save(restricted_loads(Room.get(id=self.room_id).multisave))
             self._start_async_saving(atexit_save=False)
-        threading.Thread(target=self.listen_to_db_commands, daemon=True).start()
 
     @db_session
     def _save(self, exit_save: bool = False) -> bool:
@@ -171,6 +158,51 @@ class WebHostContext(Context):
         return d
 
 
+class DBCommandDispatcher(threading.Thread):
+    """
+    Polls the Command table once for all rooms of this process, instead of once per room,
+    and hands each command to the loop of the room it is meant for.
+    """
+    interval = 5
+
+    def __init__(self) -> None:
+        super().__init__(name="DBCommandDispatcher", daemon=True)
+        self.rooms: typing.Dict[typing.Any, DBCommandProcessor] = {}
+        self.lock = threading.Lock()
+
+    def add_room(self, ctx: WebHostContext) -> None:
+        with self.lock:
+            self.rooms[ctx.room_id] = DBCommandProcessor(ctx)
+
+    def remove_room(self, ctx: WebHostContext) -> None:
+        with self.lock:
+            self.rooms.pop(ctx.room_id, None)
+
+    @db_session
+    def dispatch(self) -> None:
+        with self.lock:
+            rooms = dict(self.rooms)
+        room_ids = list(rooms)
+        # commands of rooms hosted by other processes are left for those to pick up
+        commands = select(command for command in Command if command.room.id in room_ids)[:]
+        for command in commands:
+            cmdprocessor = rooms[command.room.id]
+            cmdprocessor.ctx.main_loop.call_soon_threadsafe(cmdprocessor, command.commandtext)
+            command.delete()
+        if commands:
+            commit()
+
+    def run(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            if not self.rooms:
+                continue
+            try:
+                self.dispatch()
+            except Exception as e:
+                logging.exception(e)
+
+
 def get_random_port():
     return random.randint(49152, 65535)
 
@@ -226,11 +258,15 @@ def set_up_logging(room_id) -> logging.Logger:
 
 def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
                        cert_file: typing.Optional[str], cert_key_file: typing.Optional[str],
-                       host: str, rooms_to_run: multiprocessing.Queue, rooms_shutting_down: multiprocessing.Queue):
+                       host: str, rooms_to_run: multiprocessing.Queue, rooms_shutting_down: multiprocessing.Queue,
+                       metrics_port: int = 0):
     from setproctitle import setproctitle
 
     setproctitle(name)
     Utils.init_logging(name)
+    if metrics_port:
+        # every room of this process runs on the same loop, so the process wide metrics cover all of them
+        metrics.serve(metrics_port)
     try:
         import resource
     except ModuleNotFoundError:
@@ -270,6 +306,8 @@ def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
     gc.collect()  # free intermediate objects used during setup
 
     loop = asyncio.get_event_loop()
+    command_dispatcher = DBCommandDispatcher()
+    command_dispatcher.start()
 
     async def start_room(room_id):
         with Locker(f"RoomLocker {room_id}"):
@@ -278,6 +316,7 @@ def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
                 ctx = WebHostContext(static_server_data, logger)
                 ctx.load(room_id)
                 ctx.init_save()
+                command_dispatcher.add_room(ctx)
                 assert ctx.server is None
                 try:
                     ctx.server = websockets.serve(
@@ -329,6 +368,7 @@ def run_server_process(name: str, ponyconfig: dict, static_server_data: dict,
                     setattr(asyncio.current_task(), "save", None)
             finally:
                 try:
+                    command_dispatcher.remove_room(ctx)
                     ctx.save_dirty = False  # make sure the saving thread does not write to DB after final wakeup
                     ctx.exit_event.set()  # make sure the saving thread stops at some point
                     # NOTE: async saving should probably be an async task and could be merged with shutdown_task
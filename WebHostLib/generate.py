@@ -4,6 +4,7 @@ import os
 import pickle
 import random
 import tempfile
+import time
 import zipfile
 from collections import Counter
 from typing import Any, Dict, List, Optional, Union, Set
@@ -19,7 +20,7 @@ from WebHostLib import app
 from settings import ServerOptions, GeneratorOptions
 from worlds.alttp.EntranceRandomizer import parse_arguments
 from .check import get_yaml_data, roll_options
-from .models import Generation, STATE_ERROR, STATE_QUEUED, Seed, UUID
+from .models import Generation, STATE_ERROR, STATE_QUEUED, STATE_STARTED, Seed, UUID
 from .upload import upload_zip_to_db
 
 
@@ -185,6 +186,29 @@ def gen_game(gen_options: dict, meta: Optional[Dict[str, Any]] = None, owner=Non
         raise
 
 
+def get_generation_estimate(generation: Generation) -> Optional[float]:
+    """Seconds until the generation should be done, going by the estimate the generation scheduler keeps in meta."""
+    queue = json.loads(generation.meta).get("queue")
+    if not queue:
+        return None
+    now = time.time()
+    start = queue["start"] if generation.state == STATE_STARTED else max(queue["start"], now)
+    return start + queue["cost"] - now
+
+
+def get_wait_text(generation: Generation) -> str:
+    text = "Generation running" if generation.state == STATE_STARTED else "Generation queued"
+    estimate = get_generation_estimate(generation)
+    if estimate is None:
+        return text
+    elif estimate <= 0:
+        return f"{text}, taking longer than expected"
+    elif estimate < 60:
+        return f"{text}, expected to be done in less than a minute"
+    minutes = round(estimate / 60)
+    return f"{text}, expected to be done in about {minutes} minute{'s' if minutes > 1 else ''}"
+
+
 @app.route('/wait/<suuid:seed>')
 def wait_seed(seed: UUID):
     seed_id = seed
@@ -197,7 +221,7 @@ def wait_seed(seed: UUID):
         return "Generation not found."
     elif generation.state == STATE_ERROR:
         return render_template("seedError.html", seed_error=generation.meta)
-    return render_template("waitSeed.html", seed_id=seed_id)
+    return render_template("waitSeed.html", seed_id=seed_id, wait_text=get_wait_text(generation))
 
 
 def upload_to_db(folder, sid, owner, race):
@@ -58,6 +58,12 @@ class Generation(db.Entity):
     state = Required(int, default=0, index=True)
 
 
+class GenerationStatistic(db.Entity):
+    game = PrimaryKey(str)
+    samples = Required(int)  # generations the average is made of, capped so it keeps following changes to the game
+    seconds_per_player = Required(float)
+
+
 class GameDataPackage(db.Entity):
     checksum = PrimaryKey(str)
     data = Required(bytes)
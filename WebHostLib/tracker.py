@@ -1,5 +1,7 @@
 import datetime
 import collections
+import threading
+import weakref
 from dataclasses import dataclass
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple, NamedTuple, Counter
 from uuid import UUID
@@ -10,14 +12,13 @@ from werkzeug.exceptions import abort
 
 from MultiServer import Context, get_saving_second
 from NetUtils import ClientStatus, Hint, NetworkItem, NetworkSlot, SlotType
-from Utils import restricted_loads, KeyedDefaultDict
+from Utils import restricted_loads
 from . import app, cache
-from .models import GameDataPackage, Room
+from .models import GameDataPackage, Room, Seed
 
 # Multisave is currently updated, at most, every minute.
 TRACKER_CACHE_TIMEOUT_IN_SECONDS = 60
 
-_multidata_cache = {}
 _multiworld_trackers: Dict[str, Callable] = {}
 _player_trackers: Dict[str, Callable] = {}
 
@@ -25,6 +26,132 @@ TeamPlayer = Tuple[int, int]
 ItemMetadata = Tuple[int, int, int]
 
 
+# Approximate memory taken by parsed seed data, relative to the size it is stored with. Measured on generated seeds,
+# zlib compressed multidata expands 10 to 20 times. Pickled data packages expand about 3.5 times, and up to 7.5 times
+# for small ones, which the inverse lookup tables double.
+MULTIDATA_EXPANSION = 20
+DATA_PACKAGE_EXPANSION = 7
+
+
+class _SharedLookup(dict):
+    """
+    Like KeyedDefaultDict, but the value for a missing key is made up on every lookup instead of being inserted,
+    so lookups of unknown ids don't modify data shared between requests.
+    """
+    default_factory: Callable[[Any], Any]
+
+    def __init__(self, default_factory: Callable[[Any], Any], seq: Any = ()) -> None:
+        super().__init__(seq)
+        self.default_factory = default_factory
+
+    def __missing__(self, key: Any) -> Any:
+        return self.default_factory(key)
+
+
+@dataclass
+class _GamePackageData:
+    """Lookup tables of one data package, shared by every seed that uses it. Never modified."""
+    item_id_to_name: Dict[int, str]
+    location_id_to_name: Dict[int, str]
+    item_name_to_id: Dict[str, int]
+    location_name_to_id: Dict[str, int]
+    size: int  # approximate memory taken, see DATA_PACKAGE_EXPANSION
+
+
+class _SeedData(NamedTuple):
+    """Parsed multidata and data package lookups of a seed, shared by every tracker request for it. Never modified."""
+    multidata: Dict[str, Any]
+    item_id_to_name: Dict[str, Dict[int, str]]
+    location_id_to_name: Dict[str, Dict[int, str]]
+    item_name_to_id: Dict[str, Dict[str, int]]
+    location_name_to_id: Dict[str, Dict[str, int]]
+    # keeps the lookups of its data packages in _game_package_cache for other seeds
+    game_packages: List[_GamePackageData]
+    # approximate memory taken, including data packages shared with other cached seeds
+    size: int
+
+
+_seed_data_cache: "collections.OrderedDict[UUID, _SeedData]" = collections.OrderedDict()
+_seed_data_cache_size = 0
+# checksum -> lookups, kept for as long as a loaded seed still uses them
+_game_package_cache: "weakref.WeakValueDictionary[str, _GamePackageData]" = weakref.WeakValueDictionary()
+_seed_data_lock = threading.Lock()
+
+
+def _load_game_package_data(checksum: str) -> _GamePackageData:
+    with _seed_data_lock:
+        game_package_data = _game_package_cache.get(checksum)
+    if game_package_data:
+        return game_package_data
+
+    game_package_blob = GameDataPackage.get(checksum=checksum).data
+    game_package = restricted_loads(game_package_blob)
+    game_package_data = _GamePackageData(
+        _SharedLookup(lambda code: f"Unknown Item (ID: {code})", {
+            id: name for name, id in game_package["item_name_to_id"].items()}),
+        _SharedLookup(lambda code: f"Unknown Location (ID: {code})", {
+            id: name for name, id in game_package["location_name_to_id"].items()}),
+        game_package["item_name_to_id"],
+        game_package["location_name_to_id"],
+        len(game_package_blob) * DATA_PACKAGE_EXPANSION)
+    with _seed_data_lock:
+        return _game_package_cache.setdefault(checksum, game_package_data)
+
+
+def _load_seed_data(seed: Seed) -> _SeedData:
+    multidata_blob = seed.multidata
+    multidata = Context.decompress(multidata_blob)
+    size = len(multidata_blob) * MULTIDATA_EXPANSION
+    item_name_to_id: Dict[str, Dict[str, int]] = {}
+    location_name_to_id: Dict[str, Dict[str, int]] = {}
+    game_packages: List[_GamePackageData] = []
+
+    # Generate inverse lookup tables from data package, useful for trackers.
+    item_id_to_name: Dict[str, Dict[int, str]] = _SharedLookup(lambda game_name: {
+        game_name: _SharedLookup(lambda code: f"Unknown Game {game_name} - Item (ID: {code})")
+    })
+    location_id_to_name: Dict[str, Dict[int, str]] = _SharedLookup(lambda game_name: {
+        game_name: _SharedLookup(lambda code: f"Unknown Game {game_name} - Location (ID: {code})")
+    })
+    for game, game_package in multidata["datapackage"].items():
+        game_package_data = _load_game_package_data(game_package["checksum"])
+        game_packages.append(game_package_data)
+        size += game_package_data.size
+        item_id_to_name[game] = game_package_data.item_id_to_name
+        location_id_to_name[game] = game_package_data.location_id_to_name
+
+        # Normal lookup tables as well.
+        item_name_to_id[game] = game_package_data.item_name_to_id
+        location_name_to_id[game] = game_package_data.location_name_to_id
+
+    return _SeedData(multidata, item_id_to_name, location_id_to_name, item_name_to_id, location_name_to_id,
+                     game_packages, size)
+
+
+def _get_seed_data(seed: Seed) -> _SeedData:
+    """
+    Returns the seed's data from the per-process LRU, which holds up to TRACKER_SEED_CACHE_SIZE bytes of parsed data,
+    as estimated by MULTIDATA_EXPANSION and DATA_PACKAGE_EXPANSION.
+    """
+    global _seed_data_cache_size
+    with _seed_data_lock:
+        seed_data = _seed_data_cache.get(seed.id)
+        if seed_data:
+            _seed_data_cache.move_to_end(seed.id)
+            return seed_data
+
+    seed_data = _load_seed_data(seed)
+    budget = app.config["TRACKER_SEED_CACHE_SIZE"]
+    with _seed_data_lock:
+        if seed.id not in _seed_data_cache and seed_data.size <= budget:
+            _seed_data_cache[seed.id] = seed_data
+            _seed_data_cache_size += seed_data.size
+            while _seed_data_cache_size > budget:
+                _, evicted = _seed_data_cache.popitem(last=False)
+                _seed_data_cache_size -= evicted.size
+    return seed_data
+
+
 def _cache_results(func: Callable) -> Callable:
     """Stores the results of any computationally expensive methods after the initial call in TrackerData.
     If called again, returns the cached result instead, as results will not change for the lifetime of TrackerData.
@@ -56,30 +183,16 @@ class TrackerData:
     def __init__(self, room: Room):
         """Initialize a new RoomMultidata object for the current room."""
         self.room = room
-        self._multidata = Context.decompress(room.seed.multidata)
+        # seed data is shared with other requests, only the multisave is loaded for each one
+        seed_data = _get_seed_data(room.seed)
+        self._multidata = seed_data.multidata
         self._multisave = restricted_loads(room.multisave) if room.multisave else {}
         self._tracker_cache = {}
 
-        self.item_name_to_id: Dict[str, Dict[str, int]] = {}
-        self.location_name_to_id: Dict[str, Dict[str, int]] = {}
-
-        # Generate inverse lookup tables from data package, useful for trackers.
-        self.item_id_to_name: Dict[str, Dict[int, str]] = KeyedDefaultDict(lambda game_name: {
-            game_name: KeyedDefaultDict(lambda code: f"Unknown Game {game_name} - Item (ID: {code})")
-        })
-        self.location_id_to_name: Dict[str, Dict[int, str]] = KeyedDefaultDict(lambda game_name: {
-            game_name: KeyedDefaultDict(lambda code: f"Unknown Game {game_name} - Location (ID: {code})")
-        })
-        for game, game_package in self._multidata["datapackage"].items():
-            game_package = restricted_loads(GameDataPackage.get(checksum=game_package["checksum"]).data)
-            self.item_id_to_name[game] = KeyedDefaultDict(lambda code: f"Unknown Item (ID: {code})", {
-                id: name for name, id in game_package["item_name_to_id"].items()})
-            self.location_id_to_name[game] = KeyedDefaultDict(lambda code: f"Unknown Location (ID: {code})", {
-                id: name for name, id in game_package["location_name_to_id"].items()})
-
-            # Normal lookup tables as well.
-            self.item_name_to_id[game] = game_package["item_name_to_id"]
-            self.location_name_to_id[game] = game_package["location_name_to_id"]
+        self.item_name_to_id: Dict[str, Dict[str, int]] = seed_data.item_name_to_id
+        self.location_name_to_id: Dict[str, Dict[str, int]] = seed_data.location_name_to_id
+        self.item_id_to_name: Dict[str, Dict[int, str]] = seed_data.item_id_to_name
+        self.location_id_to_name: Dict[str, Dict[int, str]] = seed_data.location_id_to_name
 
     def get_seed_name(self) -> str:
         """Retrieves the seed name."""
@@ -172,7 +172,75 @@ cdef class LocationStore:
                 self.sender_index[sender].count += 1
                 i += 1
 
+        self._build_caches(count, max_sender, sender_count)
+
+    @classmethod
+    def from_columns(cls, slots: Sequence[int], counts: Sequence[int], locations: Sequence[int],
+                     items: Sequence[int], players: Sequence[int], flags: Sequence[int]) -> "LocationStore":
+        """
+        Builds the store from the location columns of a version 4 multidata, see NetUtils.PackedLocations.columns.
+        Rows are sorted by sender, then location, so they are copied over as they are.
+        """
+        cdef LocationStore store = cls.__new__(cls)
+        store._mem = Pool()
+        store._keys = []
+        store._items = []
+        store._proxies = []
+
+        cdef size_t max_sender = 0
+        cdef size_t sender_count = len(slots)
+        cdef size_t count = len(locations)
+        for sender in slots:
+            if not isinstance(sender, int) or sender < 1 or sender > MAX_PLAYER_ID:
+                raise ValueError(f"Invalid player id {sender} for location")
+            max_sender = max(max_sender, sender)
+
+        if not sender_count:
+            raise ValueError(f"Rejecting game with 0 players")
+
+        if sender_count != max_sender:
+            # we assume player 0 will never have locations
+            raise ValueError("Player IDs not continuous")
+
+        if len(counts) != sender_count or sum(counts) != count or \
+                not len(items) == len(players) == len(flags) == count:
+            raise ValueError("Location columns don't match")
+
+        if not count:
+            warnings.warn("Game has no locations")
+
+        if count:
+            store.entries = <LocationEntry*>store._mem.alloc(count, sizeof(LocationEntry))
+        store.sender_index = <IndexEntry*>store._mem.alloc(max_sender + 1, sizeof(IndexEntry))
+        store._raw_proxies = <PyObject**>store._mem.alloc(max_sender + 1, sizeof(PyObject*))
+
+        assert (not store.entries) == (not count)
+        assert store.sender_index
+        assert store._raw_proxies
+
+        cdef size_t i = 0
+        cdef size_t end
+        for sender, sender_locations in zip(slots, counts):
+            store.sender_index[sender].start = i
+            store.sender_index[sender].count = sender_locations
+            end = i + sender_locations
+            while i < end:
+                receiver = players[i]
+                if receiver < 1 or receiver > MAX_PLAYER_ID:
+                    raise ValueError(f"Invalid player id {receiver} for item")
+                store.entries[i].sender = sender
+                store.entries[i].location = locations[i]
+                store.entries[i].item = items[i]
+                store.entries[i].receiver = receiver
+                store.entries[i].flags = flags[i]
+                i += 1
+
+        store._build_caches(count, max_sender, sender_count)
+        return store
+
+    cdef _build_caches(self, size_t count, size_t max_sender, size_t sender_count):
         # build pyobject caches
+        cdef size_t i
         self._proxies.append(None)  # player 0
         assert self.sender_index[0].count == 0
         for i in range(1, max_sender + 1):
@@ -598,6 +598,29 @@ class ServerOptions(Group):
         OFF = 0
         ON = 1
 
+    class MetricsPort(int):
+        """
+        Serve Prometheus metrics, like per command latency and traffic, on this port of localhost. 0 to disable.
+        """
+
+    class SaveJournalSize(int):
+        """
+        Append changes to a .journal file next to the save file instead of rewriting the whole save each time.
+        Once the journal grows beyond this many bytes, it is compacted into a fresh save file. 0 to disable.
+        """
+
+    class DataStorageFile(Bool):
+        """
+        Keep data storage in an append-only .storage file next to the save file instead of inside the savegame,
+        so a save only writes the keys that changed since the last one.
+        """
+
+    class DataStorageCoalesce(int):
+        """
+        Milliseconds during which rapid data storage changes to one key are sent to its SetNotify subscribers as one
+        SetReply. 0 sends every change right away.
+        """
+
     host: str | None = None
     port: int = 38281
     password: str | None = None
@@ -616,6 +639,10 @@ class ServerOptions(Group):
     auto_shutdown: AutoShutdown = AutoShutdown(0)
     compatibility: Compatibility = Compatibility(2)
     log_network: LogNetwork = LogNetwork(0)
+    save_journal_size: SaveJournalSize = SaveJournalSize(0)
+    metrics_port: MetricsPort = MetricsPort(0)
+    data_storage_file: DataStorageFile | bool = False
+    data_storage_coalesce: DataStorageCoalesce = DataStorageCoalesce(0)
 
 
 class GeneratorOptions(Group):
@@ -675,6 +702,21 @@ class GeneratorOptions(Group):
         start_inventory -> Move remaining items to start_inventory, generate additional filler items to fill locations.
         """
 
+    class ZipCompressionLevel(int):
+        """
+        Deflate level of the output zip, from 0 (fastest) to 9 (smallest).
+        Files that are already compressed, like patch files, are always stored as they are.
+        """
+
+    class MultidataFormat(IntEnum):
+        """
+        Format version of the written .archipelago file.
+        3 is a single compressed pickle that any server can load.
+        4 is sectioned, so servers load it lazily and can memory-map the location table. Needs a server of this version.
+        """
+        PICKLE = 3
+        SECTIONED = 4
+
     enemizer_path: EnemizerPath = EnemizerPath("EnemizerCLI/EnemizerCLI.Core")  # + ".exe" is implied on Windows
     player_files_path: PlayerFilesPath = PlayerFilesPath("Players")
     players: Players = Players(0)
@@ -684,6 +726,8 @@ class GeneratorOptions(Group):
     race: Race = Race(0)
     plando_options: PlandoOptions = PlandoOptions("bosses, connections, texts")
     panic_method: PanicMethod = PanicMethod("swap")
+    zip_compression_level: ZipCompressionLevel = ZipCompressionLevel(9)
+    multidata_format: MultidataFormat = MultidataFormat(3)
     loglevel: str = "info"
     logtime: bool = False
 
@@ -5,3 +5,7 @@ if __name__ == "__main__":
     load_worlds.run_load_worlds_benchmark()
     import locations
     locations.run_locations_benchmark()
+    import wire_encoding
+    wire_encoding.run_wire_encoding_benchmark()
+    import client_swarm
+    client_swarm.run_client_swarm_benchmark()
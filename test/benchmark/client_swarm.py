@@ -0,0 +1,386 @@
+"""
+Load test for MultiServer: a swarm of lightweight asyncio clients speaking the real protocol against a server process.
+Run with `python test/benchmark/client_swarm.py [multidata] [--clients N] [--compact]`.
+Without a multidata file a small multiworld is generated first.
+"""
+import typing
+
+# (name, seconds, commands per second per client), replayed in order
+default_profile: typing.Sequence[typing.Tuple[str, float, float]] = (
+    ("warmup", 5, 0.5),
+    ("steady", 20, 2),
+    ("burst", 10, 10),
+    ("cooldown", 5, 0.5),
+)
+# relative weight of each command a client may send per tick; LocationChecks falls back to the others once exhausted
+command_weights: typing.Dict[str, float] = {
+    "LocationChecks": 60,
+    "Sync": 5,
+    "Set": 15,
+    "Get": 10,
+    "Bounce": 10,
+}
+default_games = ("Civilization VI",) * 6 + ("Clique",) * 2
+reply_timeout = 10.0
+notify_key = "swarm_shared"
+
+
+def _memory() -> typing.Tuple[typing.Optional[int], typing.Optional[int]]:
+    """Current and peak resident set size of this process in bytes, where the platform exposes them."""
+    import os
+    import sys
+
+    current = peak = None
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            current = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    return current, peak
+
+
+def _generate(games: typing.Sequence[str], directory: str, conn) -> None:
+    """Generator process: rolls a multiworld with default options for games and sends back its path."""
+    import json
+    import os
+    import sys
+    import warnings
+
+    import ModuleUpdate
+    ModuleUpdate.update = lambda *args, **kwargs: None
+
+    warnings.simplefilter("ignore")
+
+    import Generate
+    import Main
+
+    players_dir = os.path.join(directory, "players")
+    os.mkdir(players_dir)
+    for n, game in enumerate(games, 1):
+        with open(os.path.join(players_dir, f"{n}.yaml"), "w", encoding="utf-8") as f:
+            json.dump({"name": f"Player{n}", "game": game, game: {}}, f)
+    sys.argv = [sys.argv[0], "--seed", "0", "--player_files_path", players_dir, "--outputpath", directory]
+    Main.main(*Generate.main())
+    conn.send(next(os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".zip")))
+
+
+def _serve(multidata: str, conn) -> None:
+    """Server process: hosts the multidata on a free port and answers stats requests until told to stop."""
+    import asyncio
+    import functools
+    import logging
+    import time
+    import warnings
+
+    import ModuleUpdate
+    ModuleUpdate.update = lambda *args, **kwargs: None
+
+    warnings.simplefilter("ignore")
+    logging.disable(logging.INFO)
+
+    import websockets
+    from MultiServer import Context, server
+    from NetUtils import SlotType
+
+    def stats() -> typing.Dict[str, typing.Any]:
+        current, peak = _memory()
+        return {"cpu": time.process_time(), "time": time.perf_counter(), "rss": current, "peak_rss": peak}
+
+    async def run() -> None:
+        ctx = Context("127.0.0.1", 0, None, None, 1, 10, False)
+        ctx.load(multidata)
+        ctx.init_save(True)
+        ctx.server = websockets.serve(functools.partial(server, ctx=ctx), host=ctx.host, port=0)
+        ws_server = await ctx.server
+        loop = asyncio.get_running_loop()
+        conn.send({
+            "port": ws_server.sockets[0].getsockname()[1],
+            "slots": [(info.name, info.game) for info in ctx.slot_info.values() if info.type == SlotType.player],
+            **stats(),
+        })
+        while await loop.run_in_executor(None, conn.recv) != "stop":
+            conn.send(stats())
+        ctx.exit_event.set()
+        ws_server.close()
+        await ws_server.wait_closed()
+        ctx.save(True)
+        conn.send(stats())
+
+    asyncio.run(run())
+
+
+class SwarmClient:
+    """Minimal asyncio client that measures the round trip of every command by waiting for its reply."""
+
+    def __init__(self, index: int, slot_name: str, game: str, share: int, shares: int, compact: bool,
+                 latencies: typing.Dict[str, typing.List[float]]) -> None:
+        import random
+
+        self.index = index
+        self.slot_name = slot_name
+        self.game = game
+        self.share = share
+        self.shares = shares
+        self.compact = compact
+        self.latencies = latencies
+        self.random = random.Random(index)
+        self.socket = None
+        self.reader = None
+        self.waiting: typing.List[typing.Tuple[typing.Callable[[dict], bool], typing.Any]] = []
+        self.missing_locations: typing.List[int] = []
+        self.request_counter = 0
+        self.sent = 0
+        self.timeouts = 0
+        self.tasks: typing.Set[typing.Any] = set()
+
+    async def _read(self) -> None:
+        import json
+
+        import websockets
+        from NetUtils import decode_compact
+
+        try:
+            async for frame in self.socket:
+                for msg in decode_compact(frame) if isinstance(frame, bytes) else json.loads(frame):
+                    for waiting in self.waiting[:]:
+                        predicate, future = waiting
+                        if not future.done() and predicate(msg):
+                            self.waiting.remove(waiting)
+                            future.set_result(msg)
+        except websockets.ConnectionClosed:
+            pass
+
+    async def request(self, cmd: str, msgs: typing.List[dict],
+                      predicate: typing.Callable[[dict], bool]) -> typing.Optional[dict]:
+        """Send msgs and wait for the first reply matching predicate, recording the round trip under cmd."""
+        import asyncio
+        import time
+
+        import NetUtils
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (predicate, future)
+        self.waiting.append(entry)
+        self.sent += 1
+        start = time.perf_counter()
+        await self.socket.send(NetUtils.encode(msgs))
+        try:
+            reply = await asyncio.wait_for(future, reply_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            if entry in self.waiting:
+                self.waiting.remove(entry)
+            return None
+        self.latencies.setdefault(cmd, []).append(time.perf_counter() - start)
+        return reply
+
+    async def connect(self, address: str) -> None:
+        import asyncio
+        import json
+
+        import websockets
+        from NetUtils import compact_encoding_tag
+
+        self.socket = await websockets.connect(address, ping_timeout=None, ping_interval=None, max_size=None)
+        json.loads(await self.socket.recv())  # RoomInfo
+        self.reader = asyncio.create_task(self._read())
+        tags = ["DeathLink", compact_encoding_tag] if self.compact else ["DeathLink"]
+        connected = await self.request("Connect", [{
+            "cmd": "Connect", "game": self.game, "name": self.slot_name, "password": None, "uuid": f"swarm{self.index}",
+            "version": {"class": "Version", "major": 0, "minor": 6, "build": 0},
+            "items_handling": 0b111, "tags": tags, "slot_data": False,
+        }], lambda msg: msg["cmd"] in ("Connected", "ConnectionRefused"))
+        if not connected or connected["cmd"] != "Connected":
+            raise ConnectionError(f"{self.slot_name} could not connect: {connected}")
+        # clients sharing a slot split its locations between them
+        self.missing_locations = sorted(connected["missing_locations"])[self.share::self.shares]
+        self.random.shuffle(self.missing_locations)
+        await self.socket.send(json.dumps([{"cmd": "SetNotify", "keys": [notify_key]}]))
+
+    def next_request(self) -> int:
+        self.request_counter += 1
+        return self.request_counter
+
+    def command(self) -> typing.Awaitable:
+        """Pick the next command by weight and return the awaitable that sends it and waits for its reply."""
+        import time
+
+        names = [name for name in command_weights if name != "LocationChecks" or self.missing_locations]
+        cmd = self.random.choices(names, [command_weights[name] for name in names])[0]
+        if cmd == "LocationChecks":
+            location = self.missing_locations.pop()
+            return self.request(cmd, [{"cmd": cmd, "locations": [location]}],
+                                lambda msg: msg["cmd"] == "RoomUpdate" and location in msg.get("checked_locations", ()))
+        # the server echoes unknown fields of Set, Get and Bounce back, which makes their replies unique
+        counter = self.next_request()
+        request = f"{self.index}:{counter}"
+        if cmd == "Sync":
+            # Sync has no reply for an empty inventory, so a Get in the same frame marks when it was handled
+            return self.request(cmd, [{"cmd": cmd}, {"cmd": "Get", "keys": [], "request": request}],
+                                lambda msg: msg["cmd"] == "Retrieved" and msg.get("request") == request)
+        if cmd == "Set":
+            # alternate between a private key and the key every client is subscribed to
+            key = notify_key if counter % 2 else f"swarm_{self.index}"
+            return self.request(cmd, [{"cmd": cmd, "key": key, "default": 0, "want_reply": True, "request": request,
+                                       "operations": [{"operation": "add", "value": 1}]}],
+                                lambda msg: msg["cmd"] == "SetReply" and msg.get("request") == request)
+        if cmd == "Get":
+            return self.request(cmd, [{"cmd": cmd, "keys": [f"swarm_{self.index}", notify_key], "request": request}],
+                                lambda msg: msg["cmd"] == "Retrieved" and msg.get("request") == request)
+        return self.request(cmd, [{"cmd": cmd, "tags": ["DeathLink"], "request": request,
+                                   "data": {"time": time.time(), "source": self.slot_name, "cause": "swarm"}}],
+                            lambda msg: msg["cmd"] == "Bounced" and msg.get("request") == request)
+
+    async def run_phase(self, seconds: float, rate: float) -> None:
+        """Issue commands with exponentially distributed gaps, without waiting for replies, for seconds."""
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        end = loop.time() + seconds
+        while True:
+            delay = self.random.expovariate(rate)
+            if loop.time() + delay >= end:
+                await asyncio.sleep(max(0.0, end - loop.time()))
+                break
+            await asyncio.sleep(delay)
+            task = asyncio.create_task(self.command())
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def close(self) -> None:
+        import asyncio
+
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+        await self.socket.close()
+        if self.reader:
+            await self.reader
+
+
+def _percentile(values: typing.Sequence[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_client_swarm_benchmark(multidata: typing.Optional[str] = None, clients: int = 32,
+                               profile: typing.Sequence[typing.Tuple[str, float, float]] = default_profile,
+                               compact: bool = False) -> None:
+    """
+    Host multidata in a separate server process, connect a swarm of clients and replay profile against it,
+    logging p50/p99 round trip per command plus server CPU and memory for each phase.
+    """
+    import asyncio
+    import logging
+    import multiprocessing
+    import shutil
+    import tempfile
+
+    from Utils import init_logging
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+
+    with tempfile.TemporaryDirectory() as directory:
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        if multidata:
+            # the server saves next to the multidata, so work on a copy
+            multidata = shutil.copy(multidata, directory)
+        else:
+            logger.info(f"Generating a multiworld of {len(default_games)} slots.")
+            process = context.Process(target=_generate, args=(default_games, directory, child_conn))
+            process.start()
+            process.join()
+            if not parent_conn.poll():
+                raise Exception("Could not generate multiworld")
+            multidata = parent_conn.recv()
+
+        process = context.Process(target=_serve, args=(multidata, child_conn))
+        process.start()
+        try:
+            if not parent_conn.poll(120):
+                raise TimeoutError("Server did not start.")
+            started = parent_conn.recv()
+            asyncio.run(_run_swarm(logger, parent_conn, started, clients, profile, compact))
+        finally:
+            parent_conn.send("stop")
+            if parent_conn.poll(30):
+                final = parent_conn.recv()
+                logger.info(f"Server total: {final['cpu']:.2f} s CPU, peak RSS {_mib(final['peak_rss'])}.")
+            process.join(30)
+            if process.is_alive():
+                process.kill()
+
+
+def _mib(size: typing.Optional[int]) -> str:
+    return "n/a" if size is None else f"{size / 1024 / 1024:.1f} MiB"
+
+
+async def _run_swarm(logger, conn, started: typing.Dict[str, typing.Any], clients: int,
+                     profile: typing.Sequence[typing.Tuple[str, float, float]], compact: bool) -> None:
+    import asyncio
+    from collections import Counter
+
+    async def server_stats() -> typing.Dict[str, typing.Any]:
+        await loop.run_in_executor(None, conn.send, "stats")
+        return await loop.run_in_executor(None, conn.recv)
+
+    loop = asyncio.get_running_loop()
+    slots = started["slots"]
+    logger.info(f"Server up with {len(slots)} slots, RSS {_mib(started['rss'])} after loading.")
+    per_slot = Counter(index % len(slots) for index in range(clients))
+    latencies: typing.Dict[str, typing.List[float]] = {}
+    swarm = []
+    for index in range(clients):
+        slot_name, game = slots[index % len(slots)]
+        swarm.append(SwarmClient(index, slot_name, game, index // len(slots), per_slot[index % len(slots)],
+                                 compact, latencies))
+    before = await server_stats()
+    await asyncio.gather(*(client.connect(f"ws://127.0.0.1:{started['port']}") for client in swarm))
+    after = await server_stats()
+    _log_phase(logger, "connect", clients, latencies, before, after)
+
+    for name, seconds, rate in profile:
+        latencies.clear()
+        sent = sum(client.sent for client in swarm)
+        timeouts = sum(client.timeouts for client in swarm)
+        before = await server_stats()
+        await asyncio.gather(*(client.run_phase(seconds, rate) for client in swarm))
+        await asyncio.gather(*(asyncio.gather(*client.tasks) for client in swarm))
+        after = await server_stats()
+        sent = sum(client.sent for client in swarm) - sent
+        timeouts = sum(client.timeouts for client in swarm) - timeouts
+        _log_phase(logger, name, sent, latencies, before, after, timeouts)
+
+    await asyncio.gather(*(client.close() for client in swarm))
+
+
+def _log_phase(logger, name: str, sent: int, latencies: typing.Dict[str, typing.List[float]],
+               before: typing.Dict[str, typing.Any], after: typing.Dict[str, typing.Any], timeouts: int = 0) -> None:
+    wall = after["time"] - before["time"]
+    cpu = after["cpu"] - before["cpu"]
+    logger.info(f"{name}: {sent} commands in {wall:.2f} s ({sent / wall:.1f}/s), {timeouts} timed out, "
+                f"server CPU {cpu:.2f} s ({cpu / wall:.0%}), RSS {_mib(after['rss'])}, "
+                f"peak {_mib(after['peak_rss'])}")
+    for cmd, values in sorted(latencies.items()):
+        values.sort()
+        logger.info(f"  {cmd:>15}: {len(values):>6} replies, p50 {_percentile(values, 0.5) * 1000:.2f} ms, "
+                    f"p99 {_percentile(values, 0.99) * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from path_change import change_home
+    change_home()
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("multidata", nargs="?", default=None, help="Multidata to host, generated if omitted.")
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--compact", action="store_true", help="Connect with the CompactEncoding tag.")
+    args = parser.parse_args()
+    run_client_swarm_benchmark(args.multidata, args.clients, compact=args.compact)
@@ -0,0 +1,39 @@
+def run_wire_encoding_benchmark():
+    """Compare json and compact encoding of large ReceivedItems and LocationInfo packets, in time and bytes."""
+    import logging
+    import random
+    import zlib
+
+    from NetUtils import NetworkItem, decode, decode_compact, encode, encode_compact
+    from Utils import init_logging
+    from time_it import TimeIt
+
+    init_logging("Benchmark Runner")
+    logger = logging.getLogger("Benchmark")
+    rand = random.Random(0)
+    rounds = 20
+
+    for count in (100, 1000, 10000):
+        items = [NetworkItem(rand.randrange(1 << 40), rand.randrange(1 << 40), rand.randrange(1, 500),
+                             rand.choice((0, 1, 2, 4))) for _ in range(count)]
+        msgs = [{"cmd": "ReceivedItems", "index": 0, "items": items},
+                {"cmd": "LocationInfo", "locations": items}]
+        for name, encoder, decoder in (("json", encode, decode), ("compact", encode_compact, decode_compact)):
+            with TimeIt(f"{name} encode") as encode_timer:
+                for _ in range(rounds):
+                    data = encoder(msgs)
+            with TimeIt(f"{name} decode") as decode_timer:
+                for _ in range(rounds):
+                    decoded = decoder(data)
+            assert decoded == msgs
+            raw = data if isinstance(data, bytes) else data.encode()
+            # websocket connections usually negotiate permessage-deflate, so compressed size is what goes on the wire
+            logger.info(f"{count:>5} items {name:>7}: encode {encode_timer.dif / rounds * 1000:.3f} ms, "
+                        f"decode {decode_timer.dif / rounds * 1000:.3f} ms, {len(raw)} bytes, "
+                        f"{len(zlib.compress(raw))} bytes deflated")
+
+
+if __name__ == "__main__":
+    from path_change import change_home
+    change_home()
+    run_wire_encoding_benchmark()
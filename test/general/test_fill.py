@@ -1,10 +1,13 @@
-from typing import List, Iterable
+from typing import List, Iterable, Optional, Tuple
+import random
 import unittest
+from unittest.mock import patch
 
 from Options import Accessibility
 from test.general import generate_items, generate_locations, generate_test_multiworld
+import Fill
 from Fill import FillError, balance_multiworld_progression, fill_restrictive, \
-    distribute_early_items, distribute_items_restrictive
+    distribute_early_items, distribute_items_restrictive, sweep_from_pool
 from BaseClasses import Entrance, LocationProgressType, MultiWorld, Region, Item, Location, \
     ItemClassification
 from worlds.generic.Rules import CollectionRule, add_item_rule, locality_rules, set_rule
@@ -433,6 +436,42 @@ class TestFillRestrictive(unittest.TestCase):
         self.assertTrue(sphere1_loc1.item.name == one_to_two1 or
                         sphere1_loc2.item.name == one_to_two1, "Wrong item in Sphere 1")
 
+    def test_swap_states_match_full_sweeps(self):
+        """Test that reusing swap states places the same items as sweeping from scratch for every swap attempt"""
+        class UncachedSwapStates(Fill._SwapStates):
+            def take_out(self, location: Location, unsafe: bool, item_pool: List[Item], player: int):
+                placed_item = location.item
+                location.item = None
+                placed_item.location = None
+                return sweep_from_pool(self.base_state, [placed_item, *item_pool] if unsafe else item_pool)
+
+        def fill(seed: int, swap_states_type: type) -> Tuple[List[Tuple[str, Optional[str]]], int]:
+            multiworld = generate_test_multiworld(1)
+            player1 = generate_player_data(multiworld, 1, 10, 10)
+            rng = random.Random(seed)
+            # random access and item rules, so that most seeds run out of spots and have to swap
+            for location in player1.locations:
+                required = [item.name for item in rng.sample(player1.prog_items, rng.randint(0, 2))]
+                set_rule(location, lambda state, required=required: state.has_all(required, player1.id))
+                forbidden = {item.name for item in rng.sample(player1.prog_items, 5)}
+                add_item_rule(location, lambda item, forbidden=forbidden: item.name not in forbidden)
+            swap_states: List[Fill._SwapStates] = []
+            with patch.object(Fill, "_SwapStates",
+                              lambda *args: swap_states.append(swap_states_type(*args)) or swap_states[-1]):
+                fill_restrictive(multiworld, multiworld.state, player1.locations, player1.prog_items,
+                                 allow_partial=True)
+            placements = [(location.name, location.item.name if location.item else None)
+                          for location in multiworld.get_locations()]
+            return placements, swap_states[0].sweeps_avoided
+
+        sweeps_avoided = 0
+        for seed in range(20):
+            with self.subTest(seed=seed):
+                placements, avoided = fill(seed, Fill._SwapStates)
+                sweeps_avoided += avoided
+                self.assertEqual(placements, fill(seed, UncachedSwapStates)[0])
+        self.assertGreater(sweeps_avoided, 0, "Test is flawed")
+
     def test_double_sweep(self):
         """Test that sweep doesn't duplicate Event items when sweeping"""
         # test for PR1114
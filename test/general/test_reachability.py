@@ -1,8 +1,9 @@
 import unittest
+from collections import Counter
 
-from BaseClasses import CollectionState
+from BaseClasses import CollectionState, CompiledItemNames, Item, ItemClassification, Region
 from worlds.AutoWorld import AutoWorldRegister
-from . import setup_solo_multiworld, gen_steps
+from . import generate_test_multiworld, setup_solo_multiworld, gen_steps
 
 
 class TestBase(unittest.TestCase):
@@ -79,3 +80,58 @@ class TestBase(unittest.TestCase):
                             locations.add(location)
                     self.assertGreater(len(locations), 0,
                                        msg="Need to be able to reach at least one location to get started.")
+
+    def test_incremental_reachability_matches_full_sweep(self):
+        """Ensure incremental reachability finds exactly the regions a full sweep finds after every collect"""
+        multiworld = generate_test_multiworld()
+        world = multiworld.worlds[1]
+        menu = multiworld.get_region("Menu", 1)
+        regions = {name: Region(name, 1, multiworld) for name in ("A", "B", "C", "D", "E")}
+        multiworld.regions += regions.values()
+        menu.connect(regions["A"], "To A", lambda state: state.has("Key A", 1))
+        key_a_and_b = CompiledItemNames(("Key A", "Key B"))
+        regions["A"].connect(regions["B"], "To B", lambda state: state.has_all(key_a_and_b, 1))
+        regions["B"].connect(regions["C"], "To C", lambda state: state.count("Key C", 1) >= 2)
+        menu.connect(regions["D"], "To D", lambda state: state.can_reach_region("C", 1))
+        multiworld.register_indirect_condition(regions["C"], multiworld.get_entrance("To D", 1))
+        menu.connect(regions["E"], "To E", lambda state: state.has_any(("Key X", "Key Y"), 1))
+
+        items = [Item(name, ItemClassification.progression, None, 1)
+                 for name in ("Key B", "Key C", "Key Y", "Key A", "Key C", "Key Z")]
+        world.incremental_reachability = True
+        incremental_state = CollectionState(multiworld)
+        for collected in range(len(items) + 1):
+            if collected:
+                incremental_state.collect(items[collected - 1], True)
+            world.incremental_reachability = False
+            full_state = CollectionState(multiworld)
+            for item in items[:collected]:
+                full_state.collect(item, True)
+            full_state.update_reachable_regions(1)
+            world.incremental_reachability = True
+            incremental_state.update_reachable_regions(1)
+            with self.subTest(collected=[item.name for item in items[:collected]]):
+                self.assertEqual(full_state.reachable_regions[1], incremental_state.reachable_regions[1])
+                self.assertEqual(full_state.blocked_connections[1], incremental_state.blocked_connections[1])
+        self.assertEqual(set(multiworld.get_regions(1)), incremental_state.reachable_regions[1])
+
+    def test_incremental_reachability_copies(self):
+        """Ensure copies keep the recorded entrance dependencies without changing the source state"""
+        multiworld = generate_test_multiworld()
+        multiworld.worlds[1].incremental_reachability = True
+        region = Region("A", 1, multiworld)
+        multiworld.regions.append(region)
+        entrance = multiworld.get_region("Menu", 1).connect(region, "To A", lambda state: state.has("Key A", 1))
+        state = CollectionState(multiworld)
+        state.update_reachable_regions(1)
+        self.assertEqual(state.entrance_dependencies[1].by_item, {"Key A": {entrance}})
+
+        copied = state.copy()
+        self.assertEqual(copied.entrance_dependencies[1].by_item, {"Key A": {entrance}})
+        copied.collect(Item("Key A", ItemClassification.progression, None, 1), True)
+        copied.update_reachable_regions(1)
+        self.assertIn(region, copied.reachable_regions[1])
+        self.assertEqual(copied.entrance_dependencies[1].by_item, {"Key A": set()})
+        self.assertEqual(state.entrance_dependencies[1].by_item, {"Key A": {entrance}})
+        self.assertNotIn(region, state.reachable_regions[1])
+        self.assertIs(type(state.prog_items[1]), Counter)
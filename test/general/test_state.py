@@ -1,7 +1,8 @@
 import unittest
 
+from BaseClasses import CollectionState, CompiledItemCounts, CompiledItemNames, Item, ItemClassification
 from worlds.AutoWorld import AutoWorldRegister, call_all
-from . import setup_solo_multiworld
+from . import generate_items, generate_locations, generate_test_multiworld, setup_solo_multiworld
 
 
 class TestBase(unittest.TestCase):
@@ -27,3 +28,90 @@ class TestBase(unittest.TestCase):
                     with self.subTest("Step", step=step):
                         call_all(multiworld, step)
                         self.assertTrue(multiworld.get_all_state(False, allow_partial_entrances=True))
+
+
+class TestSphereCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.multiworld = generate_test_multiworld()
+        self.free, self.locked = generate_locations(2, 1, self.multiworld.get_region("Menu", 1))
+        self.key, self.filler = generate_items(1, 1, True) + generate_items(1, 1)
+        self.locked.access_rule = lambda state: state.has(self.key.name, 1)
+
+    def test_spheres_follow_placements(self):
+        """Tests that changing placements invalidates the cached spheres."""
+        self.multiworld.push_item(self.free, self.key, False)
+        self.multiworld.push_item(self.locked, self.filler, False)
+        self.assertEqual([{self.free}, {self.locked}], list(self.multiworld.get_spheres()))
+        self.assertTrue(self.multiworld.fulfills_accessibility())
+        self.assertEqual(1, self.multiworld.get_sphere_cache().sphere_of[self.locked])
+
+        # swap without push_item, like fill's swap does
+        self.free.item, self.locked.item = self.filler, self.key
+        self.assertEqual([{self.free}, set(), {self.locked}], list(self.multiworld.get_spheres()))
+        self.assertFalse(self.multiworld.fulfills_accessibility())
+
+    def test_get_spheres_sweeps(self):
+        """Tests that get_spheres sees rule changes the cache does not track."""
+        self.multiworld.push_item(self.free, self.key, False)
+        self.multiworld.push_item(self.locked, self.filler, False)
+        sphere_cache = self.multiworld.get_sphere_cache()
+        self.assertIs(sphere_cache, self.multiworld.get_sphere_cache())
+        self.assertTrue(sphere_cache.state.has(self.key.name, 1))
+
+        self.locked.access_rule = lambda state: True
+        self.assertEqual([{self.free, self.locked}], list(self.multiworld.get_spheres()))
+
+
+class TestCompiledItems(unittest.TestCase):
+    def test_compiled_matches_item_names(self):
+        """Ensure the compiled item checks give the same results as checking the plain item names"""
+        multiworld = generate_test_multiworld()
+        state = CollectionState(multiworld)
+        names = ("A", "B", "C", "D")
+        name_sets = [names[:1], names[:2], names[1:3], names, ("A", "E")]
+        count_maps = [{"A": 1}, {"A": 2, "B": 1}, {"C": 3}, {"A": 1, "D": 0}, {"E": 1, "B": 2}]
+        for item in ("B", "A", "C", "B", "A", "C", "C", "D"):
+            state.collect(Item(item, ItemClassification.progression, None, 1), True)
+            for items in name_sets:
+                compiled = CompiledItemNames(items)
+                with self.subTest(items=items, state=dict(state.prog_items[1])):
+                    self.assertEqual(state.has_all(items, 1), state.has_all(compiled, 1))
+                    self.assertEqual(state.has_any(items, 1), state.has_any(compiled, 1))
+                    self.assertEqual(state.count_from_list_unique(items, 1),
+                                     state.count_from_list_unique(compiled, 1))
+                    for count in range(4):
+                        self.assertEqual(state.has_from_list_unique(items, 1, count),
+                                         state.has_from_list_unique(compiled, 1, count))
+            for item_counts in count_maps:
+                compiled_counts = CompiledItemCounts(item_counts)
+                with self.subTest(item_counts=item_counts, state=dict(state.prog_items[1])):
+                    self.assertEqual(state.has_all_counts(item_counts, 1), state.has_all_counts(compiled_counts, 1))
+                    self.assertEqual(state.has_any_count(item_counts, 1), state.has_any_count(compiled_counts, 1))
+        state.remove(Item("D", ItemClassification.progression, None, 1))
+        self.assertFalse(state.has_all(CompiledItemNames(names), 1))
+
+    def test_world_writes(self):
+        """Ensure compiled item checks see items that World.collect and World.remove write to prog_items directly"""
+        multiworld = generate_test_multiworld()
+        world = multiworld.worlds[1]
+
+        def collect(state: CollectionState, item: Item) -> bool:
+            state.prog_items[1]["B"] += 1
+            return True
+
+        def remove(state: CollectionState, item: Item) -> bool:
+            del state.prog_items[1]["B"]
+            return True
+
+        world.collect, world.remove = collect, remove  # type: ignore[method-assign]
+        state = CollectionState(multiworld)
+        compiled = CompiledItemNames(("A", "B"))
+        self.assertFalse(state.has_any(compiled, 1))
+        state.collect(Item("A", ItemClassification.progression, None, 1), True)
+        self.assertTrue(state.has_any(compiled, 1))
+        self.assertTrue(state.copy().has_any(compiled, 1))
+        state.remove(Item("A", ItemClassification.progression, None, 1))
+        self.assertFalse(state.has_any(compiled, 1))
+        state.prog_items[1]["A"] += 1
+        state.item_masks.pop(1, None)
+        self.assertTrue(state.has_any(compiled, 1))
@@ -0,0 +1,24 @@
+# Tests for the compact wire encoding of NetUtils
+import unittest
+
+from NetUtils import ClientStatus, NetworkItem, NetworkPlayer, decode, decode_compact, encode, encode_compact
+
+
+class TestCompactEncoding(unittest.TestCase):
+    def test_same_as_json(self) -> None:
+        """Test that compact encoding decodes to the same packets as json."""
+        items = [NetworkItem(2 ** 40, -1, 1, 4), NetworkItem(1, 2, 3)]
+        msgs = [
+            {"cmd": "ReceivedItems", "index": 3, "items": items},
+            {"cmd": "LocationInfo", "locations": tuple(items)},
+            {"cmd": "Connected", "players": [NetworkPlayer(0, 1, "A", "B")], "missing_locations": set(),
+             "slot_data": {1: {"nested": items[:1]}}, "status": ClientStatus.CLIENT_GOAL},
+            {"cmd": "RoomUpdate", "checked_locations": {1, 2}},
+        ]
+        self.assertEqual(decode_compact(encode_compact(msgs)), decode(encode(msgs)))
+        self.assertEqual(decode_compact(encode_compact(msgs))[0]["items"], items)
+
+    def test_item_columns(self) -> None:
+        """Test that lists of NetworkItems are sent as columns."""
+        self.assertEqual(encode_compact([NetworkItem(1, 2, 3, 4), NetworkItem(5, 6, 7, 0)]),
+                         b'{"class":"NetworkItems","item":[1,5],"location":[2,6],"player":[3,7],"flags":[4,0]}')
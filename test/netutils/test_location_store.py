@@ -241,6 +241,16 @@ class Base:
             self.assertEqual(len(store[1]), 1)
             self.assertEqual(len(store[2]), 0)
 
+        def test_from_columns(self) -> None:
+            slots = sorted(sample_data)
+            rows = [(location, *sample_data[slot][location])
+                    for slot in slots for location in sorted(sample_data[slot])]
+            store = self.type.from_columns(slots, [len(sample_data[slot]) for slot in slots],
+                                           *(list(column) for column in zip(*rows)))
+            self.assertEqual({slot: dict(locations) for slot, locations in store.items()}, sample_data)
+            with self.assertRaises(ValueError):
+                self.type.from_columns([1, 3], [0, 0], [], [], [], [])
+
 
 class TestPurePythonLocationStore(Base.TestLocationStore):
     """Run base method tests for pure python implementation."""
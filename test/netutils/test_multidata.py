@@ -0,0 +1,76 @@
+# Tests for the sectioned multidata format
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from NetUtils import LocationStore, MultiData, encode_multidata
+
+
+class TestMultiData(unittest.TestCase):
+    data: bytes
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        path = Path(__file__).parent.parent / "webhost" / "data" / "One_Archipelago.archipelago"
+        with path.open("rb") as f:
+            cls.data = f.read()
+
+    def test_round_trip(self) -> None:
+        """Test that a version 3 multidata encodes to version 4 without losing anything."""
+        from MultiServer import Context
+        original = Context.decompress(self.data)
+        encoded = encode_multidata(original)
+        self.assertEqual(encoded[0], 4)
+        decoded = Context.decompress(encoded)
+        self.assertIsInstance(decoded, MultiData)
+        self.assertEqual(set(decoded), set(original))
+        for key, value in original.items():
+            if key == "locations":
+                self.assertEqual(dict(decoded[key]), value)
+            else:
+                self.assertEqual(decoded[key], value, key)
+
+    def test_lazy_locations(self) -> None:
+        """Test that the location section unpacks single slots and feeds LocationStore directly."""
+        locations = {
+            1: {11: (21, 2, 7), 13: (13, 1, 0), 12: (2 ** 40, 2, 0)},
+            2: {},
+            3: {9: (99, 1, 4)},
+        }
+        multidata = MultiData(encode_multidata({"locations": locations, "seed_name": "test"}))
+        self.assertEqual(multidata["locations"][3], locations[3])
+        self.assertEqual(list(multidata["locations"][1]), [11, 12, 13])
+        store = LocationStore.from_columns(*multidata.pop("locations").columns)
+        self.assertEqual(store[1][12], (2 ** 40, 2, 0))
+        self.assertEqual(len(store[2]), 0)
+        self.assertNotIn("locations", multidata)
+        self.assertEqual(dict(multidata), {"seed_name": "test"})
+
+    def test_mutation(self) -> None:
+        """Test that changes to decoded values persist when the multidata is encoded again."""
+        multidata = MultiData(encode_multidata({"datapackage": {"A": {"checksum": "1"}}, "race_mode": 0}))
+        multidata["datapackage"]["A"] = {"checksum": "2"}
+        del multidata["race_mode"]
+        multidata["spheres"] = []
+        self.assertEqual(dict(MultiData(encode_multidata(multidata))),
+                         {"datapackage": {"A": {"checksum": "2"}}, "spheres": []})
+
+    def test_load_memory_mapped(self) -> None:
+        """Test that the server loads a version 4 file from disk."""
+        from MultiServer import Context
+        encoded = encode_multidata(Context.decompress(self.data))
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "test.archipelago")
+            with open(path, "wb") as f:
+                f.write(encoded)
+            ctx = Context("", 0, "", "", 0, 0, False)
+            ctx.load(path)
+            self.assertIsNotNone(ctx.multidata_map)
+            ctx.load(path)  # reloading closes the previous memory map
+            # Windows refuses to delete the file while it is mapped
+            ctx.close_multidata()
+            self.assertIsNone(ctx.multidata_map)
+        original = Context.decompress(self.data)
+        self.assertEqual(ctx.seed_name, original["seed_name"])
+        self.assertEqual(dict(ctx.locations[1]), original["locations"][1])
@@ -4,6 +4,7 @@ import unittest
 import os
 import os.path
 import sys
+import zipfile
 
 from pathlib import Path
 from tempfile import TemporaryDirectory
@@ -25,6 +26,12 @@ class TestGenerateMain(unittest.TestCase):
         output_path = Path(output_dir)
         output_files = list(output_path.glob('*.zip'))
         if len(output_files) == 1:
+            with zipfile.ZipFile(output_files[0]) as zf:
+                for info in zf.infolist():
+                    if info.filename.endswith(".archipelago"):
+                        # only version 4 multidata has uncompressed sections worth deflating
+                        self.assertEqual(info.compress_type,
+                                         zipfile.ZIP_DEFLATED if zf.read(info)[0] == 4 else zipfile.ZIP_STORED)
             return True
         self.fail(f"Expected {output_dir} to contain one zip, but has {len(output_files)}: "
                   f"{list(output_path.glob('*'))}")
@@ -137,3 +144,19 @@ class TestGenerateWeights(TestGenerateMain):
                     result, getattr(namespace, option_name)[player].value,
                     "Generated results from weights file did not match expected value."
                 )
+
+
+class TestOutputArchive(unittest.TestCase):
+    def test_duplicate_name(self):
+        with TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, "output.zip")
+            for name in ("first", "second"):
+                os.mkdir(os.path.join(temp_dir, name))
+                with open(os.path.join(temp_dir, name, "AP_patch.txt"), "w") as f:
+                    f.write(name)
+            with self.assertRaises(FileExistsError):
+                with Main._OutputArchive(path, 9) as archive:
+                    archive.add_directory(os.path.join(temp_dir, "first"))
+                    archive.add_directory(os.path.join(temp_dir, "second"))
+            self.assertFalse(os.path.exists(path))
+            self.assertFalse(os.path.exists(path + ".part"))
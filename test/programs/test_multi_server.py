@@ -1,3 +1,4 @@
+import typing
 import unittest
 from MultiServer import Context, ServerCommandProcessor
 
@@ -38,3 +39,384 @@ class TestResolvePlayerName(unittest.TestCase):
         assert p.resolve_player("ABC") == (1, 2, "abc"), "case insensitive resolves when 1 match"
         assert p.resolve_player("abcd") == (1, 3, "abCD"), "case insensitive resolves when 1 match"
         assert not p.resolve_player("aB"), "partial name shouldn't resolve to player"
+
+
+def make_context() -> Context:
+    """Creates a context for two Archipelago slots, slot 1 having two locations."""
+    import os
+    import pickle
+    import tempfile
+    import zlib
+    from NetUtils import NetworkSlot, SlotType
+
+    multidata: typing.Dict[str, typing.Any] = {
+        "minimum_versions": {"server": (0, 0, 0), "clients": {1: (0, 0, 0), 2: (0, 0, 0)}},
+        "version": (0, 6, 2),
+        "slot_info": {1: NetworkSlot("A", "Archipelago", SlotType.player),
+                      2: NetworkSlot("B", "Archipelago", SlotType.player)},
+        "seed_name": "TestSeed",
+        "connect_names": {"A": (0, 1), "B": (0, 2)},
+        "locations": {1: {-1: (-1, 2, 0), -2: (-1, 1, 0)}, 2: {}},
+        "slot_data": {1: {}, 2: {}},
+        "er_hint_data": {},
+        "precollected_items": {1: [], 2: []},
+        "precollected_hints": {1: set(), 2: set()},
+        "spheres": [{1: {-2}}, {1: {-1}}],
+        "datapackage": {},
+    }
+    ctx = Context("", 0, "", "", 0, 0, False)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "test.archipelago")
+        with open(path, "wb") as f:
+            f.write(bytes([3]) + zlib.compress(pickle.dumps(multidata)))
+        ctx.load(path)
+    return ctx
+
+
+class TestSpheres(unittest.TestCase):
+    def test_get_sphere(self) -> None:
+        """Test that locations resolve to the sphere they were found in."""
+        ctx = make_context()
+        self.assertEqual(ctx.get_sphere(1, -2), 0)
+        self.assertEqual(ctx.get_sphere(1, -1), 1)
+        with self.assertRaises(KeyError):
+            ctx.get_sphere(2, -1)
+        ctx.location_spheres.clear()
+        self.assertEqual(ctx.get_sphere(1, -1), -1)
+
+
+class TestHintIndex(unittest.IsolatedAsyncioTestCase):
+    async def test_check_resolves_hint(self) -> None:
+        """Test that checking a location marks its hints found in every concerned slot and the index."""
+        from MultiServer import register_location_checks
+        from NetUtils import Hint, HintStatus
+
+        ctx = make_context()
+        hint = Hint(2, 1, -1, -1, False, status=HintStatus.HINT_PRIORITY)
+        ctx.notify_hints(0, [hint])
+        self.assertEqual(ctx.get_hint(0, 1, -1), hint)
+
+        register_location_checks(ctx, 0, 1, [-2])
+        self.assertIn(hint, ctx.hints[0, 1])
+
+        register_location_checks(ctx, 0, 1, [-1])
+        found_hint = hint._replace(found=True, status=HintStatus.HINT_FOUND)
+        for slot in (1, 2):
+            self.assertEqual(ctx.hints[0, slot], {found_hint})
+            self.assertEqual(next(iter(ctx.hints[0, slot])).status, HintStatus.HINT_FOUND)
+        self.assertEqual(ctx.hints_by_location[0, 1, -1], {found_hint})
+        self.assertEqual(ctx.get_hint(0, 1, -1), found_hint)
+
+
+class TestSaveJournal(unittest.IsolatedAsyncioTestCase):
+    async def test_replay(self) -> None:
+        """Test that journaled changes are restored on load and that compaction starts a new journal."""
+        import os
+        import tempfile
+        from unittest.mock import patch
+        from MultiServer import journal_replaced_fields, read_save_journal, register_location_checks
+        from NetUtils import Hint
+
+        with tempfile.TemporaryDirectory() as directory, patch.object(Context, "_start_async_saving"):
+            save_filename = os.path.join(directory, "test.apsave")
+
+            def load() -> Context:
+                loaded = make_context()
+                loaded.save_filename = save_filename
+                loaded.save_journal_size = 1000
+                loaded.init_save()
+                return loaded
+
+            ctx = load()
+            self.assertTrue(ctx.save(now=True))
+            full_save_size = os.path.getsize(save_filename)
+
+            register_location_checks(ctx, 0, 1, [-1])
+            ctx.notify_hints(0, [Hint(1, 1, -2, -1, False)])
+            ctx.data_storage.set("key", [], [{"operation": "add", "value": [1]}])
+            ctx.hints_used[0, 1] += 1
+            ctx.name_aliases[0, 1] = "alias"
+            ctx.journal_changed["fields"].update(("hints_used", "name_aliases"))
+            self.assertTrue(ctx.save(now=True))
+            self.assertEqual(os.path.getsize(save_filename), full_save_size, "save file was rewritten")
+            with open(ctx.journal_filename, "rb") as f:
+                entry = read_save_journal(f.read())[0][-1]
+            self.assertEqual({key for key in journal_replaced_fields if key in entry},
+                             {"hints_used", "name_aliases", "client_activity_timers"})
+
+            loaded = load()
+            self.assertEqual(loaded.location_checks[0, 1], {-1})
+            self.assertEqual(len(loaded.received_items[0, 2, True]), 1)
+            self.assertEqual(loaded.hints[0, 1], ctx.hints[0, 1])
+            self.assertEqual(loaded.stored_data["key"], [1])
+            self.assertEqual(loaded.hints_used[0, 1], 1)
+            self.assertEqual(loaded.name_aliases[0, 1], "alias")
+            self.assertEqual(loaded.random.getstate(), ctx.random.getstate())
+
+            loaded.journal_bytes = loaded.save_journal_size
+            register_location_checks(loaded, 0, 1, [-2])
+            self.assertTrue(loaded.save(now=True))
+            self.assertEqual(loaded.journal_generation, 2)
+            reloaded = load()
+            self.assertEqual(reloaded.location_checks[0, 1], {-1, -2})
+            self.assertEqual(reloaded.journal_generation, 2)
+
+    async def test_torn_record(self) -> None:
+        """Test that a journal record cut off by a crash is dropped, so records appended after it can be read back."""
+        import os
+        import tempfile
+        from unittest.mock import patch
+        from MultiServer import register_location_checks
+
+        with tempfile.TemporaryDirectory() as directory, patch.object(Context, "_start_async_saving"):
+            save_filename = os.path.join(directory, "test.apsave")
+
+            def load() -> Context:
+                loaded = make_context()
+                loaded.save_filename = save_filename
+                loaded.save_journal_size = 1000
+                loaded.init_save()
+                return loaded
+
+            ctx = load()
+            self.assertTrue(ctx.save(now=True))
+            register_location_checks(ctx, 0, 1, [-1])
+            self.assertTrue(ctx.save(now=True))
+            journal_size = os.path.getsize(ctx.journal_filename)
+            with open(ctx.journal_filename, "ab") as f:
+                f.write((100).to_bytes(4, "little") + b"cut off")
+
+            loaded = load()
+            self.assertEqual(loaded.location_checks[0, 1], {-1})
+            self.assertEqual(os.path.getsize(loaded.journal_filename), journal_size)
+            register_location_checks(loaded, 0, 1, [-2])
+            self.assertTrue(loaded.save(now=True))
+            self.assertEqual(load().location_checks[0, 1], {-1, -2})
+
+
+class TestDataPackage(unittest.IsolatedAsyncioTestCase):
+    async def test_cached_response(self) -> None:
+        """Test that the assembled DataPackage message matches encoding the packages directly."""
+        import json
+        from unittest.mock import AsyncMock, Mock
+        from MultiServer import Client, encoded_game_packages, process_client_cmd
+        from NetUtils import encode
+
+        ctx = make_context()
+        ctx.send_encoded_msgs = AsyncMock()
+        client = Client(Mock(), ctx)
+        for args, games in (({}, ctx.gamespackage),
+                            ({"games": ["Archipelago", "Unknown"]}, {"Archipelago": ctx.gamespackage["Archipelago"]})):
+            await process_client_cmd(ctx, client, {"cmd": "GetDataPackage", **args})
+            message = ctx.send_encoded_msgs.call_args.args[1]
+            self.assertEqual(json.loads(message), json.loads(encode([{"cmd": "DataPackage",
+                                                                       "data": {"games": games}}])))
+        self.assertIn(ctx.gamespackage["Archipelago"].get("checksum"), encoded_game_packages)
+
+
+class TestSendNewItems(unittest.IsolatedAsyncioTestCase):
+    async def test_only_recipients(self) -> None:
+        """Test that new items only go to item handling clients of the receiving slot, continuing at send_index."""
+        import asyncio
+        from unittest.mock import AsyncMock, Mock
+        from MultiServer import Client, process_client_cmd, register_location_checks
+        from Utils import Version
+
+        ctx = make_context()
+        send_msgs = ctx.send_msgs = AsyncMock()
+        ctx.broadcast_send_encoded_msgs = AsyncMock()
+        clients: typing.Dict[str, Client] = {}
+        for name, slot_name, items_handling in (("receiver", "B", 0b111), ("tracker", "B", 0), ("finder", "A", 0b111)):
+            client = clients[name] = Client(Mock(extensions=[]), ctx)
+            await process_client_cmd(ctx, client, {"cmd": "Connect", "password": None, "game": "Archipelago",
+                                                   "name": slot_name, "uuid": "", "version": Version(0, 6, 2),
+                                                   "items_handling": items_handling, "tags": []})
+        self.assertEqual(ctx.item_receivers, {(0, 2): {clients["receiver"]}, (0, 1): {clients["finder"]}})
+        send_msgs.reset_mock()
+
+        register_location_checks(ctx, 0, 1, [-1])
+        await asyncio.sleep(0)
+        self.assertEqual(send_msgs.call_count, 1)
+        endpoint, msgs = send_msgs.call_args.args
+        self.assertIs(endpoint, clients["receiver"])
+        self.assertEqual(msgs[0]["index"], 0)
+        self.assertEqual(len(msgs[0]["items"]), 1)
+        self.assertEqual(clients["receiver"].send_index, 1)
+        self.assertFalse(ctx.new_items_slots)
+
+        # receivers follow items_handling changes and disconnects
+        await process_client_cmd(ctx, clients["tracker"], {"cmd": "ConnectUpdate", "items_handling": 0b111})
+        await process_client_cmd(ctx, clients["receiver"], {"cmd": "ConnectUpdate", "items_handling": 0})
+        self.assertEqual(ctx.item_receivers[0, 2], {clients["tracker"]})
+        await ctx.disconnect(clients["tracker"])
+        await ctx.disconnect(clients["finder"])
+        self.assertEqual(ctx.item_receivers, {})
+
+
+class TestBounce(unittest.IsolatedAsyncioTestCase):
+    async def test_routing(self) -> None:
+        """Test that Bounce reaches clients by game, tag and slot as they connect, change tags and disconnect."""
+        from unittest.mock import AsyncMock, Mock
+        from MultiServer import Client, process_client_cmd
+        from Utils import Version
+
+        ctx = make_context()
+        ctx.send_msgs = AsyncMock()
+        broadcast = ctx.broadcast_send_encoded_msgs = AsyncMock()
+        clients: typing.List[Client] = []
+        for name, tags in (("A", ["DeathLink"]), ("B", []), ("B", ["DeathLink"])):
+            client = Client(Mock(extensions=[]), ctx)
+            await process_client_cmd(ctx, client, {"cmd": "Connect", "password": None, "game": "Archipelago",
+                                                   "name": name, "uuid": "", "version": Version(0, 6, 2),
+                                                   "items_handling": 0, "tags": tags})
+            self.assertTrue(client.auth)
+            clients.append(client)
+
+        async def bounce(**args: typing.List[typing.Any]) -> typing.Set[Client]:
+            await process_client_cmd(ctx, clients[0], {"cmd": "Bounce", "data": {}, **args})
+            for call in reversed(broadcast.call_args_list):
+                if "Bounced" in call.args[1]:
+                    return set(call.args[0])
+            self.fail("nothing was bounced")
+
+        self.assertEqual(await bounce(tags=["DeathLink"]), {clients[0], clients[2]})
+        self.assertEqual(await bounce(slots=[2]), {clients[1], clients[2]})
+        self.assertEqual(await bounce(games=["Archipelago"], tags=["Unknown"]), set(clients))
+        await process_client_cmd(ctx, clients[2], {"cmd": "ConnectUpdate", "tags": []})
+        self.assertEqual(await bounce(tags=["DeathLink"]), {clients[0]})
+        await ctx.disconnect(clients[1])
+        self.assertEqual(await bounce(games=["Archipelago"]), {clients[0], clients[2]})
+        self.assertEqual(dict(ctx.clients_by_tag[0]), {"DeathLink": {clients[0]}})
+
+
+class TestDataStorage(unittest.IsolatedAsyncioTestCase):
+    async def test_notify(self) -> None:
+        """Test that prefix subscriptions get notified and that coalesced changes arrive as one SetReply."""
+        import asyncio
+        from unittest.mock import Mock
+        from MultiServer import DataStorage
+
+        broadcast = Mock()
+        storage = DataStorage(broadcast)
+        subscriber, prefix_subscriber, writer = Mock(), Mock(), Mock()
+        storage.subscribe(subscriber, ["counter"])
+        storage.subscribe(prefix_subscriber, ["count*"])
+        self.assertEqual(storage.get_subscribers("counter"), {subscriber, prefix_subscriber})
+        self.assertEqual(storage.get_subscribers("countdown"), {prefix_subscriber})
+        self.assertEqual(storage.get_subscribers("other"), set())
+
+        self.assertEqual(storage.set("counter", 0, [{"operation": "add", "value": 2}]), (0, 2))
+        storage.notify({"key": "counter", "original_value": 0, "value": 2}, writer)
+        self.assertEqual(broadcast.call_args.args[0], {subscriber, prefix_subscriber, writer})
+
+        broadcast.reset_mock()
+        storage.coalesce_window = 0.01
+        for value in range(3, 6):
+            storage.notify({"key": "counter", "original_value": value - 1, "value": value})
+        storage.notify({"key": "counter", "original_value": 5, "value": 6}, writer)
+        self.assertEqual(broadcast.call_count, 1)
+        self.assertEqual(broadcast.call_args.args[0], [writer])
+        await asyncio.sleep(0.05)
+        self.assertEqual(broadcast.call_count, 2)
+        self.assertEqual(broadcast.call_args.args[1], [{"key": "counter", "original_value": 2, "value": 6}])
+
+    async def test_persistence(self) -> None:
+        """Test that data storage can be kept in its own file instead of the savegame, which still loads old saves."""
+        import os
+        import pickle
+        import tempfile
+        import zlib
+        from unittest.mock import patch
+        from Utils import restricted_loads
+
+        with tempfile.TemporaryDirectory() as directory, patch.object(Context, "_start_async_saving"):
+            save_filename = os.path.join(directory, "test.apsave")
+
+            def load() -> Context:
+                loaded = make_context()
+                loaded.save_filename = save_filename
+                loaded.data_storage_file = True
+                loaded.init_save()
+                return loaded
+
+            ctx = load()
+            ctx.data_storage.set("old", None, [{"operation": "replace", "value": "save"}])
+            with open(save_filename, "wb") as f:
+                f.write(zlib.compress(pickle.dumps({**ctx.get_save(), "stored_data": dict(ctx.stored_data)})))
+
+            ctx = load()
+            self.assertEqual(ctx.stored_data, {"old": "save"})
+            ctx.data_storage.set("new", 0, [{"operation": "add", "value": 1}])
+            self.assertTrue(ctx.save(now=True))
+            with open(save_filename, "rb") as f:
+                self.assertNotIn("stored_data", restricted_loads(zlib.decompress(f.read())))
+            size = os.path.getsize(ctx.storage_filename)
+            ctx.data_storage.set("new", 0, [{"operation": "add", "value": 1}])
+            self.assertTrue(ctx.save(now=True))
+            self.assertGreater(os.path.getsize(ctx.storage_filename), size, "storage file was not appended to")
+
+            loaded = load()
+            self.assertEqual(loaded.stored_data, {"old": "save", "new": 2})
+            self.assertEqual(loaded.data_storage.get_size("new"), len(pickle.dumps(2)))
+
+            # a record cut off by a crash is dropped, so records appended after it can be read back
+            with open(ctx.storage_filename, "ab") as f:
+                f.write((100).to_bytes(4, "little") + b"cut off")
+            loaded = load()
+            self.assertEqual(loaded.stored_data, {"old": "save", "new": 2})
+            loaded.data_storage.set("new", 0, [{"operation": "add", "value": 1}])
+            self.assertTrue(loaded.save(now=True))
+            self.assertEqual(load().stored_data, {"old": "save", "new": 3})
+
+            # a storage file left behind by another savegame is not loaded
+            os.remove(save_filename)
+            loaded = load()
+            self.assertEqual(loaded.stored_data, {})
+            loaded.data_storage.set("other", 0, [{"operation": "add", "value": 1}])
+            self.assertTrue(loaded.save(now=True))
+            self.assertEqual(load().stored_data, {"other": 1})
+
+    async def test_savegame_storage(self) -> None:
+        """Test that data storage stays in the savegame unless its own file is enabled."""
+        import os
+        import tempfile
+        from unittest.mock import patch
+
+        with tempfile.TemporaryDirectory() as directory, patch.object(Context, "_start_async_saving"):
+            ctx = make_context()
+            ctx.save_filename = os.path.join(directory, "test.apsave")
+            ctx.init_save()
+            ctx.data_storage.set("key", 0, [{"operation": "add", "value": 1}])
+            self.assertTrue(ctx.save(now=True))
+            self.assertFalse(os.path.exists(ctx.storage_filename))
+
+            loaded = make_context()
+            loaded.save_filename = ctx.save_filename
+            loaded.init_save()
+            self.assertEqual(loaded.stored_data, {"key": 1})
+
+
+class TestMetrics(unittest.TestCase):
+    def test_render(self) -> None:
+        """Test that observations show up in the served Prometheus text."""
+        import urllib.request
+        from MultiServer import ServerMetrics
+
+        metrics = ServerMetrics()
+        metrics.observe_command("LocationChecks", 0.003)
+        metrics.observe_command("NotACommand", 0.003)
+        metrics.observe_command([], 0.003)  # clients can send any json as cmd
+        metrics.observe_broadcast("abc", 4)
+        metrics.observe_received(b"ab")
+        http_server = metrics.serve(0)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{http_server.server_port}/metrics") as response:
+                text = response.read().decode()
+        finally:
+            http_server.shutdown()
+        self.assertTrue(metrics.enabled)
+        self.assertIn('archipelago_command_seconds_bucket{cmd="LocationChecks",le="0.005"} 1', text)
+        self.assertIn('archipelago_command_seconds_count{cmd="unknown"} 2', text)
+        self.assertIn("archipelago_sent_bytes_total 12", text)
+        self.assertIn("archipelago_received_bytes_total 2", text)
+        self.assertIn('archipelago_broadcast_recipients_bucket{le="5"} 1', text)
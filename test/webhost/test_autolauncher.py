@@ -0,0 +1,65 @@
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import Mock
+from uuid import uuid4
+
+from . import TestBase
+
+
+class TestRoomScheduler(TestBase):
+    def test_schedule(self) -> None:
+        """Verify that rooms are started from the scan, dropped once inactive and started again when woken."""
+        from pony.orm import db_session
+        from WebHostLib.autolauncher import RoomScheduler
+        from WebHostLib.models import Room, Seed
+
+        with db_session:
+            seed = Seed(multidata=b"", owner=uuid4())
+            room_id = Room(seed=seed, owner=seed.owner).id
+        hoster = Mock()
+        hoster.collect_shutdowns.return_value = []
+        scheduler = RoomScheduler([hoster], 3600)
+
+        scheduler.step()
+        hoster.start_room.assert_called_once_with(room_id)
+        scheduler.step()  # nothing is due and the next scan is an hour away
+        hoster.start_room.assert_called_once()
+
+        with db_session:
+            room = Room.get(id=room_id)
+            room.last_activity = datetime.utcnow() - timedelta(minutes=1, seconds=room.timeout)
+        hoster.collect_shutdowns.return_value = [room_id]
+        scheduler.step()
+        hoster.collect_shutdowns.return_value = []
+        hoster.start_room.assert_called_once()
+        self.assertNotIn(room_id, scheduler.scheduled)
+
+        with db_session:
+            Room.get(id=room_id).last_activity = datetime.utcnow()
+        scheduler.wake(room_id)
+        scheduler.step()
+        self.assertEqual(hoster.start_room.call_count, 2)
+        self.assertIn(room_id, scheduler.scheduled)
+
+        with db_session:
+            room = Room.get(id=room_id)
+            room.seed.delete()
+            room.delete()
+
+
+class TestGeneratorContext(unittest.TestCase):
+    def test_preload(self) -> None:
+        """Verify that generators are forked from a preloaded template where the platform supports it."""
+        import multiprocessing
+        from unittest.mock import patch
+        from WebHostLib.autolauncher import get_generator_context
+
+        self.assertIs(get_generator_context({"GENERATOR_PRELOAD": False}), multiprocessing.get_context())
+        if "forkserver" not in multiprocessing.get_all_start_methods():
+            self.assertIs(get_generator_context({"GENERATOR_PRELOAD": True}), multiprocessing.get_context())
+            return
+        forkserver = multiprocessing.get_context("forkserver")
+        # the preload list belongs to the process wide forkserver, so it is not actually set from a test
+        with patch.object(type(forkserver), "set_forkserver_preload") as set_preload:
+            self.assertIs(get_generator_context({"GENERATOR_PRELOAD": True}), forkserver)
+        self.assertIn("worlds", set_preload.call_args.args[0])
@@ -0,0 +1,108 @@
+import json
+import pickle
+from typing import List
+from unittest.mock import Mock
+from uuid import UUID, uuid4
+
+from . import TestBase
+
+
+class TestGenerationScheduler(TestBase):
+    def test_pick(self) -> None:
+        """Verify that generators are shared between owners and long generations can't take all of them."""
+        from WebHostLib.autolauncher import GenerationScheduler, QueuedGeneration
+
+        scheduler = GenerationScheduler(Mock(), 4, 100)
+        big, small = uuid4(), uuid4()
+        long = [QueuedGeneration(uuid4(), big, 500, queued) for queued in range(4)]
+        short = [QueuedGeneration(uuid4(), small, 10, queued) for queued in range(10, 12)]
+        self.assertEqual(scheduler.pick([], long + short), [long[0], short[0], short[1], long[1]])
+        self.assertEqual(scheduler.pick([], long), long[:3])
+        self.assertEqual(scheduler.pick(long[:2], short + long[2:]), short)
+
+        scheduler.queued = {generation.id: generation for generation in long + short}
+        starts = scheduler.estimate_starts(0)
+        self.assertEqual(starts[short[1].id], 0)
+        self.assertEqual(starts[long[3].id], 500)
+
+    @staticmethod
+    def queue(games: List[str], count: int) -> List[UUID]:
+        """Queues generations of these games as the only queued generations."""
+        from pony.orm import db_session, select
+        from WebHostLib.models import Generation, STATE_QUEUED
+
+        with db_session:
+            # generations other tests left queued would compete for the generators
+            select(generation for generation in Generation if generation.state == STATE_QUEUED).delete(bulk=True)
+            owner = uuid4()
+            options = pickle.dumps({f"Player{player}": {"game": game} for player, game in enumerate(games)})
+            return [Generation(options=options, owner=owner, state=STATE_QUEUED).id for _ in range(count)]
+
+    def test_step(self) -> None:
+        """Verify that queued generations are started with an estimate and finished ones improve later estimates."""
+        from pony.orm import db_session
+        from WebHostLib.autolauncher import GenerationScheduler, estimate_generation_cost, record_generation_time
+        from WebHostLib.generate import get_wait_text
+        from WebHostLib.models import Generation, GenerationStatistic, STATE_QUEUED, STATE_STARTED
+
+        games = ["Test Game A", "Test Game A", "Test Game B"]
+        generation_ids = self.queue(games, 2)
+        pool = Mock()
+        pool.apply_async.return_value.ready.return_value = False
+        scheduler = GenerationScheduler(pool, 1, 100)
+
+        scheduler.step()
+        pool.apply_async.assert_called_once()
+        with db_session:
+            started, queued = sorted((Generation[generation_id] for generation_id in generation_ids),
+                                     key=lambda generation: generation.state, reverse=True)
+            self.assertEqual(started.state, STATE_STARTED)
+            self.assertEqual(queued.state, STATE_QUEUED)
+            started_queue, queued_queue = json.loads(started.meta)["queue"], json.loads(queued.meta)["queue"]
+            cost = started_queue["cost"]
+            self.assertAlmostEqual(queued_queue["start"] - started_queue["start"], cost, delta=1)
+            self.assertIn("expected to be done in less than a minute", get_wait_text(started))
+
+        try:
+            record_generation_time(games, 20)
+            record_generation_time(["Test Game A"], 3)
+            with db_session:
+                seconds_per_player = {statistic.game: statistic.seconds_per_player
+                                      for statistic in GenerationStatistic.select()}
+            self.assertLess(seconds_per_player["Test Game A"], seconds_per_player["Test Game B"])
+            self.assertNotEqual(estimate_generation_cost(games, seconds_per_player), cost)
+        finally:
+            with db_session:
+                GenerationStatistic.select().delete(bulk=True)
+                for generation_id in generation_ids:
+                    Generation[generation_id].delete()
+
+    def test_lost_generator(self) -> None:
+        """Verify that a generation whose generator never reports back frees its generator after the job time."""
+        from pony.orm import db_session
+        from WebHostLib.autolauncher import GenerationScheduler
+        from WebHostLib.models import Generation, STATE_ERROR, STATE_STARTED
+
+        generation_ids = self.queue(["Test Game A"], 2)
+        pool = Mock()
+        pool.apply_async.return_value.ready.return_value = False
+        scheduler = GenerationScheduler(pool, 1, 100, 600)
+        try:
+            scheduler.step()
+            (lost_id, (generation, _, result)), = scheduler.running.items()
+            scheduler.step()
+            self.assertEqual(pool.apply_async.call_count, 1)
+
+            scheduler.running[lost_id] = (generation, 0.0, result)  # started long before the job time ran out
+            scheduler.step()
+            self.assertEqual(pool.apply_async.call_count, 2)
+            with db_session:
+                lost = Generation[lost_id]
+                self.assertEqual(lost.state, STATE_ERROR)
+                self.assertIn("error", json.loads(lost.meta))
+                other_id, = set(generation_ids) - {lost_id}
+                self.assertEqual(Generation[other_id].state, STATE_STARTED)
+        finally:
+            with db_session:
+                for generation_id in generation_ids:
+                    Generation[generation_id].delete()
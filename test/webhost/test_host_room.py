@@ -42,6 +42,76 @@ class TestHostFakeRoom(TestBase):
         except FileNotFoundError:
             pass
 
+    def test_command_dispatch(self) -> None:
+        """Verify that the shared command poller hands commands to the room they are for and deletes only those."""
+        from unittest.mock import Mock
+        from pony.orm import db_session, select
+        from WebHostLib.customserver import DBCommandDispatcher
+        from WebHostLib.models import Command, Room
+
+        with db_session:
+            room = Room.get(id=self.room_id)
+            other_room = Room(seed=room.seed, owner=room.owner, tracker=uuid4())
+            other_room_id = other_room.id
+            Command(room=room, commandtext="/help")
+            Command(room=other_room, commandtext="/players")
+        try:
+            ctx = Mock(room_id=self.room_id)
+            dispatcher = DBCommandDispatcher()
+            dispatcher.dispatch()  # no rooms registered yet, so the command stays
+            dispatcher.add_room(ctx)
+            dispatcher.dispatch()
+            ctx.main_loop.call_soon_threadsafe.assert_called_once()
+            self.assertEqual(ctx.main_loop.call_soon_threadsafe.call_args.args[1], "/help")
+            with db_session:
+                self.assertFalse(select(command for command in Command if command.room.id == self.room_id)[:])
+                # hosted by another process
+                self.assertEqual([command.commandtext for command in
+                                  select(command for command in Command if command.room.id == other_room_id)],
+                                 ["/players"])
+        finally:
+            with db_session:
+                for command in select(command for command in Command if command.room.id == other_room_id):
+                    command.delete()
+                Room.get(id=other_room_id).delete()
+
+    def test_metrics_port(self) -> None:
+        """Verify that a hoster process serves its metrics when given a port."""
+        import multiprocessing
+        import socket
+        import tempfile
+        import time
+        import urllib.request
+        from WebHostLib.customserver import run_server_process
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        with tempfile.TemporaryDirectory() as directory:
+            ponyconfig = {"provider": "sqlite", "filename": os.path.join(directory, "ap.db3"), "create_db": True}
+            context = multiprocessing.get_context("spawn")
+            rooms_to_run, rooms_shutting_down = context.Queue(), context.Queue()
+            process = context.Process(target=run_server_process, args=(
+                "MultiHosterTest", ponyconfig, {}, None, None, "", rooms_to_run, rooms_shutting_down, port),
+                daemon=True)
+            process.start()
+            try:
+                deadline = time.monotonic() + 60
+                while True:
+                    self.assertTrue(process.is_alive(), "hoster process exited")
+                    try:
+                        with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+                            body = response.read().decode()
+                        break
+                    except OSError:
+                        if time.monotonic() > deadline:
+                            raise
+                        time.sleep(0.1)
+                self.assertIn("archipelago_received_bytes_total", body)
+            finally:
+                process.terminate()
+                process.join()
+
     def test_display_log_missing_full(self) -> None:
         """
         Verify that we get a 200 response even if log is missing.
@@ -93,3 +93,41 @@ class TestTracker(TestBase):
                 headers={"If-Modified-Since": "Wed, 21 Oct 2015 07:28:00"},  # missing timezone
             )
             self.assertEqual(response.status_code, 400)
+
+    def test_seed_data_shared(self) -> None:
+        """
+        Verify that trackers of the same seed share the parsed multidata, and that it's evicted past the budget
+        """
+        from pony.orm import db_session
+        from WebHostLib.models import Room
+        from WebHostLib import tracker
+        from WebHostLib.tracker import TrackerData, _seed_data_cache
+
+        with db_session:
+            room = Room.get(id=self.room_id)
+            first = TrackerData(room)
+            second = TrackerData(room)
+            self.assertIs(first._multidata, second._multidata)
+            self.assertIs(first.item_id_to_name, second.item_id_to_name)
+            self.assertIn(room.seed.id, _seed_data_cache)
+            # looking up unknown ids doesn't add them to the shared lookups
+            game = next(iter(first._multidata["datapackage"]))
+            self.assertEqual(first.item_id_to_name[game][-12345], "Unknown Item (ID: -12345)")
+            self.assertNotIn(-12345, second.item_id_to_name[game])
+            first.location_id_to_name["Unknown Game"]
+            self.assertNotIn("Unknown Game", second.location_id_to_name)
+
+            # the evicted seed's data packages stay shared as long as the seed data is still around
+            evicted = _seed_data_cache.pop(room.seed.id)
+            tracker._seed_data_cache_size -= evicted.size
+            self.app.config["TRACKER_SEED_CACHE_SIZE"] = 0
+            try:
+                uncached = TrackerData(room)
+                self.assertIsNot(uncached._multidata, first._multidata)
+                self.assertNotIn(room.seed.id, _seed_data_cache)
+                # data package lookups are shared by checksum, even between seeds that are parsed separately
+                for game in first._multidata["datapackage"]:
+                    self.assertIs(uncached.item_id_to_name[game], first.item_id_to_name[game])
+                    self.assertIs(uncached.location_name_to_id[game], first.location_name_to_id[game])
+            finally:
+                self.app.config["TRACKER_SEED_CACHE_SIZE"] = 256 * 1024 * 1024
@@ -315,6 +315,12 @@ class World(metaclass=AutoWorldRegister):
     If False, everything is rechecked at every step, which is slower computationally, 
     but may be desirable in complex/dynamic worlds."""
 
+    incremental_reachability: bool = False
+    """If True, region sweeps only retest blocked entrances whose access rule looked up an item count that changed since
+    the last sweep, instead of every blocked entrance. Only safe if entrance access rules depend solely on this player's
+    prog_items and on regions covered by explicit indirect conditions. Ignored if explicit_indirect_conditions is False.
+    """
+
     multiworld: "MultiWorld"
     """autoset on creation. The MultiWorld object for the currently generating multiworld."""
     player: int